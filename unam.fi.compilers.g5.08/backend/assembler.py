@@ -1,7 +1,228 @@
+import sys
+
+from limits import StepBudget, ExecutionLimitExceeded, affordable
+from metrics import phase
+
+# Códigos de operación del programa pre-decodificado. Las variantes _I
+# reciben un inmediato y las _R el índice de un registro como fuente.
+(
+    OP_MOV_I, OP_MOV_R, OP_ADD_I, OP_ADD_R, OP_SUB_I, OP_SUB_R,
+    OP_MUL_I, OP_MUL_R, OP_DIV_I, OP_DIV_R, OP_AND_I, OP_AND_R,
+    OP_OR_I, OP_OR_R, OP_CMP_I, OP_CMP_R, OP_JMP, OP_JNE,
+    OP_PRINT_I, OP_PRINT_R, OP_NOT, OP_HALT, OP_TRAP,
+) = range(23)
+
+# Valor de pc que devuelve un manejador para detener la ejecución
+STOP = sys.maxsize
+
+# Los registros no se truncan a su ancho (``register_sizes``): los resultados
+# de ADD, SUB y MUL se acotan a este número de bits y al pasarlo se lanza
+# ``MemoryError`` (ver ``run``). MUL se estima antes de hacerlo
+MAX_REG_BITS = 4096
+
+
+# ---------------------------------------------------------------------------
+#  Manejadores: handler(asm, regs, a, b, pc) -> siguiente pc
+# ---------------------------------------------------------------------------
+
+def _mov_i(asm, regs, a, b, pc):
+    regs[a] = b
+    return pc + 1
+
+def _mov_r(asm, regs, a, b, pc):
+    regs[a] = regs[b]
+    return pc + 1
+
+def _add_i(asm, regs, a, b, pc):
+    value = regs[a] + b
+    if value.bit_length() > MAX_REG_BITS:
+        raise MemoryError("el resultado de 'ADD' es demasiado grande")
+    regs[a] = value
+    return pc + 1
+
+def _add_r(asm, regs, a, b, pc):
+    value = regs[a] + regs[b]
+    if value.bit_length() > MAX_REG_BITS:
+        raise MemoryError("el resultado de 'ADD' es demasiado grande")
+    regs[a] = value
+    return pc + 1
+
+def _sub_i(asm, regs, a, b, pc):
+    value = regs[a] - b
+    if value.bit_length() > MAX_REG_BITS:
+        raise MemoryError("el resultado de 'SUB' es demasiado grande")
+    regs[a] = value
+    return pc + 1
+
+def _sub_r(asm, regs, a, b, pc):
+    value = regs[a] - regs[b]
+    if value.bit_length() > MAX_REG_BITS:
+        raise MemoryError("el resultado de 'SUB' es demasiado grande")
+    regs[a] = value
+    return pc + 1
+
+def _mul_i(asm, regs, a, b, pc):
+    if not affordable("*", regs[a], b, MAX_REG_BITS):
+        raise MemoryError("el resultado de 'MUL' es demasiado grande")
+    regs[a] *= b
+    return pc + 1
+
+def _mul_r(asm, regs, a, b, pc):
+    if not affordable("*", regs[a], regs[b], MAX_REG_BITS):
+        raise MemoryError("el resultado de 'MUL' es demasiado grande")
+    regs[a] *= regs[b]
+    return pc + 1
+
+def _div_i(asm, regs, a, b, pc):
+    regs[a] //= b
+    return pc + 1
+
+def _div_r(asm, regs, a, b, pc):
+    if regs[b] == 0:
+        line = asm.origins[pc] if asm.origins is not None else pc
+        raise ValueError(f"División por cero en línea {line + 1}")
+    regs[a] //= regs[b]
+    return pc + 1
+
+def _and_i(asm, regs, a, b, pc):
+    regs[a] &= b
+    return pc + 1
+
+def _and_r(asm, regs, a, b, pc):
+    regs[a] &= regs[b]
+    return pc + 1
+
+def _or_i(asm, regs, a, b, pc):
+    regs[a] |= b
+    return pc + 1
+
+def _or_r(asm, regs, a, b, pc):
+    regs[a] |= regs[b]
+    return pc + 1
+
+def _cmp_i(asm, regs, a, b, pc):
+    asm.last_cmp = regs[a] - b
+    return pc + 1
+
+def _cmp_r(asm, regs, a, b, pc):
+    asm.last_cmp = regs[a] - regs[b]
+    return pc + 1
+
+def _jmp(asm, regs, a, b, pc):
+    return a
+
+def _jne(asm, regs, a, b, pc):
+    return a if asm.last_cmp != 0 else pc + 1
+
+def _print_i(asm, regs, a, b, pc):
+    asm.output.append(str(a))
+    return pc + 1
+
+def _print_r(asm, regs, a, b, pc):
+    asm.output.append(str(regs[a]))
+    return pc + 1
+
+def _not(asm, regs, a, b, pc):
+    regs[a] = ~regs[a]
+    return pc + 1
+
+def _halt(asm, regs, a, b, pc):
+    return STOP
+
+def _trap(asm, regs, a, b, pc):
+    raise a
+
+
+# Ciclos (T-states) de cada opcode como (registro de 8 bits, de 16 bits),
+# tomados de la instrucción equivalente del Z80: LD, ADD/ADC, SUB/SBC, AND,
+# OR, CP, JP, JP NZ, OUT, CPL y HALT. El Z80 no tiene MUL ni DIV: se
+# estima la rutina de desplazamiento y suma que los reemplaza. Con 16 bits
+# AND, OR y NOT operan byte a byte.
+CYCLE_COSTS = {
+    OP_MOV_I: (7, 10),    OP_MOV_R: (4, 8),
+    OP_ADD_I: (7, 21),    OP_ADD_R: (4, 11),
+    OP_SUB_I: (7, 25),    OP_SUB_R: (4, 15),
+    OP_MUL_I: (180, 350), OP_MUL_R: (180, 350),
+    OP_DIV_I: (250, 650), OP_DIV_R: (250, 650),
+    OP_AND_I: (7, 22),    OP_AND_R: (4, 16),
+    OP_OR_I:  (7, 22),    OP_OR_R:  (4, 16),
+    OP_CMP_I: (7, 25),    OP_CMP_R: (4, 15),
+    OP_JMP:   10,         OP_JNE:   10,
+    OP_PRINT_I: 11,       OP_PRINT_R: (11, 22),
+    OP_NOT:   (4, 16),    OP_HALT:  4,
+    OP_TRAP:  0,
+}
+
+
+# (opcode, mnemónico, operandos, manejador). Operandos: 'r' registro,
+# 'i' inmediato, 'l' etiqueta; un mnemónico puede tener varias variantes.
+BUILTIN_INSTRUCTIONS = [
+    (OP_MOV_I, "MOV", "ri", _mov_i),     (OP_MOV_R, "MOV", "rr", _mov_r),
+    (OP_ADD_I, "ADD", "ri", _add_i),     (OP_ADD_R, "ADD", "rr", _add_r),
+    (OP_SUB_I, "SUB", "ri", _sub_i),     (OP_SUB_R, "SUB", "rr", _sub_r),
+    (OP_MUL_I, "MUL", "ri", _mul_i),     (OP_MUL_R, "MUL", "rr", _mul_r),
+    (OP_DIV_I, "DIV", "ri", _div_i),     (OP_DIV_R, "DIV", "rr", _div_r),
+    (OP_AND_I, "AND", "ri", _and_i),     (OP_AND_R, "AND", "rr", _and_r),
+    (OP_OR_I,  "OR",  "ri", _or_i),      (OP_OR_R,  "OR",  "rr", _or_r),
+    (OP_CMP_I, "CMP", "ri", _cmp_i),     (OP_CMP_R, "CMP", "rr", _cmp_r),
+    (OP_JMP,   "JMP", "l", _jmp),        (OP_JNE,   "JNE", "l", _jne),
+    (OP_PRINT_I, "PRINT", "i", _print_i), (OP_PRINT_R, "PRINT", "r", _print_r),
+    (OP_NOT,   "NOT", "r", _not),        (OP_HALT,  "HALT", "", _halt),
+    (OP_TRAP,  None,  "", _trap),
+]
+
+
+def _instruction_set(instructions):
+    """mnemónico → {operandos: opcode} (las instrucciones sin mnemónico,
+    como TRAP, no se pueden escribir en el código)."""
+    table = {}
+    for opcode, mnemonic, operands, _ in instructions:
+        if mnemonic is not None:
+            table.setdefault(mnemonic, {})[operands] = opcode
+    return table
+
+
 class SimpleAssembler:
-    def __init__(self):
+    # Tabla de despacho indexada por opcode y mnemónico → {operandos: opcode}
+    HANDLERS = [handler for _, _, _, handler in BUILTIN_INSTRUCTIONS]
+    CYCLES = dict(CYCLE_COSTS)
+    INSTRUCTION_SET = _instruction_set(BUILTIN_INSTRUCTIONS)
+
+    @classmethod
+    def register_instruction(cls, mnemonic, operands, handler, cycles=4):
+        """Agrega una instrucción (o una variante de operandos) y devuelve su opcode.
+
+        ``operands`` describe cada argumento: ``'r'`` registro, ``'i'``
+        inmediato o ``'l'`` etiqueta. ``handler(asm, regs, a, b, pc)`` recibe
+        los operandos ya decodificados (índice de registro, entero o pc
+        destino) y devuelve el siguiente pc, o ``STOP`` para terminar.
+        ``cycles`` es su costo para el perfil (ver :data:`CYCLE_COSTS`). Una
+        subclase que registra instrucciones obtiene su propia tabla.
+        """
+        if "HANDLERS" not in cls.__dict__:
+            cls.HANDLERS = list(cls.HANDLERS)
+            cls.INSTRUCTION_SET = {m: dict(v) for m, v in cls.INSTRUCTION_SET.items()}
+            cls.CYCLES = dict(cls.CYCLES)
+        opcode = len(cls.HANDLERS)
+        cls.HANDLERS.append(handler)
+        cls.INSTRUCTION_SET.setdefault(mnemonic, {})[operands] = opcode
+        cls.CYCLES[opcode] = cycles
+        return opcode
+
+    def __init__(self, budget=None, cycle_costs=None):
+        """``cycle_costs`` cambia el costo de mnemónicos completos para el
+        perfil: ``{"MUL": 40}`` o ``{"MUL": (40, 80)}`` (8 y 16 bits)."""
+        self.budget = budget or StepBudget()    # un paso por instrucción ejecutada
+        self.cycles = dict(self.CYCLES)
+        for mnemonic, cost in (cycle_costs or {}).items():
+            if mnemonic not in self.INSTRUCTION_SET:
+                raise ValueError(f"Instrucción desconocida en los ciclos: '{mnemonic}'")
+            for opcode in self.INSTRUCTION_SET[mnemonic].values():
+                self.cycles[opcode] = cost
         self.labels = {}
         self.instructions = []
+        self.program = []   # instrucciones decodificadas: (opcode, a, b)
+        self.origins = None # índice original de cada una tras optimizar
         self.output = []
         self.arg_counts = {
             "MOV": 2,
@@ -18,6 +239,8 @@ class SimpleAssembler:
             "NOT": 1,
             "HALT": 0
         }
+        for mnemonic, variants in self.INSTRUCTION_SET.items():
+            self.arg_counts.setdefault(mnemonic, len(next(iter(variants))))
         self.valid_registers = {
             "A", "B", "C", "D", "E", "H", "L",
             "AF", "BC", "DE", "HL", "IX", "IY", "SP", "PC"
@@ -29,6 +252,8 @@ class SimpleAssembler:
         }
 
         self.registers = {reg: 0 for reg in self.valid_registers}
+        self.reg_names = list(self.registers)
+        self.reg_index = {reg: i for i, reg in enumerate(self.reg_names)}
 
     def parse(self, code):
         lines = code.strip().splitlines()
@@ -52,10 +277,14 @@ class SimpleAssembler:
         if len(args) != expected:
             raise ValueError(f"{instr} espera {expected} argumento(s), pero recibió {len(args)} en línea {pc + 1}")
 
+        # Con un registro como divisor el cero solo se conoce al ejecutar
         if instr == "DIV":
-            val2 = self._get_value(args[1])
-            if val2 == 0:
-                raise ValueError(f"División por cero en línea {pc + 1}")
+            src = args[1]
+            if src.lstrip("-").isdigit():
+                if int(src) == 0:
+                    raise ValueError(f"División por cero en línea {pc + 1}")
+            elif not self._is_valid_register(src):
+                raise ValueError(f"Registro inválido o no permitido: '{src}'")
 
         if instr in {"MOV", "ADD", "SUB", "MUL", "DIV", "AND", "OR", "NOT"}:
             dest = args[0].rstrip(",")
@@ -79,89 +308,188 @@ class SimpleAssembler:
                         f"Incompatibilidad de tamaños: '{dest}' es de {size_dest} bits y '{src}' es de {size_src} bits en línea {pc + 1}"
                     )
 
-    def execute(self):
-        pc = 0
-        while pc < len(self.instructions):
-            parts = self.instructions[pc].split()
-            instr = parts[0]
-            args = parts[1:] if len(parts) > 1 else []
+    def assemble(self):
+        """Valida y decodifica una sola vez cada instrucción de ``instructions``.
+
+        Una instrucción inválida se decodifica como ``OP_TRAP`` con su error,
+        que se lanza solo si la ejecución llega a ella (como cuando se
+        validaba instrucción por instrucción).
+        """
+        self.program = [self._decode(line, pc) for pc, line in enumerate(self.instructions)]
 
+    def _decode(self, line, pc):
+        parts = line.split()
+        instr = parts[0]
+        args = parts[1:] if len(parts) > 1 else []
+        try:
             self.validate_instruction(instr, args, pc)
+            variants = self.INSTRUCTION_SET[instr]
+            kinds, operands = "", []
+            for pos, arg in enumerate(args):
+                if pos < len(args) - 1:
+                    arg = arg.rstrip(",")
+                kind, value = self._decode_operand(arg, {v[pos] for v in variants}, pc)
+                kinds += kind
+                operands.append(value)
+            opcode = variants.get(kinds)
+            if opcode is None:
+                raise ValueError(f"Operandos no válidos para '{instr}' en línea {pc + 1}")
+            operands += [None] * (2 - len(operands))
+            return (opcode, operands[0], operands[1])
+        except (ValueError, KeyError) as err:
+            return (OP_TRAP, err, None)
 
-            if instr == "MOV":
-                reg_dest = args[0].rstrip(",")
-                val_src = args[1]
-                self.registers[reg_dest] = self._get_value(val_src)
+    def optimize(self):
+        """Aplica :class:`peephole.PeepholeOptimizer` a ``program`` (ya
+        ensamblado). Devuelve el listado optimizado y cuántas instrucciones
+        quedaron."""
+        from peephole import PeepholeOptimizer  # import diferido: peephole depende de este módulo
+        return PeepholeOptimizer(self).optimize()
 
-            elif instr == "CMP":
-                reg, val = args[0].rstrip(","), args[1]
-                self.last_cmp = self.registers[reg] - self._get_value(val)
+    def _decode_operand(self, arg, allowed, pc):
+        if "i" in allowed and arg.lstrip("-").isdigit():
+            return "i", int(arg)
+        if "r" in allowed and arg in self.reg_index:
+            return "r", self.reg_index[arg]
+        if "l" in allowed:
+            if arg not in self.labels:
+                raise ValueError(f"Etiqueta no definida: '{arg}' en línea {pc + 1}")
+            return "l", self.labels[arg]
+        if "i" not in allowed:
+            raise KeyError(arg)     # se esperaba un registro
+        raise ValueError(f"Registro inválido o no permitido: '{arg}'")
 
-            elif instr == "JNE":
-                label = args[0]
-                if self.last_cmp != 0:
-                    pc = self.labels[label]
-                    continue
+    def label_positions(self):
+        """Etiqueta → índice en ``program`` de la instrucción a la que apunta.
 
-            elif instr == "JMP":
-                label = args[0]
-                pc = self.labels[label]
-                continue
+        Tras optimizar es la primera instrucción que sobrevivió desde la
+        posición original de la etiqueta (``len(program)`` si ninguna).
+        """
+        if self.origins is None:
+            return dict(self.labels)
+        n = len(self.program)
+        # Índice original → primera instrucción que sobrevivió a partir de él
+        survivor = [n] * (len(self.instructions) + 1)
+        for i in range(n - 1, -1, -1):
+            survivor[self.origins[i]] = i
+        for k in range(len(self.instructions) - 1, -1, -1):
+            survivor[k] = min(survivor[k], survivor[k + 1])
+        return {name: survivor[index] for name, index in self.labels.items()}
+
+    def cycle_table(self):
+        """Ciclos de cada instrucción de ``program``: las variantes con dos
+        costos usan el segundo cuando el registro destino es de 16 bits."""
+        kinds = {op: k for variants in self.INSTRUCTION_SET.values() for k, op in variants.items()}
+        table = []
+        for op, a, _ in self.program:
+            cost = self.cycles.get(op, 0)
+            if isinstance(cost, tuple):
+                wide = kinds.get(op, "")[:1] == "r" and self.register_sizes[self.reg_names[a]] == 16
+                cost = cost[wide]
+            table.append(cost)
+        return table
 
-            elif instr == "PRINT":
-                val = args[0]
-                self.output.append(str(self._get_value(val)))
-
-            elif instr == "ADD":
-                reg1 = args[0].rstrip(",")
-                reg2 = args[1]
-                self.registers[reg1] += self._get_value(reg2)
-
-            elif instr == "SUB":
-                reg1 = args[0].rstrip(",")
-                reg2 = args[1]
-                self.registers[reg1] -= self._get_value(reg2)
-
-            elif instr == "MUL":
-                reg1 = args[0].rstrip(",")
-                reg2 = args[1]
-                self.registers[reg1] *= self._get_value(reg2)
-
-            elif instr == "DIV":
-                reg1 = args[0].rstrip(",")
-                reg2 = args[1]
-                self.registers[reg1] //= self._get_value(reg2)
-
-            elif instr == "AND":
-                reg1 = args[0].rstrip(",")
-                reg2 = args[1]
-                self.registers[reg1] &= self._get_value(reg2)
-
-            elif instr == "OR":
-                reg1 = args[0].rstrip(",")
-                reg2 = args[1]
-                self.registers[reg1] |= self._get_value(reg2)
-
-            elif instr == "NOT":
-                reg = args[0]
-                self.registers[reg] = ~self.registers[reg]
-
-            elif instr == "HALT":
-                break
-
-            pc += 1
-
-    def _get_value(self, v):
-        if v.lstrip("-").isdigit():
-            return int(v)
-        if v not in self.valid_registers:
-            raise ValueError(f"Registro inválido o no permitido: '{v}'")
-        return self.registers[v]
-
-    def run(self, code):
-        self.parse(code)
-        self.execute()
+    def execute(self, counts=None, back_jumps=None):
+        """Ejecuta ``program``. Con ``counts`` (una lista por instrucción)
+        cuenta cuántas veces se ejecutó cada una y, en ``back_jumps``,
+        cuántos saltos hacia atrás llegaron a cada destino."""
+        program = self.program
+        handlers = self.HANDLERS
+        regs = [self.registers[reg] for reg in self.reg_names]
+        tick = self.budget.tick
+        n = len(program)
+        pc = 0
+        try:
+            if counts is None:
+                while pc < n:
+                    tick()
+                    op, a, b = program[pc]
+                    pc = handlers[op](self, regs, a, b, pc)
+            else:
+                while pc < n:
+                    tick()
+                    counts[pc] += 1
+                    op, a, b = program[pc]
+                    nxt = handlers[op](self, regs, a, b, pc)
+                    if nxt <= pc:
+                        back_jumps[nxt] += 1
+                    pc = nxt
+        finally:
+            for reg, val in zip(self.reg_names, regs):
+                self.registers[reg] = val
+
+    def profile_report(self, counts, back_jumps):
+        """Resumen de una ejecución con ``execute(counts, back_jumps)``.
+
+        ``instructions`` lista las instrucciones ejecutadas con su línea y
+        texto originales (numerados como en los errores), ejecuciones y
+        ciclos; ``loops`` las etiquetas a las que
+        llegó algún salto hacia atrás, con cuántas veces se entró a ellas y
+        cuántas iteraciones se repitieron; ``cycles`` es el total simulado.
+        """
+        table = self.cycle_table()
+        origins = self.origins if self.origins is not None else range(len(self.program))
+        instructions = [
+            {"line": origins[pc] + 1, "source": self.instructions[origins[pc]],
+             "count": count, "cycles": count * table[pc]}
+            for pc, count in enumerate(counts) if count
+        ]
+        loops = [
+            {"label": name, "entries": counts[pc], "iterations": back_jumps[pc]}
+            for name, pc in sorted(self.label_positions().items(), key=lambda kv: kv[1])
+            if pc < len(counts) and back_jumps[pc]
+        ]
         return {
-            "registers": self.registers,
-            "output": self.output
+            "cycles": sum(entry["cycles"] for entry in instructions),
+            "instructions": instructions,
+            "loops": loops,
         }
+
+    def run(self, code, optimize=False, metrics=None, profile=False):
+        """Ensambla y ejecuta ``code``. ``metrics`` (un
+        :class:`metrics.PhaseRecorder`) recibe las fases ``assemble``,
+        ``optimize`` y ``execute``.
+
+        Con ``profile`` el resultado incluye ``cycles``, el total de ciclos
+        simulados, y ``profile`` (ver :meth:`profile_report`): el costo no
+        depende de la velocidad del equipo."""
+        with phase(metrics, "assemble") as counts:
+            self.parse(code)
+            self.assemble()
+            counts["instructions"] = len(self.program)
+        report = None
+        if optimize:
+            with phase(metrics, "optimize") as counts:
+                report = self.optimize()
+                counts["instructions"] = len(self.program)
+        hits = back_jumps = None
+        if profile:
+            hits, back_jumps = [0] * len(self.program), [0] * (len(self.program) + 1)
+        with phase(metrics, "execute") as counts:
+            try:
+                self.execute(hits, back_jumps)
+            except ExecutionLimitExceeded as exc:
+                result = {
+                    "registers": self.registers,
+                    "output": self.output,
+                    "limit_exceeded": exc.to_dict()
+                }
+            except MemoryError as exc:
+                result = {
+                    "registers": self.registers,
+                    "output": self.output,
+                    "limit_exceeded": self.budget.memory_exceeded(exc).to_dict()
+                }
+            else:
+                result = {
+                    "registers": self.registers,
+                    "output": self.output
+                }
+            finally:
+                counts["steps"] = self.budget.steps
+        if report is not None:
+            result["optimized"] = report
+        if profile:
+            result["profile"] = self.profile_report(hits, back_jumps)
+            result["cycles"] = result["profile"]["cycles"]
+        return result
@@ -0,0 +1,707 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+
+# ---------------------------------------------------------------------
+#  Importación de nodos del AST y del intérprete de referencia
+# ---------------------------------------------------------------------
+from parser import (  # type: ignore
+    ASTNode,
+    ProgramNode,
+    FunctionNode,
+    ClassNode,
+    ImportNode,
+    WhileNode,
+    ForNode,
+    IfNode,
+    TryNode,
+    ReturnNode,
+    BreakNode,
+    PassNode,
+    AssignmentNode,
+    AugmentedAssignmentNode,
+    IdentifierNode,
+    ConstantNode,
+    StringNode,
+    ListNode,
+    DictNode,
+    TupleNode,
+    UnaryOpNode,
+    BinaryOpNode,
+    CompareNode,
+    IndexNode,
+    AttributeNode,
+    FunctionCallNode,
+    MethodCallNode,
+)
+from limits import MAX_CALL_DEPTH
+from semantic import NodeVisitor, Interpreter, Resolver, Frame, UNSET, _ReturnSignal
+
+# ---------------------------------------------------------------------
+#  Conjunto de instrucciones
+# ---------------------------------------------------------------------
+# Cada instrucción ocupa dos enteros consecutivos en ``CodeObject.code``:
+# el opcode y su operando (0 si no lo usa). Los saltos son absolutos.
+OPCODES = (
+    "LOAD_NAME", "LOAD_FAST", "LOAD_CONST", "BINARY_OP", "STORE_NAME",
+    "STORE_FAST", "POP_JUMP_IF_FALSE", "JUMP", "LOAD_NAME_OR_ZERO", "LOAD_FAST_OR_ZERO",
+    "CALL_FUNCTION", "POP_TOP", "FOR_ITER", "CALL_METHOD", "RETURN_VALUE",
+    "UNARY_OP", "GET_ITER", "BUILD_LIST", "BUILD_TUPLE", "BUILD_DICT",
+    "MAKE_FUNCTION", "MAKE_CLASS", "IMPORT_NAME", "SETUP_TRY", "RAISE_RUNTIME",
+    "LOAD_DEREF", "BINARY_SUBSCR", "LOAD_ATTR", "CHAIN_COMPARE",
+)
+(
+    LOAD_NAME, LOAD_FAST, LOAD_CONST, BINARY_OP, STORE_NAME,
+    STORE_FAST, POP_JUMP_IF_FALSE, JUMP, LOAD_NAME_OR_ZERO, LOAD_FAST_OR_ZERO,
+    CALL_FUNCTION, POP_TOP, FOR_ITER, CALL_METHOD, RETURN_VALUE,
+    UNARY_OP, GET_ITER, BUILD_LIST, BUILD_TUPLE, BUILD_DICT,
+    MAKE_FUNCTION, MAKE_CLASS, IMPORT_NAME, SETUP_TRY, RAISE_RUNTIME,
+    LOAD_DEREF, BINARY_SUBSCR, LOAD_ATTR, CHAIN_COMPARE,
+) = range(len(OPCODES))
+
+JUMP_OPS = {POP_JUMP_IF_FALSE, JUMP, FOR_ITER}
+CONST_OPS = {LOAD_CONST, CALL_FUNCTION, CALL_METHOD, MAKE_FUNCTION,
+             MAKE_CLASS, IMPORT_NAME, SETUP_TRY, RAISE_RUNTIME, LOAD_DEREF}
+NAME_OPS = {LOAD_NAME, STORE_NAME, LOAD_NAME_OR_ZERO, LOAD_ATTR}
+FAST_OPS = {LOAD_FAST, STORE_FAST, LOAD_FAST_OR_ZERO}
+
+BIN_OP_NAMES: Tuple[str, ...] = tuple(Interpreter.BIN_OPS)
+BIN_OP_FNS = tuple(Interpreter.BIN_OPS.values())
+UN_OP_NAMES: Tuple[str, ...] = tuple(Interpreter.UN_OPS)
+UN_OP_FNS = tuple(Interpreter.UN_OPS.values())
+
+
+class _Marker:
+    """Centinela con nombre legible en el desensamblado."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+NORETURN = _Marker("<fallthrough>")  # un bloque terminó sin 'return'
+
+
+class CodeObject:
+    """Unidad de código compilado: una función, un cuerpo de clase o un bloque."""
+
+    __slots__ = ("name", "code", "consts", "names", "layout", "varnames")
+
+    def __init__(self, name: str, code: List[int], consts: Sequence[Any],
+                 names: Sequence[str], layout: Dict[str, int]):
+        self.name = name
+        self.code = code
+        self.consts = tuple(consts)
+        self.names = tuple(names)
+        self.layout = layout
+        self.varnames = tuple(sorted(layout, key=layout.get))
+
+    def __repr__(self):
+        return f"<code {self.name}>"
+
+
+def disassemble(co: CodeObject) -> List[str]:
+    """Devuelve el listado legible de ``co`` (y de sus objetos anidados)."""
+    lines = [f"{co.name}:"]
+    nested: List[CodeObject] = []
+    for pc in range(0, len(co.code), 2):
+        op, arg = co.code[pc], co.code[pc + 1]
+        opname = OPCODES[op]
+        if op in CONST_OPS:
+            detail = repr(co.consts[arg])
+            nested.extend(_code_objects(co.consts[arg]))
+        elif op in NAME_OPS:
+            detail = co.names[arg]
+        elif op in FAST_OPS:
+            detail = co.varnames[arg]
+        elif op == BINARY_OP:
+            detail = BIN_OP_NAMES[arg]
+        elif op == UNARY_OP:
+            detail = UN_OP_NAMES[arg]
+        elif op == CHAIN_COMPARE:
+            op_index, target = co.consts[arg]
+            detail = f"{BIN_OP_NAMES[op_index]} -> {target}"
+        elif op in JUMP_OPS:
+            detail = f"-> {arg}"
+        else:
+            detail = str(arg) if arg else ""
+        lines.append(f"  {pc:>4} {opname:<18} {detail}".rstrip())
+    for sub in nested:
+        lines.extend(disassemble(sub))
+    return lines
+
+
+def _code_objects(value: Any) -> List[CodeObject]:
+    if isinstance(value, CodeObject):
+        return [value]
+    if isinstance(value, tuple):
+        return [co for item in value for co in _code_objects(item)]
+    return []
+
+
+# ---------------------------------------------------------------------
+#  1) Generador de código
+# ---------------------------------------------------------------------
+class CodeGenerator(NodeVisitor):
+    """Traduce el AST a :class:`CodeObject` con variables locales por slot.
+
+    En el nivel de módulo (y en cuerpos de clase) todos los nombres son
+    globales. Dentro de una función, cada local ocupa el slot que le asignó
+    :class:`semantic.Resolver`; los nombres de funciones envolventes se leen
+    con ``LOAD_DEREF`` recorriendo la cadena de :class:`semantic.Frame`.
+    """
+
+    def __init__(self, layouts: Dict[FunctionNode, Dict[str, int]], name: str = "<module>",
+                 scopes: List[Dict[str, int]] | None = None):
+        self.layouts = layouts
+        self.name = name
+        self.scopes: List[Dict[str, int]] = scopes or []   # layouts léxicos, el actual al final
+        self.slots: Dict[str, int] = self.scopes[-1] if self.scopes else {}
+        self.code: List[int] = []
+        self.consts: List[Any] = []
+        self._const_index: Dict[Tuple[type, Any], int] = {}
+        self.names: List[str] = []
+        self._name_index: Dict[str, int] = {}
+
+    # ---- helpers de emisión ----------------------------------------
+    def emit(self, op: int, arg: int = 0) -> int:
+        self.code += (op, arg)
+        return len(self.code) - 2
+
+    def patch(self, at: int, target: int | None = None):
+        self.code[at + 1] = len(self.code) if target is None else target
+
+    def const(self, value: Any) -> int:
+        try:
+            key = (type(value), value)
+            if type(value) is float:
+                # 0.0 == -0.0 (y lo mismo con NaN): el signo distingue la constante
+                key += (math.copysign(1.0, value),)
+            idx = self._const_index.get(key)
+        except TypeError:           # valores no hashables
+            key, idx = None, None
+        if idx is None:
+            idx = len(self.consts)
+            self.consts.append(value)
+            if key is not None:
+                self._const_index[key] = idx
+        return idx
+
+    def name_idx(self, name: str) -> int:
+        idx = self._name_index.get(name)
+        if idx is None:
+            idx = self._name_index[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def build(self) -> CodeObject:
+        return CodeObject(self.name, self.code, self.consts, self.names, self.slots)
+
+    def block(self, stmts: List[ASTNode] | None):
+        for st in stmts or []:
+            self.visit(st)
+            if isinstance(st, (FunctionCallNode, MethodCallNode)):
+                self.emit(POP_TOP)     # valor de una llamada usada como sentencia
+
+    def exprs(self, nodes: List[ASTNode]):
+        for node in nodes:
+            self.visit(node)
+
+    def subblock(self, stmts: List[ASTNode] | None, label: str) -> CodeObject | None:
+        """Compila ``stmts`` como bloque que comparte los slots de esta función."""
+        if not stmts:
+            return None
+        gen = CodeGenerator(self.layouts, f"{self.name}.{label}", self.scopes)
+        gen.block(stmts)
+        gen.emit(LOAD_CONST, gen.const(NORETURN))
+        gen.emit(RETURN_VALUE)
+        return gen.build()
+
+    def resolve(self, name: str) -> Tuple[int, int]:
+        """``(profundidad, slot)`` de ``name``; profundidad -1 si es global."""
+        for depth, layout in enumerate(reversed(self.scopes)):
+            if name in layout:
+                return depth, layout[name]
+        return -1, -1
+
+    def load(self, name: str, or_zero: bool = False):
+        depth, slot = self.resolve(name)
+        if depth == 0:
+            self.emit(LOAD_FAST_OR_ZERO if or_zero else LOAD_FAST, slot)
+        elif depth > 0:
+            self.emit(LOAD_DEREF, self.const((depth, slot, name, or_zero)))
+        else:
+            self.emit(LOAD_NAME_OR_ZERO if or_zero else LOAD_NAME, self.name_idx(name))
+
+    def store(self, name: str):
+        if name in self.slots:
+            self.emit(STORE_FAST, self.slots[name])
+        else:
+            self.emit(STORE_NAME, self.name_idx(name))
+
+    def raise_runtime(self, message: str):
+        self.emit(RAISE_RUNTIME, self.const(message))
+
+    def generic_visit(self, node: ASTNode):
+        raise RuntimeError(f"Nodo no soportado por el generador de bytecode: {type(node).__name__}")
+
+    # ---- programa --------------------------------------------------
+    def visit_ProgramNode(self, node: ProgramNode):
+        self.block(node.body)
+        self.emit(LOAD_CONST, self.const(None))
+        self.emit(RETURN_VALUE)
+
+    # --- declaraciones ---------------------------------------------
+    def visit_FunctionNode(self, node: FunctionNode):
+        layout = self.layouts[node]
+        gen = CodeGenerator(self.layouts, node.name, self.scopes + [layout])
+        gen.block(node.body)
+        gen.emit(LOAD_CONST, gen.const(None))
+        gen.emit(RETURN_VALUE)
+        co = gen.build()
+        self.emit(MAKE_FUNCTION, self.const((co, tuple(layout[p] for p in node.params))))
+        self.store(node.name)
+
+    def visit_ClassNode(self, node: ClassNode):
+        gen = CodeGenerator(self.layouts, node.name)
+        gen.block(node.body)
+        gen.emit(LOAD_CONST, gen.const(None))
+        gen.emit(RETURN_VALUE)
+        self.emit(MAKE_CLASS, self.const(gen.build()))
+        self.store(node.name)
+
+    def visit_ImportNode(self, node: ImportNode):
+        for mod, alias in node.names:
+            self.emit(IMPORT_NAME, self.const(mod))
+            self.store(alias or mod.split(".")[0])
+
+    # --- control de flujo ------------------------------------------
+    def visit_IfNode(self, node: IfNode):
+        exits = []
+        for cond, body in [(node.cond, node.body)] + list(node.elif_blocks):
+            self.visit(cond)
+            skip = self.emit(POP_JUMP_IF_FALSE)
+            self.block(body)
+            exits.append(self.emit(JUMP))
+            self.patch(skip)
+        self.block(node.else_body)
+        for at in exits:
+            self.patch(at)
+
+    def visit_WhileNode(self, node: WhileNode):
+        top = len(self.code)
+        self.visit(node.cond)
+        exit_ = self.emit(POP_JUMP_IF_FALSE)
+        self.block(node.body)
+        self.emit(JUMP, top)
+        self.patch(exit_)
+
+    def visit_ForNode(self, node: ForNode):
+        self.visit(node.iterable)
+        self.emit(GET_ITER)
+        top = self.emit(FOR_ITER)
+        self.store(node.target)
+        self.block(node.body)
+        self.emit(JUMP, top)
+        self.patch(top)
+
+    def visit_TryNode(self, node: TryNode):
+        handlers = []
+        for i, h in enumerate(node.handlers):
+            exc_name = h.exc.split()[0] if h.exc else None
+            alias = h.exc.split(" as ")[-1] if h.exc and " as " in h.exc else None
+            target = None
+            if alias is not None:
+                target = (True, self.slots[alias]) if alias in self.slots else (False, alias)
+            handlers.append((exc_name, target, self.subblock(h.body, f"<except{i}>")))
+        spec = (
+            self.subblock(node.body, "<try>"),
+            tuple(handlers),
+            self.subblock(node.else_body, "<else>"),
+            self.subblock(node.finally_body, "<finally>"),
+        )
+        self.emit(SETUP_TRY, self.const(spec))
+
+    # --- sentencias simples ----------------------------------------
+    def visit_PassNode(self, node: PassNode):
+        pass
+
+    def visit_BreakNode(self, node: BreakNode):
+        self.raise_runtime("'break' fuera de contexto soportado (no implementado).")
+
+    def visit_ReturnNode(self, node: ReturnNode):
+        if node.value:
+            self.visit(node.value)
+        else:
+            self.emit(LOAD_CONST, self.const(None))
+        self.emit(RETURN_VALUE)
+
+    def visit_AssignmentNode(self, node: AssignmentNode):
+        self.visit(node.value)
+        self.store(node.target)
+
+    def visit_AugmentedAssignmentNode(self, node: AugmentedAssignmentNode):
+        self.load(node.target, or_zero=True)
+        self.visit(node.value)
+        if node.op not in Interpreter.BIN_OPS:
+            self.raise_runtime(f"Operador compuesto no soportado: {node.op}")
+            return
+        self.emit(BINARY_OP, BIN_OP_NAMES.index(node.op))
+        self.store(node.target)
+
+    # --- expresiones -----------------------------------------------
+    def visit_IdentifierNode(self, node: IdentifierNode):
+        self.load(node.name)
+
+    def visit_ConstantNode(self, node: ConstantNode):
+        self.emit(LOAD_CONST, self.const(Interpreter.visit_ConstantNode(None, node)))
+
+    def visit_StringNode(self, node: StringNode):
+        self.emit(LOAD_CONST, self.const(Interpreter.visit_StringNode(None, node)))
+
+    def visit_ListNode(self, node: ListNode):
+        self.exprs(node.elements)
+        self.emit(BUILD_LIST, len(node.elements))
+
+    def visit_TupleNode(self, node: TupleNode):
+        self.exprs(node.elements)
+        self.emit(BUILD_TUPLE, len(node.elements))
+
+    def visit_DictNode(self, node: DictNode):
+        for key, val in node.pairs:
+            self.visit(key)
+            self.visit(val)
+        self.emit(BUILD_DICT, len(node.pairs))
+
+    def visit_UnaryOpNode(self, node: UnaryOpNode):
+        if node.op not in Interpreter.UN_OPS:
+            self.raise_runtime(f"Operador unario '{node.op}' no soportado.")
+            return
+        self.visit(node.operand)
+        self.emit(UNARY_OP, UN_OP_NAMES.index(node.op))
+
+    def visit_BinaryOpNode(self, node: BinaryOpNode):
+        if node.op not in Interpreter.BIN_OPS:
+            self.raise_runtime(f"Operador binario '{node.op}' no soportado.")
+            return
+        self.visit(node.left)
+        self.visit(node.right)
+        self.emit(BINARY_OP, BIN_OP_NAMES.index(node.op))
+
+    def visit_CompareNode(self, node: CompareNode):
+        # Cada eslabón salvo el último deja su operando derecho para el
+        # siguiente, o salta al final con el resultado falso
+        self.visit(node.left)
+        links = []
+        for op, comparator in zip(node.ops[:-1], node.comparators):
+            self.visit(comparator)
+            links.append((self.emit(CHAIN_COMPARE), BIN_OP_NAMES.index(op)))
+        self.visit(node.comparators[-1])
+        self.emit(BINARY_OP, BIN_OP_NAMES.index(node.ops[-1]))
+        for at, op_index in links:
+            self.code[at + 1] = self.const((op_index, len(self.code)))
+
+    def visit_IndexNode(self, node: IndexNode):
+        self.visit(node.obj)
+        self.visit(node.index)
+        self.emit(BINARY_SUBSCR)
+
+    def visit_AttributeNode(self, node: AttributeNode):
+        self.visit(node.obj)
+        self.emit(LOAD_ATTR, self.name_idx(node.attr))
+
+    def visit_FunctionCallNode(self, node: FunctionCallNode):
+        self.exprs(node.args)
+        depth, slot = self.resolve(node.name)
+        self.emit(CALL_FUNCTION, self.const((node.name, len(node.args), depth, slot)))
+
+    def visit_MethodCallNode(self, node: MethodCallNode):
+        self.load(node.obj)
+        self.exprs(node.args)
+        self.emit(CALL_METHOD, self.const((node.method, len(node.args))))
+
+
+def compile_to_bytecode(ast: ProgramNode,
+                        layouts: Dict[FunctionNode, Dict[str, int]] | None = None) -> CodeObject:
+    """Genera el :class:`CodeObject` del módulo para ``ast``."""
+    gen = CodeGenerator(Resolver().resolve(ast) if layouts is None else layouts)
+    gen.visit(ast)
+    return gen.build()
+
+
+# ---------------------------------------------------------------------
+#  2) Máquina virtual
+# ---------------------------------------------------------------------
+class VMFunction:
+    """Función definida por el usuario, ejecutada por la máquina virtual."""
+
+    __slots__ = ("code", "param_slots", "vm", "parent")
+
+    def __init__(self, code: CodeObject, param_slots: Tuple[int, ...],
+                 vm: "VirtualMachine", parent: Frame | None):
+        self.code, self.param_slots, self.vm, self.parent = code, param_slots, vm, parent
+
+    def __call__(self, *args):
+        return self.vm.call(self, args)
+
+    def __repr__(self):
+        return f"<function {self.code.name}>"
+
+
+class VirtualMachine:
+    """Ejecuta :class:`CodeObject` con un bucle de despacho sobre una pila.
+
+    El estado global (``globals`` y ``output``) y los builtins se delegan en
+    un :class:`Interpreter`, igual que en :class:`compiler.ClosureCompiler`.
+    """
+
+    def __init__(self, runtime: Interpreter | None = None):
+        self.rt = runtime or Interpreter()
+
+    # ---- entry -----------------------------------------------------
+    def run(self, ast: ProgramNode) -> Dict[str, Any]:
+        return self.execute(compile_to_bytecode(ast, self.rt.layouts))
+
+    def execute(self, co: CodeObject) -> Dict[str, Any]:
+        self._run(co, None)
+        return {"output": self.rt.output, "globals": self.rt.globals}
+
+    def call(self, fn: VMFunction, args: Sequence[Any]):
+        rt = self.rt
+        rt.budget.tick()
+        if rt.call_depth >= MAX_CALL_DEPTH:
+            raise RecursionError(f"más de {MAX_CALL_DEPTH} llamadas anidadas")
+        frame = Frame(fn.code.layout, fn.parent)
+        values = frame.values
+        for slot, val in zip(fn.param_slots, args):
+            values[slot] = val
+        rt.call_depth += 1
+        try:
+            return self._run(fn.code, frame)
+        finally:
+            rt.call_depth -= 1
+
+    def _lookup_outer(self, frame: Frame, name: str):
+        """Busca ``name`` fuera del slot vacío de ``frame``: marcos padre y globals."""
+        val = frame.lookup(name)
+        return self.rt.globals.get(name, UNSET) if val is UNSET else val
+
+    # ---- instrucciones complejas ------------------------------------
+    def _make_class(self, co: CodeObject) -> Dict[str, Any]:
+        cls_dict: Dict[str, Any] = {}
+        orig_globals = self.rt.globals
+        self.rt.globals = cls_dict
+        try:
+            self._run(co, None)
+        finally:
+            self.rt.globals = orig_globals
+        return cls_dict
+
+    def _try(self, spec, frame: Frame | None):
+        body, handlers, else_co, finally_co = spec
+        try:
+            try:
+                if body is not None:
+                    r = self._run(body, frame)
+                    if r is not NORETURN:
+                        raise _ReturnSignal(r)
+            except Exception as e:
+                for exc_name, target, hbody in handlers:
+                    if exc_name is None or exc_name == type(e).__name__:
+                        if target is not None:
+                            is_fast, where = target
+                            if is_fast:
+                                frame.values[where] = e
+                            else:
+                                self.rt.globals[where] = e
+                        if hbody is not None:
+                            r = self._run(hbody, frame)
+                            if r is not NORETURN:
+                                raise _ReturnSignal(r)
+                        break
+                else:
+                    raise
+            else:
+                if else_co is not None:
+                    r = self._run(else_co, frame)
+                    if r is not NORETURN:
+                        raise _ReturnSignal(r)
+            finally:
+                if finally_co is not None:
+                    r = self._run(finally_co, frame)
+                    if r is not NORETURN:
+                        raise _ReturnSignal(r)
+        except _ReturnSignal as rs:
+            return rs.value
+        return NORETURN
+
+    # ---- bucle de despacho -------------------------------------------
+    def _run(self, co: CodeObject, frame: Frame | None):
+        rt = self.rt
+        fast = frame.values if frame is not None else None
+        g = rt.globals
+        code, consts, names, varnames = co.code, co.consts, co.names, co.varnames
+        stack: List[Any] = []
+        push, pop = stack.append, stack.pop
+        bin_fns, un_fns = BIN_OP_FNS, UN_OP_FNS
+        tick = rt.budget.tick
+        pc = 0
+        while True:
+            op = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+            if op == 0:       # LOAD_NAME
+                name = names[arg]
+                try:
+                    push(g[name])
+                except KeyError:
+                    raise RuntimeError(f"Variable '{name}' no definida.") from None
+            elif op == 1:     # LOAD_FAST
+                val = fast[arg]
+                if val is UNSET:
+                    val = self._lookup_outer(frame, varnames[arg])
+                    if val is UNSET:
+                        raise RuntimeError(f"Variable '{varnames[arg]}' no definida.")
+                push(val)
+            elif op == 2:     # LOAD_CONST
+                push(consts[arg])
+            elif op == 3:     # BINARY_OP
+                right = pop()
+                stack[-1] = bin_fns[arg](stack[-1], right)
+            elif op == 4:     # STORE_NAME
+                g[names[arg]] = pop()
+            elif op == 5:     # STORE_FAST
+                fast[arg] = pop()
+            elif op == 6:     # POP_JUMP_IF_FALSE
+                if not pop():
+                    pc = arg
+            elif op == 7:     # JUMP
+                if arg < pc:      # salto hacia atrás: una iteración de bucle
+                    tick()
+                pc = arg
+            elif op == 8:     # LOAD_NAME_OR_ZERO
+                push(g.get(names[arg], 0))
+            elif op == 9:     # LOAD_FAST_OR_ZERO
+                val = fast[arg]
+                if val is UNSET:
+                    val = self._lookup_outer(frame, varnames[arg])
+                push(0 if val is UNSET else val)
+            elif op == 10:    # CALL_FUNCTION
+                name, argc, depth, slot = consts[arg]
+                if argc:
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    args = []
+                if depth < 0:
+                    fn = g.get(name, UNSET)
+                else:
+                    scope = frame
+                    for _ in range(depth):
+                        scope = scope.parent
+                    fn = scope.values[slot]
+                    if fn is UNSET:
+                        fn = self._lookup_outer(frame, name)
+                if fn is UNSET:
+                    push(rt._call_builtin(name, args))
+                elif type(fn) is VMFunction:
+                    push(self.call(fn, args))
+                else:
+                    push(fn(*args))
+            elif op == 11:    # POP_TOP
+                pop()
+            elif op == 12:    # FOR_ITER
+                try:
+                    push(next(stack[-1]))
+                except StopIteration:
+                    pop()
+                    pc = arg
+            elif op == 13:    # CALL_METHOD
+                method_name, argc = consts[arg]
+                if argc:
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    args = []
+                method = getattr(pop(), method_name, None)
+                if method is None:
+                    raise RuntimeError(f"Objeto no tiene método '{method_name}'.")
+                push(method(*args))
+            elif op == 14:    # RETURN_VALUE
+                return pop()
+            elif op == 15:    # UNARY_OP
+                stack[-1] = un_fns[arg](stack[-1])
+            elif op == 16:    # GET_ITER
+                stack[-1] = iter(stack[-1])
+            elif op == 17:    # BUILD_LIST
+                if arg:
+                    items = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    items = []
+                push(items)
+            elif op == 18:    # BUILD_TUPLE
+                if arg:
+                    items = tuple(stack[-arg:])
+                    del stack[-arg:]
+                else:
+                    items = ()
+                push(items)
+            elif op == 19:    # BUILD_DICT
+                items = stack[-2 * arg:] if arg else []
+                if arg:
+                    del stack[-2 * arg:]
+                push({items[i]: items[i + 1] for i in range(0, len(items), 2)})
+            elif op == 20:    # MAKE_FUNCTION
+                fn_code, param_slots = consts[arg]
+                push(VMFunction(fn_code, param_slots, self, frame))
+            elif op == 21:    # MAKE_CLASS
+                push(self._make_class(consts[arg]))
+            elif op == 22:    # IMPORT_NAME
+                push(__import__(consts[arg]))
+            elif op == 23:    # SETUP_TRY
+                r = self._try(consts[arg], frame)
+                if r is not NORETURN:
+                    return r
+            elif op == 24:    # RAISE_RUNTIME
+                raise RuntimeError(consts[arg])
+            elif op == 25:               # LOAD_DEREF
+                depth, slot, name, or_zero = consts[arg]
+                scope = frame
+                for _ in range(depth):
+                    scope = scope.parent
+                val = scope.values[slot]
+                if val is UNSET:
+                    val = self._lookup_outer(frame, name)
+                if val is UNSET:
+                    if not or_zero:
+                        raise RuntimeError(f"Variable '{name}' no definida.")
+                    val = 0
+                push(val)
+            elif op == 26:    # BINARY_SUBSCR
+                key = pop()
+                try:
+                    stack[-1] = stack[-1][key]
+                except Exception as e:
+                    raise RuntimeError(f"Error al indexar: {e}")
+            elif op == 27:    # LOAD_ATTR
+                try:
+                    stack[-1] = getattr(stack[-1], names[arg])
+                except AttributeError:
+                    raise RuntimeError(f"Objeto no tiene atributo '{names[arg]}'.") from None
+            elif op == 28:    # CHAIN_COMPARE
+                op_index, target = consts[arg]
+                right = pop()
+                result = bin_fns[op_index](stack[-1], right)
+                if result:
+                    stack[-1] = right
+                else:
+                    stack[-1] = result
+                    pc = target
+            else:
+                raise RuntimeError(f"Opcode desconocido: {op}")
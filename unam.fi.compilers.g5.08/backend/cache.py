@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+# ---------------------------------------------------------------------
+#  Caché LRU acotada por entradas y por bytes
+# ---------------------------------------------------------------------
+_MISSING = object()
+
+
+def cache_key(code: str, mode: str) -> str:
+    """Clave direccionada por contenido: hash del modo y del código fuente."""
+    h = hashlib.sha256(mode.encode("utf-8"))
+    h.update(b"\0")
+    h.update(code.encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Caché LRU segura entre hilos.
+
+    Cada entrada declara su tamaño aproximado en bytes al guardarse. Se
+    desalojan las menos usadas hasta respetar tanto ``max_entries`` como
+    ``max_bytes``; una entrada más grande que ``max_bytes`` no se guarda.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes or self.max_entries <= 0:
+                return
+            self._data[key] = (value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits"       : self.hits,
+                "misses"     : self.misses,
+                "evictions"  : self.evictions,
+                "entries"    : len(self._data),
+                "bytes"      : self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes"  : self.max_bytes,
+            }
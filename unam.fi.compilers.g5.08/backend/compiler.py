@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Tuple
+
+# ---------------------------------------------------------------------
+#  Importación de nodos del AST y del intérprete de referencia
+# ---------------------------------------------------------------------
+from parser import (  # type: ignore
+    ASTNode,
+    ProgramNode,
+    FunctionNode,
+    ClassNode,
+    ImportNode,
+    WhileNode,
+    ForNode,
+    IfNode,
+    TryNode,
+    ReturnNode,
+    BreakNode,
+    PassNode,
+    AssignmentNode,
+    AugmentedAssignmentNode,
+    IdentifierNode,
+    ConstantNode,
+    StringNode,
+    ListNode,
+    DictNode,
+    TupleNode,
+    UnaryOpNode,
+    BinaryOpNode,
+    CompareNode,
+    IndexNode,
+    AttributeNode,
+    FunctionCallNode,
+    MethodCallNode,
+)
+from limits import MAX_CALL_DEPTH
+from semantic import NodeVisitor, Interpreter, Resolver, Frame, UNSET, _ReturnSignal
+
+Code = Callable[[], Any]
+
+
+# ---------------------------------------------------------------------
+#  Compilador a closures
+# ---------------------------------------------------------------------
+class ClosureCompiler(NodeVisitor):
+    """Traduce el AST a un árbol de closures ya enlazadas.
+
+    El despacho por tipo de nodo (``visit_*``) ocurre una sola vez, al
+    compilar; después cada sentencia o expresión es una función sin
+    argumentos que se ejecuta directamente. El estado de ejecución
+    (``globals``, ``frame`` y ``output``) vive en un :class:`Interpreter`, de
+    modo que la semántica —incluidos los mensajes de error— es la misma que
+    la del visitante. Cada nombre se resuelve al compilar a un slot
+    ``(profundidad, índice)`` de los layouts de :class:`Resolver` o a
+    ``globals``.
+    """
+
+    def __init__(self, runtime: Interpreter | None = None):
+        self.rt = runtime or Interpreter()
+        self.scopes: List[Dict[str, int]] = []     # layouts léxicos, el actual al final
+
+    # ---- entry -----------------------------------------------------
+    def compile(self, node: ProgramNode) -> Code:
+        if self.rt.layouts is None:
+            self.rt.layouts = Resolver().resolve(node)
+        return self.visit(node)
+
+    def run(self, node: ProgramNode) -> Dict[str, Any]:
+        return self.compile(node)()
+
+    # ---- helpers ---------------------------------------------------
+    def _block(self, stmts: List[ASTNode] | None) -> Tuple[Code, ...]:
+        return tuple(self.visit(st) for st in stmts or [])
+
+    def _resolve(self, name: str) -> Tuple[int, int] | None:
+        for depth, layout in enumerate(reversed(self.scopes)):
+            if name in layout:
+                return depth, layout[name]
+        return None
+
+    def _lookup(self, name: str) -> Code:
+        """Closure que devuelve el valor de ``name`` o ``UNSET`` si no existe."""
+        rt, where = self.rt, self._resolve(name)
+        if where is None:
+            return lambda: rt.globals.get(name, UNSET)
+        depth, slot = where
+
+        def _lookup_slot():
+            frame = rt.frame
+            for _ in range(depth):
+                frame = frame.parent
+            val = frame.values[slot]
+            return rt._lookup(name) if val is UNSET else val
+        return _lookup_slot
+
+    def _load(self, name: str) -> Code:
+        rt, where = self.rt, self._resolve(name)
+        if where is None:
+            def _load_global():
+                try:
+                    return rt.globals[name]
+                except KeyError:
+                    raise RuntimeError(f"Variable '{name}' no definida.") from None
+            return _load_global
+        depth, slot = where
+        if depth == 0:
+            def _load_local():
+                val = rt.frame.values[slot]
+                return rt._load(name) if val is UNSET else val
+            return _load_local
+
+        def _load_outer():
+            frame = rt.frame
+            for _ in range(depth):
+                frame = frame.parent
+            val = frame.values[slot]
+            return rt._load(name) if val is UNSET else val
+        return _load_outer
+
+    def _store(self, name: str) -> Callable[[Any], None]:
+        rt = self.rt
+        slot = self.scopes[-1].get(name) if self.scopes else None
+        if slot is None:
+            def _store_global(value):
+                rt.globals[name] = value
+            return _store_global
+
+        def _store_local(value):
+            rt.frame.values[slot] = value
+        return _store_local
+
+    def generic_visit(self, node: ASTNode):
+        raise RuntimeError(f"Nodo no soportado por el compilador: {type(node).__name__}")
+
+    # ---- programa --------------------------------------------------
+    def visit_ProgramNode(self, node: ProgramNode):
+        rt, body = self.rt, self._block(node.body)
+
+        def _program():
+            for st in body:
+                st()
+            return {"output": rt.output, "globals": rt.globals}
+        return _program
+
+    # --- declaraciones ---------------------------------------------
+    def visit_FunctionNode(self, node: FunctionNode):
+        rt, store = self.rt, self._store(node.name)
+        layout = rt.layouts[node]
+        param_slots = tuple(layout[p] for p in node.params)
+        tick = rt.budget.tick
+        self.scopes.append(layout)
+        body = self._block(node.body)
+        self.scopes.pop()
+
+        def _define():
+            parent = rt.frame
+
+            def _fn(*args):
+                tick()
+                if rt.call_depth >= MAX_CALL_DEPTH:
+                    raise RecursionError(f"más de {MAX_CALL_DEPTH} llamadas anidadas")
+                frame = Frame(layout, parent)
+                for slot, val in zip(param_slots, args):
+                    frame.values[slot] = val
+                caller, rt.frame = rt.frame, frame
+                rt.call_depth += 1
+                try:
+                    for st in body:
+                        st()
+                except _ReturnSignal as rs:
+                    result = rs.value
+                else:
+                    result = None
+                finally:
+                    rt.frame = caller
+                    rt.call_depth -= 1
+                return result
+            store(_fn)
+        return _define
+
+    def visit_ClassNode(self, node: ClassNode):
+        rt, store = self.rt, self._store(node.name)
+        scopes, self.scopes = self.scopes, []
+        body = self._block(node.body)
+        self.scopes = scopes
+
+        def _class():
+            cls_dict: Dict[str, Any] = {}
+            orig_globals, orig_frame = rt.globals, rt.frame
+            rt.globals, rt.frame = cls_dict, None
+            try:
+                for st in body:
+                    st()
+            finally:
+                rt.globals, rt.frame = orig_globals, orig_frame
+            store(cls_dict)
+        return _class
+
+    def visit_ImportNode(self, node: ImportNode):
+        names = [(self._store(alias or mod.split(".")[0]), mod) for mod, alias in node.names]
+
+        def _import():
+            for store, mod in names:
+                store(__import__(mod))
+        return _import
+
+    # --- control de flujo ------------------------------------------
+    def visit_IfNode(self, node: IfNode):
+        branches = ((self.visit(node.cond), self._block(node.body)),) + tuple(
+            (self.visit(c), self._block(b)) for c, b in node.elif_blocks
+        )
+        else_body = self._block(node.else_body)
+
+        def _if():
+            for cond, body in branches:
+                if cond():
+                    for st in body:
+                        st()
+                    return
+            for st in else_body:
+                st()
+        return _if
+
+    def visit_WhileNode(self, node: WhileNode):
+        cond, body = self.visit(node.cond), self._block(node.body)
+        tick = self.rt.budget.tick
+
+        def _while():
+            while cond():
+                tick()
+                for st in body:
+                    st()
+        return _while
+
+    def visit_ForNode(self, node: ForNode):
+        store = self._store(node.target)
+        iterable, body = self.visit(node.iterable), self._block(node.body)
+        tick = self.rt.budget.tick
+
+        def _for():
+            for val in iterable():
+                tick()
+                store(val)
+                for st in body:
+                    st()
+        return _for
+
+    def visit_TryNode(self, node: TryNode):
+        body = self._block(node.body)
+        handlers = tuple(
+            (
+                h.exc.split()[0] if h.exc else None,
+                self._store(h.exc.split(" as ")[-1]) if h.exc and " as " in h.exc else None,
+                self._block(h.body),
+            )
+            for h in node.handlers
+        )
+        else_body = self._block(node.else_body)
+        finally_body = self._block(node.finally_body)
+
+        def _try():
+            try:
+                for st in body:
+                    st()
+            except Exception as e:
+                for exc_name, alias, hbody in handlers:
+                    if exc_name is None or exc_name == type(e).__name__:
+                        if alias:
+                            alias(e)
+                        for st in hbody:
+                            st()
+                        break
+                else:
+                    raise
+            else:
+                for st in else_body:
+                    st()
+            finally:
+                for st in finally_body:
+                    st()
+        return _try
+
+    # --- sentencias simples ----------------------------------------
+    def visit_PassNode(self, node: PassNode):
+        return lambda: None
+
+    def visit_BreakNode(self, node: BreakNode):
+        def _break():
+            raise RuntimeError("'break' fuera de contexto soportado (no implementado).")
+        return _break
+
+    def visit_ReturnNode(self, node: ReturnNode):
+        value = self.visit(node.value) if node.value else (lambda: None)
+
+        def _return():
+            raise _ReturnSignal(value())
+        return _return
+
+    def visit_AssignmentNode(self, node: AssignmentNode):
+        store, value = self._store(node.target), self.visit(node.value)
+
+        def _assign():
+            store(value())
+        return _assign
+
+    def visit_AugmentedAssignmentNode(self, node: AugmentedAssignmentNode):
+        lookup, store = self._lookup(node.target), self._store(node.target)
+        value = self.visit(node.value)
+        op_fn, op = Interpreter.BIN_OPS.get(node.op), node.op
+
+        def _augassign():
+            val = lookup()
+            if val is UNSET:
+                val = 0
+            rhs = value()
+            if op_fn is None:
+                raise RuntimeError(f"Operador compuesto no soportado: {op}")
+            store(op_fn(val, rhs))
+        return _augassign
+
+    # --- expresiones -----------------------------------------------
+    def visit_IdentifierNode(self, node: IdentifierNode):
+        return self._load(node.name)
+
+    def visit_ConstantNode(self, node: ConstantNode):
+        value = self.rt.visit_ConstantNode(node)
+        return lambda: value
+
+    def visit_StringNode(self, node: StringNode):
+        value = self.rt.visit_StringNode(node)
+        return lambda: value
+
+    def visit_ListNode(self, node: ListNode):
+        elems = self._block(node.elements)
+        return lambda: [e() for e in elems]
+
+    def visit_DictNode(self, node: DictNode):
+        pairs = tuple((self.visit(k), self.visit(v)) for k, v in node.pairs)
+        return lambda: {k(): v() for k, v in pairs}
+
+    def visit_TupleNode(self, node: TupleNode):
+        elems = self._block(node.elements)
+        return lambda: tuple(e() for e in elems)
+
+    def visit_UnaryOpNode(self, node: UnaryOpNode):
+        op_fn, op, operand = Interpreter.UN_OPS.get(node.op), node.op, self.visit(node.operand)
+        if op_fn is None:
+            def _unsupported():
+                raise RuntimeError(f"Operador unario '{op}' no soportado.")
+            return _unsupported
+        return lambda: op_fn(operand())
+
+    def visit_BinaryOpNode(self, node: BinaryOpNode):
+        op_fn, op = Interpreter.BIN_OPS.get(node.op), node.op
+        left, right = self.visit(node.left), self.visit(node.right)
+        if op_fn is None:
+            def _unsupported():
+                raise RuntimeError(f"Operador binario '{op}' no soportado.")
+            return _unsupported
+        return lambda: op_fn(left(), right())
+
+    def visit_CompareNode(self, node: CompareNode):
+        first = self.visit(node.left)
+        steps = tuple((Interpreter.BIN_OPS[op], self.visit(c)) for op, c in zip(node.ops, node.comparators))
+
+        def _compare():
+            left = first()
+            for op_fn, comparator in steps:
+                right = comparator()
+                result = op_fn(left, right)
+                if not result:
+                    return result
+                left = right
+            return result
+        return _compare
+
+    def visit_IndexNode(self, node: IndexNode):
+        obj, index = self.visit(node.obj), self.visit(node.index)
+
+        def _index():
+            container, key = obj(), index()
+            try:
+                return container[key]
+            except Exception as e:
+                raise RuntimeError(f"Error al indexar: {e}")
+        return _index
+
+    def visit_AttributeNode(self, node: AttributeNode):
+        obj, attr = self.visit(node.obj), node.attr
+
+        def _attribute():
+            try:
+                return getattr(obj(), attr)
+            except AttributeError:
+                raise RuntimeError(f"Objeto no tiene atributo '{attr}'.") from None
+        return _attribute
+
+    def visit_FunctionCallNode(self, node: FunctionCallNode):
+        rt, name, args = self.rt, node.name, self._block(node.args)
+        lookup = self._lookup(name)
+
+        def _call():
+            vals = [a() for a in args]
+            fn = lookup()
+            if fn is not UNSET:
+                return fn(*vals)
+            return rt._call_builtin(name, vals)
+        return _call
+
+    def visit_MethodCallNode(self, node: MethodCallNode):
+        load_obj = self._load(node.obj)
+        method_name, args = node.method, self._block(node.args)
+
+        def _method_call():
+            method = getattr(load_obj(), method_name, None)
+            if method is None:
+                raise RuntimeError(f"Objeto no tiene método '{method_name}'.")
+            return method(*[a() for a in args])
+        return _method_call
+
+
+def compile_program(ast: ProgramNode) -> Code:
+    """Compila ``ast`` y devuelve una función que lo ejecuta al llamarla."""
+    return ClosureCompiler().compile(ast)
@@ -0,0 +1,663 @@
+from __future__ import annotations
+
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, Dict, List, Set, Tuple
+
+from lexer import LAYOUT_TYPES, LineIndex, Token, iter_chunks
+from metrics import PhaseRecorder, phase
+from parser import NESTING_ERROR, Parser, ProgramNode, node_span
+from semantic import SemanticAnalyzer
+from serializer import RawJSON, dump_ast
+
+# Memoria aproximada de un documento analizado por carácter de código
+# (texto, tokens, nodos, JSON y resultados semánticos de cada sentencia)
+BYTES_PER_CHAR = 80
+
+# ---------------------------------------------------------------------
+#  Análisis semántico por sentencia de primer nivel
+# ---------------------------------------------------------------------
+# Las declaraciones del entorno global se indexan por (tipo, nombre), con
+# tipo 'g' (variable global), 'f' (función) o 'c' (clase).
+Decls = Dict[Tuple[str, str], Set['_UnitSemantics']]
+
+
+class _UnitSemantics:
+    """Resultado del análisis de la sentencia de primer nivel ``index``."""
+    __slots__ = ('index', 'errors', 'messages', 'used', 'declared')
+
+    def __init__(self, index, errors, used, declared):
+        self.index = index
+        self.errors = errors        # [(mensaje, posición relativa a la sentencia o None)]
+        self.messages = None        # errores ya ubicados en el texto (ver Document._messages)
+        self.used = used            # nombre consultado → estado antes de la sentencia
+        self.declared = declared    # {(tipo, nombre)} que agrega al entorno global
+
+
+def _declared_before(decls: Decls, kind: str, name: str, index: int) -> bool:
+    return any(sem.index < index for sem in decls.get((kind, name), ()))
+
+
+def _status(decls: Decls, name: str, index: int):
+    return (_declared_before(decls, 'g', name, index),
+            _declared_before(decls, 'f', name, index),
+            _declared_before(decls, 'c', name, index))
+
+
+class _Env:
+    """Nombres de un tipo declarados antes de la sentencia ``index``, más
+    los que ella misma agrega.
+
+    Sustituye a los dicts del entorno global de :class:`SemanticAnalyzer`
+    (que solo usa ``in`` y asignación) sin copiar el de todo el programa.
+    """
+    __slots__ = ('decls', 'kind', 'index', 'local')
+
+    def __init__(self, decls: Decls, kind: str, index: int):
+        self.decls = decls
+        self.kind = kind
+        self.index = index
+        self.local: Dict[str, Any] = {}
+
+    def __contains__(self, name):
+        return name in self.local or _declared_before(self.decls, self.kind, name, self.index)
+
+    def __setitem__(self, name, value):
+        self.local[name] = value
+
+
+class _UnitAnalyzer(SemanticAnalyzer):
+    """Analiza una sentencia de primer nivel viendo solo las declaraciones
+    de las anteriores, y registra qué nombres consultó y cuáles declaró."""
+
+    def __init__(self, decls: Decls, index: int):
+        super().__init__()
+        self.index = index
+        self.scopes = [_Env(decls, 'g', index)]
+        self.functions = _Env(decls, 'f', index)
+        self.classes = _Env(decls, 'c', index)
+        self.used: Set[str] = set()
+
+    def _is_declared(self, name: str) -> bool:
+        self.used.add(name)
+        return super()._is_declared(name)
+
+    def visit_FunctionNode(self, node):
+        self.used.add(node.name)
+        super().visit_FunctionNode(node)
+
+    def visit_ClassNode(self, node):
+        self.used.add(node.name)
+        super().visit_ClassNode(node)
+
+    def visit_FunctionCallNode(self, node):
+        self.used.add(node.name)
+        super().visit_FunctionCallNode(node)
+
+    def _error(self, message, node):
+        # La sentencia puede moverse con las ediciones: la posición se guarda
+        # relativa a su inicio y el Document la ubica al armar los mensajes
+        self.errors.append((message, node_span(node)[0]))
+
+    def run(self, node) -> _UnitSemantics:
+        self.visit(node)
+        base = node_span(node)[0]
+        self.errors = [(message, None if start is None or base is None else start - base)
+                       for message, start in self.errors]
+        decls = self.functions.decls
+        used = {name: _status(decls, name, self.index) for name in self.used}
+        declared = {(env.kind, name) for env in (self.scopes[0], self.functions, self.classes)
+                    for name in env.local}
+        return _UnitSemantics(self.index, self.errors, used, declared)
+
+
+# ---------------------------------------------------------------------
+#  Líneas del documento
+# ---------------------------------------------------------------------
+class _ChunkLineIndex(LineIndex):
+    """:class:`lexer.LineIndex` armado con los fragmentos del documento.
+
+    Cada fragmento empieza al inicio de una línea: basta con saber cuántos
+    saltos tiene cada uno para ubicar su primera línea, y dentro de él se
+    cuentan en el texto. Tras una edición solo se recuentan los fragmentos
+    re-tokenizados, en vez de recorrer todo el documento.
+    """
+    __slots__ = ('text', 'bounds', 'first_lines')
+
+    def __init__(self, text: str, chunk_chars: List[int], chunk_lines: List[int]):
+        self.text = text
+        self.bounds = list(accumulate(chunk_chars, initial=0))
+        self.first_lines = list(accumulate(chunk_lines, initial=1))
+
+    def _chunk(self, offset: int) -> int:
+        # El último límite es el final del texto, no el inicio de una línea
+        return min(bisect_right(self.bounds, offset), len(self.bounds) - 1) - 1
+
+    def line(self, offset: int) -> int:
+        k = self._chunk(offset)
+        return self.first_lines[k] + self.text.count('\n', self.bounds[k], offset)
+
+    def position(self, offset: int):
+        k = self._chunk(offset)
+        begin = self.bounds[k]
+        line_start = self.text.rfind('\n', begin, offset) + 1 or begin
+        return self.first_lines[k] + self.text.count('\n', begin, offset), offset - line_start
+
+
+# ---------------------------------------------------------------------
+#  Resumen léxico por fragmento
+# ---------------------------------------------------------------------
+def _chunk_keys(tokens) -> Dict[str, Dict[str, None]]:
+    """tipo → {valor: None} en orden de primera aparición (como ``TokenStats``,
+    sin los tokens de estructura)."""
+    keys: Dict[str, Dict[str, None]] = {}
+    for tok in tokens:
+        if tok.type in LAYOUT_TYPES:
+            continue
+        seen = keys.get(tok.type)
+        if seen is None:
+            seen = keys[tok.type] = {}
+        seen[tok.value] = None
+    return keys
+
+
+def _count(counts: Dict[str, int], tokens, step: int):
+    """Suma ``step`` a ``counts`` por cada token (sin los de estructura)."""
+    for tok in tokens:
+        type_ = tok.type
+        if type_ in LAYOUT_TYPES:
+            continue
+        n = counts.get(type_, 0) + step
+        if n:
+            counts[type_] = n
+        else:
+            del counts[type_]
+
+
+def _merge(parts, into=None):
+    """Une resúmenes léxicos conservando el orden de primera aparición."""
+    merged = {t: dict(vals) for t, vals in into.items()} if into else {}
+    for part in parts:
+        for type_, values in part.items():
+            seen = merged.get(type_)
+            if seen is None:
+                merged[type_] = dict(values)
+            else:
+                seen.update(values)
+    return merged
+
+
+def _discard(index: dict, key, sem):
+    entries = index[key]
+    entries.discard(sem)
+    if not entries:
+        del index[key]
+
+
+def _same(a, b) -> bool:
+    # Posiciones relativas al fragmento: un token que solo se movió junto
+    # con todo su fragmento cuenta como igual
+    return a.type == b.type and a.value == b.value and a.start == b.start
+
+
+def _indices_of_none(items: list):
+    """Posiciones de los ``None`` de ``items`` (la búsqueda la hace ``list.index``)."""
+    i = -1
+    while True:
+        try:
+            i = items.index(None, i + 1)
+        except ValueError:
+            return
+        yield i
+
+
+# ---------------------------------------------------------------------
+#  Documento con análisis incremental
+# ---------------------------------------------------------------------
+class Document:
+    """Programa abierto en el editor que se re-analiza por partes.
+
+    * Léxico: el texto se divide en fragmentos de primer nivel (ver
+      :func:`lexer.iter_chunks`). Una edición (:meth:`apply`) solo vuelve a
+      tokenizar los fragmentos que toca, hasta re-sincronizarse con los del
+      texto anterior.
+    * Sintaxis: :meth:`parse` re-parsea solo las sentencias de primer nivel
+      cuyos tokens cambiaron y reutiliza los nodos (y su JSON) del resto.
+    * Semántica: :meth:`semantics` analiza las sentencias nuevas y las que
+      consultan un nombre cuya declaración cambió; las demás conservan sus
+      errores.
+
+    El resultado es el mismo que al analizar el texto completo con
+    ``analyze_source``. Las posiciones de los tokens en ``tokens`` son
+    relativas a su fragmento y las de los nodos reutilizados (``start``,
+    ``end``, ``line``) son las del texto en que se parsearon. Quien use un
+    documento desde varios hilos debe tomar ``lock``.
+    """
+
+    def __init__(self, code: str = ''):
+        self.lock = threading.Lock()
+        self.version = 0
+        self._reset(code)
+
+    def _reset(self, code: str):
+        self.text = code
+        self._lines = None
+        # Desde dónde (y si solo en esa línea) pudieron moverse las
+        # sentencias desde que se ubicaron sus errores
+        self._moved = None
+        self.lex_error = None
+        self.tokens = []
+        self.counts: Dict[str, int] = {}
+        # Fragmentos: caracteres, saltos de línea, número de tokens y
+        # resumen léxico de cada uno
+        self._chunk_chars: List[int] = []
+        self._chunk_lines: List[int] = []
+        self._chunk_ntokens: List[int] = []
+        self._chunk_keys: List[Dict[str, Dict[str, None]]] = []
+        self._unique = None
+        # Rango de fragmentos editado desde que se calcularon los resúmenes
+        # del texto anterior y posterior a él (``_outer``)
+        self._hot = None
+        self._outer = None
+        # Sentencias del último parseo exitoso: nodo, número de tokens,
+        # errores de sintaxis, JSON y análisis semántico de cada una. Los
+        # errores son ``(mensaje, posición relativa a la sentencia)``
+        self.nodes: List[Any] = []
+        self._unit_ntokens: List[int] = []
+        self._syntax: List[List[Tuple[str, int]]] = []
+        self._jsons: List[str | None] = []
+        self._sems: List[_UnitSemantics | None] = []
+        self._ast = None
+        # Tokens que cubría ese parseo y (prefijo, sufijo) de ``tokens`` que
+        # no cambiaron desde entonces; ``None`` si no cambió nada
+        self._parsed_len = 0
+        self._dirty = (0, 0)
+        # Índices del análisis semántico y nombres cuya declaración cambió
+        self._decls: Decls = {}
+        self._users: Dict[str, Set[_UnitSemantics]] = {}
+        self._changed_names: Set[str] = set()
+        self._errors = None
+        try:
+            chunks = list(iter_chunks(code))
+        except SyntaxError as e:    # p. ej. IndentationError del tokenizador
+            self.lex_error = str(e)
+            return
+        for start, end, tokens in chunks:
+            self._chunk_chars.append(end - start)
+            self._chunk_lines.append(code.count('\n', start, end))
+            self._chunk_ntokens.append(len(tokens))
+            self._chunk_keys.append(_chunk_keys(tokens))
+            self.tokens.extend(tokens)
+        _count(self.counts, self.tokens, 1)
+
+    # ---- edición -----------------------------------------------------
+    def apply_changes(self, changes):
+        """Aplica en orden una lista de cambios ``{start, end, text}``.
+
+        Cada cambio reemplaza ``text[start:end]`` (posiciones en caracteres
+        del texto que dejó el cambio anterior). Se validan todos antes de
+        aplicar el primero: si uno es inválido se lanza ``ValueError`` y el
+        documento queda intacto.
+        """
+        if not isinstance(changes, list):
+            raise ValueError("'changes' debe ser un arreglo de objetos {start, end, text}.")
+        size = len(self.text)
+        for change in changes:
+            if not isinstance(change, dict):
+                raise ValueError("Cada cambio debe ser un objeto {start, end, text}.")
+            start, end, text = change.get('start'), change.get('end'), change.get('text', '')
+            if not all(isinstance(v, int) and not isinstance(v, bool) for v in (start, end)):
+                raise ValueError("'start' y 'end' deben ser enteros.")
+            if not isinstance(text, str):
+                raise ValueError("'text' debe ser una cadena.")
+            if not 0 <= start <= end <= size:
+                raise ValueError(f"Cambio fuera del documento: [{start}, {end}) con longitud {size}.")
+            size += len(text) - (end - start)
+        for change in changes:
+            self.apply(change['start'], change['end'], change.get('text', ''))
+
+    def apply(self, start: int, end: int, text: str):
+        """Reemplaza ``self.text[start:end]`` por ``text`` y re-tokeniza lo afectado."""
+        new_text = self.text[:start] + text + self.text[end:]
+        if self.lex_error is not None:
+            self._reset(new_text)
+            return
+        nchunks = len(self._chunk_chars)
+        bounds = list(accumulate(self._chunk_chars, initial=0))
+        k0 = max(min(bisect_right(bounds, start) - 1, nchunks - 1), 0)
+        if k0 > 0 and bounds[k0] == start:
+            # Lo insertado al inicio de una línea puede cambiar su sangría:
+            # se re-tokeniza desde el fragmento anterior
+            k0 -= 1
+
+        # Re-tokenizar desde el fragmento k0 hasta volver a un inicio de
+        # fragmento del texto anterior que quede después del cambio
+        edit_end = start + len(text)
+        delta = len(text) - (end - start)
+        chars, lines, ntokens, keys, new_tokens = [], [], [], [], []
+        k1 = nchunks
+        try:
+            for lo, hi, tokens in iter_chunks(new_text, bounds[k0]):
+                chars.append(hi - lo)
+                lines.append(new_text.count('\n', lo, hi))
+                ntokens.append(len(tokens))
+                keys.append(_chunk_keys(tokens))
+                new_tokens.extend(tokens)
+                if edit_end <= hi < len(new_text):
+                    j = bisect_left(bounds, hi - delta, k0)
+                    if j < nchunks and bounds[j] == hi - delta:
+                        k1 = j
+                        break
+        except SyntaxError:
+            self._reset(new_text)
+            return
+
+        marks = list(accumulate(self._chunk_ntokens, initial=0))
+        a, b = marks[k0], marks[k1]
+        old_tokens = self.tokens[a:b]
+        # Lo que no cambió a los lados no cuenta como modificado
+        p, limit = 0, min(len(old_tokens), len(new_tokens))
+        while p < limit and _same(old_tokens[p], new_tokens[p]):
+            p += 1
+        q = 0
+        while q < limit - p and _same(old_tokens[-1 - q], new_tokens[-1 - q]):
+            q += 1
+        _count(self.counts, old_tokens[p:len(old_tokens) - q], -1)
+        _count(self.counts, new_tokens[p:len(new_tokens) - q], 1)
+        self._mark_dirty(a + p, b - q, len(new_tokens) - p - q)
+
+        old_keys = _merge(self._chunk_keys[k0:k1])
+        new_keys = _merge(keys)
+        if [(t, list(v)) for t, v in old_keys.items()] != [(t, list(v)) for t, v in new_keys.items()]:
+            self._unique = None
+        hot = self._hot
+        if hot is not None and hot[0] <= k0 and k1 <= hot[1]:
+            self._hot = (hot[0], hot[1] - (k1 - k0) + len(chars))
+        else:
+            self._hot = (k0, k0 + len(chars))
+            self._outer = None
+
+        self.tokens[a:b] = new_tokens
+        self._chunk_chars[k0:k1] = chars
+        self._chunk_lines[k0:k1] = lines
+        self._chunk_ntokens[k0:k1] = ntokens
+        self._chunk_keys[k0:k1] = keys
+        # Lo que sigue a la edición se mueve; si no se agregaron ni quitaron
+        # líneas, solo cambian las columnas en la línea de la edición
+        same_line = self._moved is None and '\n' not in text and '\n' not in self.text[start:end]
+        self._moved = (start if self._moved is None else min(start, self._moved[0]), same_line)
+        self.text = new_text
+        self._lines = None
+
+    def _mark_dirty(self, a: int, b: int, count: int):
+        """Registra que ``tokens[a:b]`` se reemplazará por ``count`` tokens."""
+        n = len(self.tokens)
+        lo, tail = self._dirty if self._dirty is not None else (n, n)
+        lo = min(lo, a)
+        tail = min(tail, n - b, n - (b - a) + count - lo, self._parsed_len - lo)
+        self._dirty = (lo, max(tail, 0))
+
+    def _line_index(self) -> LineIndex:
+        if self._lines is None:
+            self._lines = _ChunkLineIndex(self.text, self._chunk_chars, self._chunk_lines)
+        return self._lines
+
+    def _absolute_tokens(self, first: int):
+        """Genera ``tokens[first:]`` con las posiciones en el texto completo."""
+        marks = list(accumulate(self._chunk_ntokens, initial=0))
+        bounds = list(accumulate(self._chunk_chars, initial=0))
+        tokens = self.tokens
+        for k in range(bisect_right(marks, first) - 1, len(self._chunk_ntokens)):
+            base = bounds[k]
+            for tok in tokens[max(first, marks[k]):marks[k + 1]]:
+                yield Token(tok.type, tok.value, tok.start + base, tok.end + base)
+
+    # ---- léxico ------------------------------------------------------
+    def lex(self) -> Dict[str, Any]:
+        """Resumen léxico con la forma de ``TokenStats.to_dict``."""
+        if self._unique is None:
+            if self._hot is None:
+                merged = _merge(self._chunk_keys)
+            else:
+                h0, h1 = self._hot
+                if self._outer is None:
+                    self._outer = (_merge(self._chunk_keys[:h0]), _merge(self._chunk_keys[h1:]))
+                before, after = self._outer
+                merged = _merge(self._chunk_keys[h0:h1] + [after], before)
+            self._unique = {t: list(vals) for t, vals in merged.items()}
+        return {
+            'tokens'      : self._unique,
+            'counts'      : dict(self.counts),
+            'total_tokens': sum(self.counts.values()),
+        }
+
+    # ---- sintaxis ----------------------------------------------------
+    def parse(self) -> List[Any]:
+        """Actualiza ``nodes`` re-parseando solo las sentencias afectadas.
+
+        Se conservan las sentencias cuyo último token *y el siguiente*
+        quedan antes del primer token modificado: el parser decide dónde
+        termina una sentencia mirando solo el token que le sigue. Desde ahí
+        se parsea hasta que una sentencia termina justo donde empezaba una
+        de las anteriores dentro de la parte final que no cambió; de ahí en
+        adelante se reutilizan. Si el parser falla, no se modifica nada.
+        """
+        if self._dirty is None:
+            return self.nodes
+        lo, tail = self._dirty
+        starts = list(accumulate(self._unit_ntokens, initial=0))
+        nunits = len(self.nodes)
+        keep = max(bisect_left(starts, lo) - 1, 0)
+        shift = len(self.tokens) - self._parsed_len
+        first_tail = bisect_left(starts, self._parsed_len - tail)
+
+        pos = starts[keep]
+        nodes, ntokens, syntax = [], [], []
+        resume = nunits
+        parser = Parser(self._absolute_tokens(pos), self._line_index(), recover=True)
+        errors = parser.errors
+        for node, count in parser.parse_units():
+            nodes.append(node)
+            ntokens.append(count)
+            syntax.append([(e.message, e.where - node.start) for e in errors])
+            errors.clear()
+            pos += count
+            j = bisect_left(starts, pos - shift, first_tail)
+            if j < nunits and starts[j] == pos - shift:
+                resume = j
+                break
+
+        for sem in self._sems[keep:resume]:
+            if sem is not None:
+                self._unregister(sem)
+                self._changed_names.update(name for _, name in sem.declared)
+        self.nodes[keep:resume] = nodes
+        self._unit_ntokens[keep:resume] = ntokens
+        self._syntax[keep:resume] = syntax
+        self._jsons[keep:resume] = [None] * len(nodes)
+        self._sems[keep:resume] = [None] * len(nodes)
+        if len(nodes) != resume - keep:
+            for i in range(keep + len(nodes), len(self._sems)):
+                if self._sems[i] is not None:
+                    self._sems[i].index = i
+        self._ast = None
+        self._errors = None
+        self._parsed_len = len(self.tokens)
+        self._dirty = None
+        return self.nodes
+
+    def ast_json(self) -> RawJSON:
+        """JSON del ``ProgramNode``, armado con el de cada sentencia."""
+        if self._ast is None:
+            jsons = self._jsons
+            for i in _indices_of_none(jsons):
+                jsons[i] = dump_ast(self.nodes[i])
+            self._ast = RawJSON('{"body":[' + ','.join(jsons) + ']}')
+        return self._ast
+
+    def syntax_errors(self) -> List[str]:
+        """Errores de sintaxis del último parseo, ubicados en el texto actual
+        a partir del primer token de su sentencia de primer nivel."""
+        units = [i for i, errors in enumerate(self._syntax) if errors]
+        if not units:
+            return []
+        starts = list(accumulate(self._unit_ntokens, initial=0))
+        marks = list(accumulate(self._chunk_ntokens, initial=0))
+        bounds = list(accumulate(self._chunk_chars, initial=0))
+        index = self._line_index()
+        result = []
+        for i in units:
+            first = starts[i]
+            at = bounds[bisect_right(marks, first) - 1] + self.tokens[first].start
+            result.extend(f"{message} ({index.describe(at + offset)})"
+                          for message, offset in self._syntax[i])
+        return result
+
+    # ---- semántica ---------------------------------------------------
+    def _register(self, sem: _UnitSemantics):
+        for key in sem.declared:
+            self._decls.setdefault(key, set()).add(sem)
+        for name in sem.used:
+            self._users.setdefault(name, set()).add(sem)
+
+    def _unregister(self, sem: _UnitSemantics):
+        for key in sem.declared:
+            _discard(self._decls, key, sem)
+        for name in sem.used:
+            _discard(self._users, name, sem)
+
+    def semantics(self) -> List[str]:
+        """Errores semánticos del programa, analizando solo lo necesario.
+
+        Se analizan, en orden, las sentencias sin resultado y las que
+        consultaron un nombre cuyo estado (declarado como global, función o
+        clase antes de ellas) ya no es el mismo. Cuando una sentencia
+        re-analizada declara algo distinto, se revisan quienes usan esos
+        nombres.
+        """
+        sems = self._sems
+        pending = list(_indices_of_none(sems))
+        changed, self._changed_names = self._changed_names, set()
+        if not pending and not changed and self._errors is not None:
+            return self._errors
+        queued = set(pending)
+
+        def enqueue_users(names):
+            for name in names:
+                for sem in self._users.get(name, ()):
+                    if sem.index not in queued:
+                        queued.add(sem.index)
+                        heapq.heappush(pending, sem.index)
+
+        enqueue_users(changed)
+        while pending:
+            i = heapq.heappop(pending)
+            old = sems[i]
+            if old is not None and all(
+                    _status(self._decls, name, i) == old.used[name]
+                    for name in changed.intersection(old.used)):
+                continue
+            if old is not None:
+                self._unregister(old)
+            sem = sems[i] = _UnitAnalyzer(self._decls, i).run(self.nodes[i])
+            self._register(sem)
+            diff = sem.declared if old is None else sem.declared ^ old.declared
+            names = {name for _, name in diff} - changed
+            changed |= names
+            enqueue_users(names)
+        self._errors = self._messages()
+        return self._errors
+
+    def _messages(self) -> List[str]:
+        """Errores de todas las sentencias, ubicados en el texto actual.
+
+        Cada sentencia guarda sus mensajes ya ubicados; solo se arman los de
+        las sentencias analizadas de nuevo y los de las que se movieron
+        desde el último armado.
+        """
+        sems = self._sems
+        starts = list(accumulate(self._unit_ntokens, initial=0))
+        marks = list(accumulate(self._chunk_ntokens, initial=0))
+        bounds = list(accumulate(self._chunk_chars, initial=0))
+        tokens = self.tokens
+
+        def base(i):
+            first = starts[i]
+            return bounds[bisect_right(marks, first) - 1] + tokens[first].start
+
+        moved, self._moved = self._moved, None
+        if moved is not None:
+            offset, same_line = moved
+            limit = self.text.find('\n', offset) if same_line else -1
+            if limit < 0:
+                limit = len(self.text)
+            # Primera sentencia que empieza en ``offset`` o después
+            k = min(bisect_right(bounds, offset), len(bounds) - 1) - 1
+            first = marks[k]
+            while first < marks[k + 1] and bounds[k] + tokens[first].start < offset:
+                first += 1
+            for i in range(bisect_left(starts, first), len(sems)):
+                if same_line and base(i) > limit:
+                    break
+                sems[i].messages = None
+
+        index = self._line_index()
+        result = []
+        for i, sem in enumerate(sems):
+            if not sem.errors:
+                continue
+            if sem.messages is None:
+                at = base(i)
+                sem.messages = [message + '.' if offset is None else
+                                f"{message} ({index.describe(at + offset)})."
+                                for message, offset in sem.errors]
+            result.extend(sem.messages)
+        return result
+
+    # ---- análisis completo -------------------------------------------
+    def analyze(self, parse: bool = True, check: bool = False,
+                metrics: PhaseRecorder | None = None) -> Dict[str, Any]:
+        """Entrada con la forma de ``analyze_source``: léxico y, si se pide,
+        AST (``parse``) y errores semánticos (``check``).
+
+        Devuelve ``{'error': ...}`` si el tokenizador o el parser fallan o si
+        el programa está tan anidado que se agota la pila al analizarlo; los
+        errores de sintaxis de los que el parser se recupera van en
+        ``syntax_errors``, junto al AST parcial.
+        ``metrics`` recibe las fases ``lex``, ``parse``, ``serialize`` y
+        ``semantics`` (solo el trabajo pendiente tras las ediciones).
+        """
+        if self.lex_error is not None:
+            return {'error': self.lex_error}
+        with phase(metrics, 'lex') as counts:
+            entry = self.lex()
+        counts['tokens'] = entry['total_tokens']
+        if not parse:
+            return entry
+        try:
+            with phase(metrics, 'parse') as counts:
+                self.parse()
+        except RecursionError:
+            return {'error': NESTING_ERROR}
+        except Exception as e:
+            return {'error': str(e)}
+        counts['units'] = len(self.nodes)
+        entry['syntax_errors'] = self.syntax_errors()
+        try:
+            with phase(metrics, 'serialize') as counts:
+                entry['ast'] = self.ast_json()
+            counts['bytes'] = len(entry['ast'])
+            entry['program'] = ProgramNode(list(self.nodes))
+            if check:
+                with phase(metrics, 'semantics') as counts:
+                    entry['semantics'] = list(self.semantics())
+                counts['errors'] = len(entry['semantics'])
+        except RecursionError:
+            return {'error': NESTING_ERROR}
+        return entry
+
+    def size(self) -> int:
+        """Tamaño aproximado en bytes, para acotar cuántos documentos se guardan."""
+        return len(self.text) * BYTES_PER_CHAR
@@ -0,0 +1,375 @@
+import re
+import sys
+import keyword
+from bisect import bisect_right
+from itertools import accumulate
+
+# === TOKENS ================================================================
+
+class Token:
+    """Token compacto: sin ``__dict__`` por instancia.
+
+    ``start`` y ``end`` son las posiciones (en caracteres) donde empieza y
+    termina el token en el código, o None si no se conocen; la línea y la
+    columna se obtienen con :class:`LineIndex`.
+    """
+    __slots__ = ('type', 'value', 'start', 'end')
+
+    def __init__(self, type_, value, start=None, end=None):
+        self.type  = type_
+        self.value = value
+        self.start = start
+        self.end   = end
+    def __repr__(self):
+        return f"Token({self.type}, {self.value})"
+
+# Único token de fin de archivo; el Parser lo devuelve al pasar del final
+EOF = Token('EOF', '')
+
+# Tokens de estructura (fin de línea lógica y cambios de sangría): guían al
+# Parser pero no se contabilizan ni se muestran
+LAYOUT_TYPES = frozenset(('NEWLINE', 'INDENT', 'DEDENT'))
+
+# Conjunto de caracteres que tratamos como puntuación (no operadores aritméticos)
+PUNCTUATION_CHARS = set('()[]{}:.,;')
+
+KEYWORDS = frozenset(keyword.kwlist)
+
+
+class LineIndex:
+    """Convierte posiciones del código en (línea, columna).
+
+    Guarda dónde empieza cada línea (como en ``tokenize``, solo ``\\n``
+    separa líneas); cada consulta es una búsqueda binaria. Las líneas se
+    cuentan desde 1 y las columnas desde 0.
+    """
+    __slots__ = ('starts',)
+
+    def __init__(self, code: str):
+        self.starts = list(accumulate((len(part) + 1 for part in code.split('\n')[:-1]), initial=0))
+
+    def line(self, offset: int) -> int:
+        return bisect_right(self.starts, offset)
+
+    def position(self, offset: int):
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1]
+
+    def describe(self, offset: int) -> str:
+        """``'línea L, columna C'`` para mensajes (columna desde 1)."""
+        line, col = self.position(offset)
+        return f"línea {line}, columna {col + 1}"
+
+# === LÉXICO ================================================================
+#
+# Escáner de una sola pasada sobre el texto: una expresión regular con una
+# alternativa por clase de token decide qué viene en cada posición. Acepta
+# lo mismo que el módulo ``tokenize`` de Python 3.11 (números, prefijos de
+# cadena, operadores) y conserva sus casos límite: los caracteres que no
+# forman ningún token se descartan, una cadena triple sin cerrar termina
+# el análisis y una cadena continuada con ``\`` que no se cierra se
+# descarta hasta el final de la línea donde se corta.
+
+def _group(*choices):
+    return '(?:' + '|'.join(choices) + ')'
+
+_PREFIX = r'(?:[bB][rR]?|[rR][bBfF]?|[uU]|[fF][rR]?)?'
+
+_DIGITS = r'[0-9](?:_?[0-9])*'
+_EXPONENT = r'[eE][-+]?' + _DIGITS
+_POINTFLOAT = (_group(_DIGITS + r'\.(?:' + _DIGITS + ')?', r'\.' + _DIGITS)
+               + '(?:' + _EXPONENT + ')?')
+_FLOAT = _group(_POINTFLOAT, _DIGITS + _EXPONENT)
+_INT = _group(r'0[xX](?:_?[0-9a-fA-F])+', r'0[bB](?:_?[01])+', r'0[oO](?:_?[0-7])+',
+              r'(?:0(?:_?0)*|[1-9](?:_?[0-9])*)')
+_NUMBER = _group(_DIGITS + '[jJ]', _FLOAT + '[jJ]', _FLOAT, _INT)
+
+OPERATORS = (
+    '!=', '%', '%=', '&', '&=', '(', ')', '*', '**', '**=', '*=', '+', '+=',
+    ',', '-', '-=', '->', '.', '...', '/', '//', '//=', '/=', ':', ':=', ';',
+    '<', '<<', '<<=', '<=', '=', '==', '>', '>=', '>>', '>>=', '@', '@=',
+    '[', ']', '^', '^=', '{', '|', '|=', '}', '~',
+)
+# Los mismos OPERATORS, de mayor a menor longitud, escritos con clases de
+# caracteres: una alternativa por operador hace lento cada intento
+_OPERATOR = (r'\*\*=?|//=?|>>=?|<<=?|->|:=|\.\.\.'
+             r'|[-+*/%&|^@=<>!]=|[-+*/%&|^@=<>~()\[\]{}:.,;]')
+# Operador → (tipo, valor internado): la clasificación se hace una sola vez
+_OPERATOR_TOKENS = {
+    op: ('PUNCTUATION' if op in PUNCTUATION_CHARS else 'OPERATOR', sys.intern(op))
+    for op in OPERATORS
+}
+
+# Cuerpo de una cadena simple, sin la comilla de cierre
+_SINGLE = r"'[^\n'\\]*(?:\\.[^\n'\\]*)*"
+_DOUBLE = r'"[^\n"\\]*(?:\\.[^\n"\\]*)*'
+
+# Las alternativas se prueban en orden; las más frecuentes van primero y las
+# costosas se protegen con su primer carácter. El resultado es el de
+# tokenize: un nombre seguido de comilla puede ser el prefijo de una cadena
+# y un punto seguido de dígito empieza un número.
+# ``(?![\w'"])`` hace que el nombre no se recorte al retroceder (como un
+# grupo atómico, que ``re`` solo admite desde Python 3.11).
+_TOKEN = re.compile(r'[ \f\t]*' + _group(
+    r'''(?P<ident>[^\W\d]\w*(?![\w'"]))''',
+    r'(?P<op>(?!\.[0-9])(?:' + _OPERATOR + '))',
+    r'(?P<nl>\r?\n)',
+    r'(?=[0-9.])(?P<number>' + _NUMBER + ')',
+    r'''(?=[bBrRuUfF]{0,2}['"])''' + _group(
+        r'(?P<triple>' + _PREFIX + r"(?:'''|" + r'"""))',
+        r'(?P<string>' + _PREFIX + _group(_SINGLE + "'", _DOUBLE + '"') + ')',
+        r'(?P<contstr>' + _PREFIX + _group(_SINGLE, _DOUBLE) + r'\\\r?\n)',
+    ),
+    r'(?P<comment>#[^\r\n]*)',
+    r'(?P<cont>\\\r?\n)',
+    r'(?P<name>\w+)',
+))
+# Resto de una cadena triple (puede abarcar líneas) y de una cadena simple
+# continuada con ``\`` (se busca línea por línea)
+_TRIPLE_END = {
+    "'''": re.compile(r"[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''", re.S),
+    '"""': re.compile(r'[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""', re.S),
+}
+_SINGLE_END = {
+    "'": re.compile(r"[^\n'\\]*(?:\\.[^\n'\\]*)*'"),
+    '"': re.compile(r'[^\n"\\]*(?:\\.[^\n"\\]*)*"'),
+}
+
+# Sangría al inicio de una línea; el grupo 1 llega hasta el primer carácter
+# que no es un espacio
+_BLANKS = re.compile(r'( *)[ \t\f]*')
+
+
+def _indent_column(code: str, begin: int, end: int) -> int:
+    """Columna a la que llega la sangría ``code[begin:end]`` (como en
+    tokenize: el tabulador avanza al siguiente múltiplo de 8 y el salto de
+    página vuelve a 0)."""
+    col = 0
+    for ch in code[begin:end]:
+        if ch == ' ':
+            col += 1
+        elif ch == '\t':
+            col = (col // 8 + 1) * 8
+        else:
+            col = 0
+    return col
+
+
+def _scan(code: str, start: int = 0):
+    """Genera los :class:`Token` de ``code[start:]`` en una sola pasada.
+
+    ``start`` y ``end`` de cada token son posiciones absolutas en ``code``.
+    Además de los tokens del código se generan los de estructura, como en
+    tokenize: ``NEWLINE`` al terminar cada línea lógica (fuera de
+    paréntesis y de continuaciones), ``INDENT`` al inicio de una línea con
+    más sangría que la anterior y un ``DEDENT`` por cada nivel que cierra
+    una línea con menos. Al final del texto se cierran la última línea y
+    todos los niveles abiertos. Las líneas sin tokens (en blanco, con solo
+    un comentario o con caracteres descartados) no cuentan. Una sangría
+    menor que no coincide con ningún nivel abierto lanza
+    ``IndentationError``.
+
+    Cada línea lógica se recorre con un solo ``finditer``, que salta por
+    sí mismo los caracteres que no forman ningún token; solo se vuelve a
+    empezar tras una línea nueva y tras las cadenas triples o continuadas,
+    que se terminan de leer aparte.
+    """
+    finditer = _TOKEN.finditer
+    blanks = _BLANKS.match
+    intern = sys.intern
+    keywords = KEYWORDS
+    operators = _OPERATOR_TOKENS
+    size = len(code)
+    pos = start
+    depth = 0           # paréntesis abiertos (un cierre de más no cuenta)
+    bol = True          # al inicio de una línea lógica
+    fresh = True        # la línea lógica aún no tiene tokens
+    indents = [0]       # columnas de los niveles de sangría abiertos
+    indent_start = indent_end = start
+    while pos < size:
+        if bol:
+            indent = blanks(code, pos)
+            indent_start, pos = pos, indent.end()
+            if pos == size:
+                break
+            if code[pos] in '#\r\n':
+                # Línea en blanco. Como en tokenize: un comentario al inicio
+                # de la línea llega hasta el salto (aunque haya un \r en
+                # medio) y una línea que empieza con \r se ignora completa
+                pos = code.find('\n', pos) + 1 or size
+                continue
+            bol = False
+            indent_end = pos
+            spaces_only = indent.end(1) == pos
+        for m in finditer(code, pos):
+            kind = m.lastgroup
+            begin, pos = m.start(kind), m.end()
+            if fresh and kind != 'nl' and kind != 'comment' and kind != 'cont':
+                # Primer token de la línea lógica: su sangría respecto a la
+                # anterior (una línea sin tokens cuenta como en blanco)
+                fresh = False
+                if spaces_only:
+                    col = indent_end - indent_start
+                else:
+                    col = _indent_column(code, indent_start, indent_end)
+                if col > indents[-1]:
+                    indents.append(col)
+                    yield Token('INDENT', code[indent_start:indent_end], indent_start, indent_end)
+                elif col < indents[-1]:
+                    while col < indents[-1]:
+                        indents.pop()
+                        yield Token('DEDENT', '', indent_end, indent_end)
+                    if col != indents[-1]:
+                        raise IndentationError("La sangría no coincide con ningún nivel exterior "
+                                               f"({LineIndex(code).describe(indent_end)})")
+            if kind == 'ident':
+                text = intern(code[begin:pos])
+                yield Token('KEYWORD' if text in keywords else 'IDENTIFIER', text, begin, pos)
+            elif kind == 'op':
+                type_, text = operators[code[begin:pos]]
+                if type_ == 'PUNCTUATION':
+                    if text in '([{':
+                        depth += 1
+                    elif text in ')]}' and depth:
+                        depth -= 1
+                yield Token(type_, text, begin, pos)
+            elif kind == 'nl':
+                if depth == 0:
+                    bol = True
+                    if not fresh:
+                        fresh = True
+                        yield Token('NEWLINE', code[begin:pos], begin, pos)
+                    break
+            elif kind == 'number':
+                yield Token('CONSTANT', code[begin:pos], begin, pos)
+            elif kind == 'string':
+                yield Token('LITERAL', code[begin:pos], begin, pos)
+            elif kind == 'name':
+                # \w que no empieza identificador (un dígito no ASCII...)
+                # o nombre pegado a una comilla que no es prefijo de cadena
+                text = intern(code[begin:pos])
+                if text[0].isidentifier():
+                    yield Token('KEYWORD' if text in keywords else 'IDENTIFIER', text, begin, pos)
+                else:
+                    yield Token('OPERATOR', text, begin, pos)
+            elif kind == 'triple':
+                end = _TRIPLE_END[code[pos - 3:pos]].match(code, pos)
+                if end is None:
+                    pos = size      # cadena sin cerrar: no hay más tokens
+                    break
+                pos = end.end()
+                yield Token('LITERAL', code[begin:pos], begin, pos)
+                break
+            elif kind == 'contstr':
+                end_quote = _SINGLE_END[code[begin:pos].lstrip('bBrRuUfF')[0]]
+                while pos < size:   # al llegar al final: cadena sin cerrar
+                    nxt = code.find('\n', pos) + 1 or size
+                    end = end_quote.match(code, pos, nxt)
+                    if end is not None:
+                        pos = end.end()
+                        yield Token('LITERAL', code[begin:pos], begin, pos)
+                        break
+                    rest, pos = code[pos:nxt], nxt
+                    if not rest.endswith(('\\\n', '\\\r\n')):
+                        # La cadena incompleta se descarta (con el fin de su línea)
+                        if depth == 0:
+                            bol = fresh = True
+                        break
+                break
+            # comment y cont (``\`` al final de la línea): no generan token
+        else:
+            break                   # no queda ningún token en el texto
+    if not fresh and not code[code.rfind('\n', start) + 1 or start:].lstrip().startswith('#'):
+        # Última línea sin salto (tokenize no la cierra si es un comentario)
+        yield Token('NEWLINE', '', size, size)
+    for _ in indents[1:]:
+        yield Token('DEDENT', '', size, size)
+
+
+def iter_tokens(code: str):
+    """Genera los :class:`Token` de ``code`` uno a uno.
+
+    Al final se genera siempre el sentinela :data:`EOF`. Nada se acumula:
+    el Parser (o :class:`TokenStats`) consume los tokens a medida que se
+    producen.
+    """
+    yield from _scan(code)
+    # EOF solo para el parser (NO se contabiliza ni se muestra)
+    yield EOF
+
+
+def iter_chunks(code: str, start: int = 0):
+    """Divide ``code[start:]`` en fragmentos que se tokenizan por separado.
+
+    Cada fragmento empieza en una línea lógica de primer nivel (columna 0,
+    fuera de paréntesis, cadenas y continuaciones con ``\\``) y llega hasta
+    la siguiente. En esos puntos el escáner no arrastra estado, así que un
+    fragmento produce los mismos tokens aislado que dentro del archivo
+    completo: los ``DEDENT`` que cierran sus bloques quedan al final del
+    fragmento, como al final del texto. ``start`` debe ser uno de esos
+    puntos (o 0).
+
+    Genera ``(inicio, fin, tokens)`` con posiciones absolutas en ``code``;
+    el último fragmento termina en ``len(code)``. El ``start``/``end`` de
+    los tokens es relativo al inicio de su fragmento: un fragmento que no
+    cambia da los mismos tokens aunque se mueva dentro del texto. El texto
+    se recorre bajo demanda: quien deje de iterar no paga por el resto.
+    """
+    chunk_start, tokens = start, []
+    at_line_start = True
+    for tok in _scan(code, start):
+        type_ = tok.type
+        if type_ == 'NEWLINE':
+            at_line_start = True
+        elif at_line_start and type_ != 'DEDENT' and type_ != 'INDENT':
+            at_line_start = False
+            offset = tok.start
+            # Columna 0 y la línea anterior no continúa con ``\``
+            if (offset > chunk_start and code[offset - 1] == '\n'
+                    and not code.endswith(('\\\n', '\\\r\n'), chunk_start, offset)):
+                yield chunk_start, offset, tokens
+                chunk_start, tokens = offset, []
+        tok.start -= chunk_start
+        tok.end -= chunk_start
+        tokens.append(tok)
+    yield chunk_start, len(code), tokens
+
+
+_UNCOUNTED = LAYOUT_TYPES | {'EOF'}
+
+
+class TokenStats:
+    """Estadísticas léxicas para la UI, calculadas al vuelo.
+
+    Los valores únicos de cada categoría se guardan en un dict usado como
+    conjunto ordenado: la pertenencia cuesta O(1) y se conserva el orden
+    de primera aparición que muestra el frontend.
+    """
+
+    def __init__(self):
+        self.unique = {}    # tipo → {valor: None}
+        self.counts = {}
+        self.total_tokens = 0
+
+    def add(self, type_, value):
+        seen = self.unique.get(type_)
+        if seen is None:
+            seen = self.unique[type_] = {}
+        seen[value] = None
+        self.counts[type_] = self.counts.get(type_, 0) + 1
+        self.total_tokens += 1
+
+    def observe(self, tokens):
+        """Deja pasar ``tokens`` sin modificarlos, contabilizando cada uno."""
+        uncounted = _UNCOUNTED
+        for tok in tokens:
+            if tok.type not in uncounted:
+                self.add(tok.type, tok.value)
+            yield tok
+
+    def to_dict(self):
+        return {
+            'tokens'      : {t: list(vals) for t, vals in self.unique.items()},
+            'counts'      : dict(self.counts),
+            'total_tokens': self.total_tokens,
+        }
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+# ---------------------------------------------------------------------
+#  Límites de ejecución
+# ---------------------------------------------------------------------
+# Cada cuántos pasos se consulta el reloj (leerlo en cada paso es caro)
+CHECK_INTERVAL = 1024
+
+# Tope del resultado de una sola operación ``+``, ``*`` o ``**``: no cuenta
+# como paso, así que se acota su tamaño antes de hacerla
+MAX_INT_BITS = 1 << 16
+MAX_SEQ_LEN = 1 << 20
+
+# Llamadas anidadas que admite un programa, igual en los tres motores: al
+# pasarlo, la llamada lanza ``RecursionError``
+MAX_CALL_DEPTH = 1000
+
+# Límite de recursión de Python mientras corre un programa: el intérprete
+# de AST usa varios marcos de Python por cada llamada del programa (7 en
+# una función simple, más si la llamada está dentro de bloques y
+# expresiones anidadas), así que MAX_CALL_DEPTH cabe salvo en cuerpos muy
+# anidados, que agotan antes este límite con el mismo error
+EXEC_RECURSION_LIMIT = 30_000
+# Pila de C de los hilos que ejecutan programas (ver server.py): con el
+# límite de recursión subido, la de 512 KiB de algunas plataformas no basta
+EXEC_STACK_SIZE = 32 << 20
+
+_recursion_lock = threading.Lock()
+_recursion_users = 0        # ejecuciones en curso con el límite subido
+_recursion_saved = 0        # límite que había antes de la primera
+
+
+def affordable(op: str, a: Any, b: Any, max_int_bits: int = MAX_INT_BITS,
+               max_len: int = MAX_SEQ_LEN) -> bool:
+    """¿``a op b`` da un resultado dentro de los topes? Solo se estiman
+    ``+`` (concatenando cadenas, listas o tuplas), ``*`` (entre enteros o
+    repitiendo cadenas, listas y tuplas) y ``**`` entre enteros; el resto
+    de las operaciones se considera barato."""
+    if op == '+':
+        if isinstance(a, (str, list, tuple)) and isinstance(b, (str, list, tuple)):
+            return len(a) + len(b) <= max_len
+    elif op == '*':
+        if isinstance(a, int):
+            if isinstance(b, int):
+                return a.bit_length() + b.bit_length() <= max_int_bits
+            if isinstance(b, (str, list, tuple)):
+                return len(b) * a <= max_len
+        elif isinstance(b, int) and isinstance(a, (str, list, tuple)):
+            return len(a) * b <= max_len
+    elif op == '**' and isinstance(a, int) and isinstance(b, int):
+        return b < 0 or abs(a) <= 1 or a.bit_length() * b <= max_int_bits
+    return True
+
+
+class ExecutionLimitExceeded(BaseException):
+    """Se agotó el presupuesto de pasos, el tiempo o la memoria de una
+    ejecución. ``detail`` describe el caso de ``"memory"``: una operación
+    por encima de los topes de :func:`affordable` o un ``MemoryError``.
+
+    Hereda de ``BaseException`` para que un ``try/except`` del programa
+    ejecutado no pueda atraparla y seguir corriendo.
+    """
+
+    def __init__(self, reason: str, steps: int, max_steps: int | None, timeout: float | None,
+                 detail: str | None = None):
+        self.reason = reason          # "steps" | "timeout" | "memory"
+        self.steps = steps
+        self.max_steps = max_steps
+        self.timeout = timeout
+        if reason == "steps":
+            msg = f"Límite de {max_steps} pasos excedido."
+        elif reason == "memory":
+            msg = f"Límite de memoria excedido tras {steps} pasos: {detail or 'memoria agotada'}."
+        else:
+            msg = f"Tiempo límite de {timeout} s excedido tras {steps} pasos."
+        super().__init__(msg)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "reason"   : self.reason,
+            "message"  : str(self),
+            "steps"    : self.steps,
+            "max_steps": self.max_steps,
+            "timeout"  : self.timeout,
+        }
+
+
+class StepBudget:
+    """Presupuesto de pasos y plazo de reloj de una ejecución.
+
+    Los motores llaman a :meth:`tick` por cada paso: una iteración de bucle
+    o una llamada a función en los intérpretes, una instrucción en el
+    ensamblador. ``None`` en ``max_steps`` o ``timeout`` desactiva ese
+    límite; el plazo corre desde que se crea el presupuesto. Una vez
+    excedido, cada ``tick`` posterior vuelve a lanzar la excepción.
+
+    El plazo solo se revisa en un ``tick``: lo que pasa entre dos pasos (una
+    expresión, por cara que sea) no se interrumpe. Por eso ``+``, ``*`` y
+    ``**`` se acotan aparte, con :func:`affordable`; los motores reportan
+    un ``MemoryError`` con :meth:`memory_exceeded`.
+    """
+
+    __slots__ = ("max_steps", "timeout", "steps", "deadline", "_next_check")
+
+    def __init__(self, max_steps: int | None = None, timeout: float | None = None):
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.steps = 0
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self._next_check = 0
+        self._schedule()
+
+    def tick(self):
+        self.steps += 1
+        if self.steps >= self._next_check:
+            self._check()
+
+    def memory_exceeded(self, exc: MemoryError) -> ExecutionLimitExceeded:
+        """El límite ``"memory"`` que corresponde a ``exc`` en este punto."""
+        return ExecutionLimitExceeded("memory", self.steps, self.max_steps, self.timeout,
+                                      str(exc) or None)
+
+    def _check(self):
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise ExecutionLimitExceeded("steps", self.max_steps, self.max_steps, self.timeout)
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise ExecutionLimitExceeded("timeout", self.steps, self.max_steps, self.timeout)
+        self._schedule()
+
+    def _schedule(self):
+        if self.deadline is not None:
+            nxt = self.steps + CHECK_INTERVAL
+        else:
+            nxt = float("inf")
+        if self.max_steps is not None:
+            nxt = min(nxt, self.max_steps + 1)
+        self._next_check = nxt
+
+
+@contextmanager
+def recursion_limit(limit: int = EXEC_RECURSION_LIMIT):
+    """Sube el límite de recursión de Python mientras dura el bloque.
+
+    El límite es del proceso: con varias ejecuciones a la vez (en hilos)
+    se restaura el anterior cuando termina la última.
+    """
+    global _recursion_users, _recursion_saved
+    with _recursion_lock:
+        if _recursion_users == 0:
+            _recursion_saved = sys.getrecursionlimit()
+            sys.setrecursionlimit(max(limit, _recursion_saved))
+        _recursion_users += 1
+    try:
+        yield
+    finally:
+        with _recursion_lock:
+            _recursion_users -= 1
+            if _recursion_users == 0:
+                sys.setrecursionlimit(_recursion_saved)
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, List, Tuple
+
+from parser import ASTNode, NODE, NODES, PAIRS, BRANCHES
+
+# ---------------------------------------------------------------------
+#  Mediciones por fase de una petición
+# ---------------------------------------------------------------------
+# tracemalloc es global al proceso: las fases que miden memoria se
+# ejecutan de una en una para que el pico de una no incluya a otra.
+_TRACE_LOCK = threading.Lock()
+
+
+class PhaseRecorder:
+    """Registra tiempo de reloj, tiempo de CPU y pico de memoria por fase.
+
+    Uso::
+
+        rec = PhaseRecorder()
+        with rec.phase('parse') as counts:
+            ast = Parser(tokens).parse()
+            counts['nodes'] = count_nodes(ast)
+
+    Lo que se guarde en ``counts`` (tokens, nodos, pasos...) se añade a la
+    fase, también después de salir del bloque: así contar no se mide. El
+    CPU es el del hilo actual (``time.thread_time``). La memoria es el
+    pico de bloques reservados durante la fase según :mod:`tracemalloc`,
+    que solo se activa mientras dura la fase; con ``memory=False`` no se
+    mide y las fases de distintos hilos pueden solaparse.
+    """
+
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.phases: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        data: Dict[str, Any] = {}
+        self.phases[name] = data
+        lock = _TRACE_LOCK if self.memory else nullcontext()
+        with lock:
+            started = False
+            if self.memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    started = True
+                elif hasattr(tracemalloc, 'reset_peak'):
+                    # Python 3.9+; antes, si alguien más ya medía, el pico
+                    # puede incluir memoria de antes de la fase
+                    tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                yield data
+            finally:
+                data['wall_ms'] = (time.perf_counter() - wall) * 1e3
+                data['cpu_ms'] = (time.thread_time() - cpu) * 1e3
+                if self.memory:
+                    data['peak_bytes'] = max(0, tracemalloc.get_traced_memory()[1] - base)
+                    if started:
+                        tracemalloc.stop()
+
+    def merge(self, phases: Dict[str, Dict[str, Any]] | None):
+        """Añade fases medidas en otro proceso (el trabajador del sandbox)."""
+        if phases:
+            self.phases.update(phases)
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.phases)
+
+
+def phase(recorder: PhaseRecorder | None, name: str):
+    """``recorder.phase(name)``, o un contexto vacío si no se mide nada."""
+    return recorder.phase(name) if recorder is not None else nullcontext({})
+
+
+def count_nodes(node: Any) -> int:
+    """Cuenta los nodos del AST recorriendo el esquema ``_children``."""
+    total = 0
+    stack = [node]
+    while stack:
+        cur = stack.pop()
+        if not isinstance(cur, ASTNode):
+            continue
+        total += 1
+        for field, kind in cur._children:
+            child = getattr(cur, field)
+            if not child:
+                continue
+            if kind == NODE:
+                stack.append(child)
+            elif kind == NODES:
+                stack.extend(child)
+            elif kind == PAIRS:
+                for key, val in child:
+                    stack.append(key)
+                    stack.append(val)
+            elif kind == BRANCHES:
+                for cond, body in child:
+                    stack.append(cond)
+                    stack.extend(body)
+    return total
+
+
+# ---------------------------------------------------------------------
+#  Agregados en formato de texto de Prometheus
+# ---------------------------------------------------------------------
+LabelValues = Tuple[str, ...]
+
+
+def _labels(names: Tuple[str, ...], values: LabelValues, extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values: str, amount: float = 1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labels, values)} {_number(total)}')
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo con cubetas fijas (``le``), como en Prometheus."""
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float], labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = sorted(buckets)
+        self._series: Dict[LabelValues, List[Any]] = {}     # → [conteos, suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}')
+                inf = 'le="+Inf"'
+                lines.append(f'{self.name}_bucket{_labels(self.labels, values, inf)} {count}')
+                lines.append(f'{self.name}_sum{_labels(self.labels, values)} {_number(total)}')
+                lines.append(f'{self.name}_count{_labels(self.labels, values)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, extra: Iterable[str] = ()) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        lines.extend(extra)
+        return '\n'.join(lines) + '\n'
+
+
+# Cubetas: segundos de 0.1 ms a 10 s y bytes de 1 KiB a 256 MiB
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(10))
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+from parser import (  # type: ignore
+    ASTNode,
+    Parser,
+    ProgramNode,
+    FunctionNode,
+    IfNode,
+    ReturnNode,
+    PassNode,
+    ConstantNode,
+    StringNode,
+    UnaryOpNode,
+    BinaryOpNode,
+    node_line,
+    node_span,
+    NODE,
+    NODES,
+    PAIRS,
+)
+from limits import affordable
+from semantic import Interpreter
+
+# ---------------------------------------------------------------------
+#  Plegado de constantes y poda de ramas muertas
+# ---------------------------------------------------------------------
+# Tope de los valores que se pliegan: una expresión como "a" * 10**9 se
+# deja para la ejecución, donde la frena limits.affordable.
+MAX_STR_LEN = 4096
+MAX_INT_BITS = 4096
+
+_QUOTES = "\"'"
+
+
+class ConstantFolder:
+    """Reescribe el AST antes de ejecutarlo, con la semántica del Interpreter.
+
+    * Pliega ``BinaryOpNode``/``UnaryOpNode`` cuyos operandos son literales,
+      usando los mismos operadores de :attr:`Interpreter.BIN_OPS`/``UN_OPS``.
+      Si la operación falla (``1 / 0``, ``"a" - 1``) el nodo se conserva
+      para que el error aparezca al ejecutar.
+    * Elimina las ramas de ``IfNode`` con condición constante; si la rama
+      que se toma es la primera, sus sentencias sustituyen al ``if``.
+    * Descarta las sentencias que siguen a un ``return`` en el mismo bloque.
+
+    El árbol original no se modifica: los nodos que cambian se copian y el
+    resto se comparte. Las copias de ``FunctionNode`` heredan el layout de
+    la original en ``layouts`` (ver :class:`semantic.Resolver`).
+    ``report`` describe cada cambio hecho.
+    """
+
+    def __init__(self, layouts: Dict[FunctionNode, Dict[str, int]] | None = None):
+        self.layouts = layouts
+        self.report: List[Dict[str, Any]] = []
+
+    def fold(self, ast: ProgramNode) -> ProgramNode:
+        return self.visit(ast)
+
+    # ---- recorrido ---------------------------------------------------
+    def visit(self, node: ASTNode):
+        method = getattr(self, node._visit_name, None) or self.generic_visit
+        return method(node)
+
+    def generic_visit(self, node: ASTNode):
+        changes: Dict[str, Any] = {}
+        for field, kind in node._children:
+            child = getattr(node, field)
+            if not child:
+                continue
+            if kind == NODE:
+                new = self.visit(child)
+            elif kind == NODES:
+                new = self._block(child)
+            elif kind == PAIRS:
+                new = [(self.visit(k), self.visit(v)) for k, v in child]
+                if all(a is b and c is d for (a, c), (b, d) in zip(new, child)):
+                    new = child
+            else:   # BRANCHES
+                new = [(self.visit(c), self._block(b)) for c, b in child]
+                if all(a is b and c is d for (a, c), (b, d) in zip(new, child)):
+                    new = child
+            if new is not child:
+                changes[field] = new
+        return self._replace(node, changes) if changes else node
+
+    def _replace(self, node: ASTNode, changes: Dict[str, Any]) -> ASTNode:
+        new = object.__new__(type(node))
+        for field in node._fields:
+            setattr(new, field, changes.get(field, getattr(node, field)))
+        _keep_line(node, new)
+        if self.layouts is not None and isinstance(node, FunctionNode):
+            self.layouts[new] = self.layouts[node]
+        return new
+
+    def _block(self, stmts: List[ASTNode]) -> List[ASTNode]:
+        """Optimiza una lista de nodos; un ``if`` podado se expande en ella."""
+        out: List[ASTNode] = []
+        changed = False
+        for i, stmt in enumerate(stmts):
+            new = self.visit(stmt)
+            if new is not stmt:
+                changed = True
+                if isinstance(new, list):
+                    out.extend(new)
+                else:
+                    out.append(new)
+            else:
+                out.append(stmt)
+            if out and isinstance(out[-1], ReturnNode) and i + 1 < len(stmts):
+                self.report.append({'kind': 'unreachable', 'statements': len(stmts) - i - 1})
+                changed = True
+                break
+        if not changed:
+            return stmts
+        # Un bloque nunca queda vacío: los motores esperan al menos una sentencia
+        return out or [PassNode()]
+
+    # ---- sentencias --------------------------------------------------
+    def visit_IfNode(self, node: IfNode):
+        kept: List[Tuple[ASTNode, List[ASTNode]]] = []
+        else_body = node.else_body
+        changed = False
+        for cond, body in [(node.cond, node.body)] + list(node.elif_blocks):
+            new_cond = self.visit(cond)
+            known, value = self._constant(new_cond)
+            if not known:
+                kept.append((new_cond, body))
+                changed = changed or new_cond is not cond
+                continue
+            changed = True
+            self.report.append({'kind': 'branch', 'cond': _source(cond), 'taken': bool(value)})
+            if value:
+                # Siempre se toma: las ramas siguientes y el else sobran
+                else_body = body
+                break
+
+        if not kept:
+            return self._block(else_body) if else_body else []
+
+        new_else = self._block(else_body) if else_body else else_body
+        branches = [(c, self._block(b)) for c, b in kept]
+        if not changed and new_else is node.else_body and all(
+                new is old for (_, new), (_, old) in zip(branches, kept)):
+            return node
+        (cond, body), elifs = branches[0], branches[1:]
+        return _keep_line(node, IfNode(cond, body, elifs, new_else))
+
+    # ---- expresiones -------------------------------------------------
+    def visit_BinaryOpNode(self, node: BinaryOpNode):
+        mark = len(self.report)
+        left, right = self.visit(node.left), self.visit(node.right)
+        known_l, a = self._constant(left)
+        known_r, b = self._constant(right)
+        op_fn = Interpreter.BIN_OPS.get(node.op)
+        if known_l and known_r and op_fn is not None and _affordable(node.op, a, b):
+            folded = self._fold(node, mark, lambda: op_fn(a, b))
+            if folded is not None:
+                return folded
+        if left is node.left and right is node.right:
+            return node
+        return _keep_line(node, BinaryOpNode(left, node.op, right))
+
+    def visit_UnaryOpNode(self, node: UnaryOpNode):
+        mark = len(self.report)
+        operand = self.visit(node.operand)
+        known, value = self._constant(operand)
+        op_fn = Interpreter.UN_OPS.get(node.op)
+        if known and op_fn is not None:
+            folded = self._fold(node, mark, lambda: op_fn(value))
+            if folded is not None:
+                return folded
+        if operand is node.operand:
+            return node
+        return _keep_line(node, UnaryOpNode(node.op, operand))
+
+    def _fold(self, node: ASTNode, mark: int, compute):
+        try:
+            value = compute()
+        except Exception:
+            return None
+        literal = _literal(value)
+        if literal is None:
+            return None
+        # Solo se informa el plegado más externo de cada expresión
+        del self.report[mark:]
+        self.report.append({'kind': 'fold', 'expr': _source(node), 'value': _source(literal)})
+        return _keep_line(node, literal)
+
+    @staticmethod
+    def _constant(node: ASTNode) -> Tuple[bool, Any]:
+        """``(True, valor)`` si ``node`` es un literal, con el valor que le
+        daría el Interpreter; ``(False, None)`` si no."""
+        try:
+            if isinstance(node, ConstantNode):
+                return True, Interpreter.visit_ConstantNode(None, node)
+            if isinstance(node, StringNode):
+                return True, Interpreter.visit_StringNode(None, node)
+        except ValueError:      # entero con demasiados dígitos para int()
+            pass
+        return False, None
+
+
+def _keep_line(old: ASTNode, new: ASTNode) -> ASTNode:
+    """Pasa a ``new`` la línea y las posiciones que el Parser anotó en ``old``."""
+    line = node_line(old)
+    if line is not None:
+        new.line = line
+    start, end = node_span(old)
+    if start is not None:
+        new.start, new.end = start, end
+    return new
+
+
+def _affordable(op: str, a: Any, b: Any) -> bool:
+    """Descarta operaciones cuyo resultado podría ser enorme antes de hacerlas."""
+    if op == '%' and isinstance(a, str):
+        return False            # formato: "%0999999999d" % 1
+    return affordable(op, a, b, MAX_INT_BITS, MAX_STR_LEN)
+
+
+def _literal(value: Any) -> ASTNode | None:
+    """Nodo literal que el Interpreter evalúa a ``value`` (o None si no hay)."""
+    if value is None or isinstance(value, bool):
+        return ConstantNode(value)
+    if isinstance(value, int):
+        return ConstantNode(value) if value.bit_length() <= MAX_INT_BITS else None
+    if isinstance(value, float):
+        return ConstantNode(value)
+    if isinstance(value, str):
+        # visit_StringNode quita las comillas de ambos extremos
+        if len(value) > MAX_STR_LEN or value and (value[0] in _QUOTES or value[-1] in _QUOTES):
+            return None
+        return StringNode('"' + value + '"')
+    return None
+
+
+def _source(node: ASTNode, power: int = 0) -> str:
+    """Texto aproximado de una expresión de literales, para el informe.
+
+    ``power`` es la potencia de enlace del contexto (ver
+    :attr:`Parser.BINARY_POWER`): la expresión va entre paréntesis si liga
+    más débil que él.
+    """
+    if isinstance(node, ConstantNode):
+        return node.value if isinstance(node.value, str) else repr(node.value)
+    if isinstance(node, StringNode):
+        return node.value
+    if isinstance(node, UnaryOpNode):
+        own = Parser.NOT_POWER if node.op == 'not' else Parser.UNARY_POWER
+        sep = ' ' if node.op == 'not' else ''
+        text = f'{node.op}{sep}{_source(node.operand, own)}'
+    elif isinstance(node, BinaryOpNode):
+        own = Parser.BINARY_POWER.get(node.op, Parser.EXPONENT_POWER)
+        if node.op == '**':         # asocia a la derecha
+            left, right = own + 1, own
+        elif own == Parser.COMPARE_POWER:
+            left, right = own + 1, own + 1  # a < b < c sería una cadena
+        else:
+            left, right = own, own + 1
+        text = f'{_source(node.left, left)} {node.op} {_source(node.right, right)}'
+    else:
+        return f'<{type(node).__name__}>'
+    return f'({text})' if own < power else text
+
+
+def fold_constants(ast: ProgramNode, layouts: Dict[FunctionNode, Dict[str, int]] | None = None):
+    """Aplica :class:`ConstantFolder` a ``ast``. Devuelve ``(ast, informe)``."""
+    folder = ConstantFolder(layouts)
+    return folder.fold(ast), folder.report
@@ -1,47 +1,98 @@
+from collections import deque
+
 # ---------------------------------------------------------------------------
 #  TOKENS
 # ---------------------------------------------------------------------------
 
-class Token:
-    def __init__(self, type_, value):
-        self.type  = type_
-        self.value = value
-    def __repr__(self):
-        return f"Token({self.type}, {self.value})"
+from lexer import Token, EOF, LAYOUT_TYPES
+
+def _shown(tok):
+    """``TIPO:valor`` de ``tok`` para los mensajes de error (solo el tipo
+    en los de estructura, cuyo valor es un salto de línea o sangría)."""
+    return tok.type if tok.type in LAYOUT_TYPES else f"{tok.type}:{tok.value}"
 
 # ---------------------------------------------------------------------------
 #  AST NODES
 # ---------------------------------------------------------------------------
 
-class ASTNode: ...
+# Esquema de hijos: qué contiene cada campo de un nodo que tiene nodos
+NODE     = 'node'      # un nodo (o None)
+NODES    = 'nodes'     # lista de nodos (o None)
+PAIRS    = 'pairs'     # lista de pares de nodos: [(clave, valor)]
+BRANCHES = 'branches'  # lista de (condición, [sentencias])
+
+class ASTNode:
+    """Base de los nodos. Cada clase declara sus campos en ``__slots__`` y,
+    en ``_children``, cuáles de ellos contienen nodos y de qué forma; el
+    resto son datos simples (nombres, operadores, literales).
+
+    El Parser anota en ``start`` y ``end`` las posiciones (en caracteres)
+    donde empiezan y terminan las sentencias y expresiones, y en ``line`` la
+    línea donde empieza cada sentencia si conoce el código; los nodos
+    creados fuera del Parser no las tienen (léanse con ``node_line`` y
+    ``node_span``)."""
+    __slots__ = ('line', 'start', 'end')
+    _fields = ()
+    _children = ()
+    _visit_name = 'visit_ASTNode'
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        cls._fields = cls.__dict__.get('__slots__', ())
+        cls._visit_name = 'visit_' + cls.__name__
+
+    def __repr__(self):
+        args = ', '.join(f'{f}={getattr(self, f)!r}' for f in self._fields)
+        return f'{type(self).__name__}({args})'
+
+def node_line(node):
+    """Línea de ``node`` según el Parser, o None si no la tiene."""
+    return getattr(node, 'line', None)
+
+def node_span(node):
+    """``(start, end)`` de ``node`` según el Parser, o ``(None, None)``."""
+    return getattr(node, 'start', None), getattr(node, 'end', None)
 
 class ProgramNode(ASTNode):
+    __slots__ = ('body',)
+    _children = (('body', NODES),)
     def __init__(self, body):  self.body = body
 
 
 # --- sentencias ------------------------------------------------------------
 
 class FunctionNode(ASTNode):
+    __slots__ = ('name', 'params', 'body')
+    _children = (('body', NODES),)
     def __init__(self, name, params, body):
         self.name, self.params, self.body = name, params, body
 
 class ClassNode(ASTNode):
+    __slots__ = ('name', 'body')
+    _children = (('body', NODES),)
     def __init__(self, name, body):
         self.name, self.body = name, body
 
 class ImportNode(ASTNode):
+    __slots__ = ('names',)
     def __init__(self, names):  # [(módulo, alias)]
         self.names = names
 
 class WhileNode(ASTNode):
+    __slots__ = ('cond', 'body')
+    _children = (('cond', NODE), ('body', NODES))
     def __init__(self, cond, body):
         self.cond, self.body = cond, body
 
 class ForNode(ASTNode):
+    __slots__ = ('target', 'iterable', 'body')
+    _children = (('iterable', NODE), ('body', NODES))
     def __init__(self, target, iterable, body):
         self.target, self.iterable, self.body = target, iterable, body
 
 class IfNode(ASTNode):
+    __slots__ = ('cond', 'body', 'elif_blocks', 'else_body')
+    _children = (('cond', NODE), ('body', NODES), ('elif_blocks', BRANCHES), ('else_body', NODES))
     def __init__(self, cond, body, elif_blocks=None, else_body=None):
         self.cond = cond
         self.body = body
@@ -50,6 +101,8 @@ class IfNode(ASTNode):
 
 
 class TryNode(ASTNode):
+    __slots__ = ('body', 'handlers', 'else_body', 'finally_body')
+    _children = (('body', NODES), ('handlers', NODES), ('else_body', NODES), ('finally_body', NODES))
     def __init__(self, body, handlers, else_body=None, finally_body=None):
         self.body = body
         self.handlers = handlers
@@ -58,87 +111,200 @@ class TryNode(ASTNode):
 
 
 class ExceptHandlerNode(ASTNode):
+    __slots__ = ('exc', 'body')
+    _children = (('body', NODES),)
     def __init__(self, exc, body):
         self.exc, self.body = exc, body
 
-class PassNode(ASTNode): ...
-class BreakNode(ASTNode): ...
+class PassNode(ASTNode):
+    __slots__ = ()
+class BreakNode(ASTNode):
+    __slots__ = ()
+
+class ErrorNode(ASTNode):
+    """Sentencia que no se pudo parsear (solo con ``Parser(recover=True)``).
+    ``message`` es el error sin ubicar; el ubicado queda en ``Parser.errors``."""
+    __slots__ = ('message',)
+    def __init__(self, message): self.message = message
 
 class ReturnNode(ASTNode):
+    __slots__ = ('value',)
+    _children = (('value', NODE),)
     def __init__(self, value): self.value = value
 
 class AssignmentNode(ASTNode):
+    __slots__ = ('target', 'value')
+    _children = (('value', NODE),)
     def __init__(self, target, value):
         self.target, self.value = target, value
 
 
 class AugmentedAssignmentNode(ASTNode):
+    __slots__ = ('target', 'op', 'value')
+    _children = (('value', NODE),)
     def __init__(self, target, op, value):
         self.target, self.op, self.value = target, op, value
 class ObjectInstanceNode(ASTNode):
+    __slots__ = ('name', 'klass')
     def __init__(self, name, klass): self.name, self.klass = name, klass
 
 # --- expresiones -----------------------------------------------------------
 
 class IdentifierNode(ASTNode):
+    __slots__ = ('name',)
     def __init__(self, name): self.name = name
 
 class ConstantNode(ASTNode):
+    __slots__ = ('value',)
     def __init__(self, value): self.value = value
 
 class StringNode(ASTNode):
+    __slots__ = ('value',)
     def __init__(self, value): self.value = value
 
 class ListNode(ASTNode):
+    __slots__ = ('elements',)
+    _children = (('elements', NODES),)
     def __init__(self, elements): self.elements = elements
 
 class DictNode(ASTNode):
+    __slots__ = ('pairs',)
+    _children = (('pairs', PAIRS),)
     def __init__(self, pairs): self.pairs = pairs  # list of (key,val)
 
 class TupleNode(ASTNode):
+    __slots__ = ('elements',)
+    _children = (('elements', NODES),)
     def __init__(self, elements): self.elements = elements
 
 class UnaryOpNode(ASTNode):
+    __slots__ = ('op', 'operand')
+    _children = (('operand', NODE),)
     def __init__(self, op, operand):
         self.op, self.operand = op, operand
 
 class BinaryOpNode(ASTNode):
+    __slots__ = ('left', 'op', 'right')
+    _children = (('left', NODE), ('right', NODE))
     def __init__(self, left, op, right):
         self.left, self.op, self.right = left, op, right
 
+class CompareNode(ASTNode):
+    """Comparación encadenada ``a < b <= c``: cada operando se evalúa una
+    vez y se detiene en la primera comparación falsa."""
+    __slots__ = ('left', 'ops', 'comparators')
+    _children = (('left', NODE), ('comparators', NODES))
+    def __init__(self, left, ops, comparators):
+        self.left, self.ops, self.comparators = left, ops, comparators
+
+class IndexNode(ASTNode):
+    __slots__ = ('obj', 'index')
+    _children = (('obj', NODE), ('index', NODE))
+    def __init__(self, obj, index): self.obj, self.index = obj, index
+
+class AttributeNode(ASTNode):
+    __slots__ = ('obj', 'attr')
+    _children = (('obj', NODE),)
+    def __init__(self, obj, attr): self.obj, self.attr = obj, attr
+
 class FunctionCallNode(ASTNode):
+    __slots__ = ('name', 'args')
+    _children = (('args', NODES),)
     def __init__(self, name, args): self.name, self.args = name, args
 
 class MethodCallNode(ASTNode):
+    __slots__ = ('obj', 'method', 'args')
+    _children = (('args', NODES),)
     def __init__(self, obj, method, args): self.obj, self.method, self.args = obj, method, args
 
 # ---------------------------------------------------------------------------
 #  PARSER
 # ---------------------------------------------------------------------------
 
+# Mensaje cuando el análisis (parser, serializador o semántica) agota la
+# pila de Python con un programa demasiado anidado
+NESTING_ERROR = "El programa está demasiado anidado para analizarlo."
+
+class ParseError(SyntaxError):
+    """Error del Parser. ``str()`` da el mensaje ubicado; ``message`` lo da
+    sin ubicar y ``where``, la posición (en caracteres) donde se detectó."""
+    def __init__(self, located, message, where):
+        super().__init__(located)
+        self.message, self.where = message, where
+
 class Parser:
     AUG_ASSIGN_OPS = {'+=', '-=', '*=', '/=', '//=', '%=', '**=', '&=', '|=', '^=', '>>=', '<<='}
-    def __init__(self, token_list):
-        self.tokens = [Token(t['type'], t['value']) for t in token_list]
+    # Cláusulas que continúan una sentencia compuesta
+    CLAUSES = {'elif', 'else', 'except', 'finally'}
+    def __init__(self, token_list, line_index=None, recover=False):
+        # token_list puede ser una lista o un generador (lexer.iter_tokens)
+        # de Token, o la antigua lista de dicts {'type', 'value'}: los
+        # tokens se piden bajo demanda y solo se guardan los de lookahead.
+        self.source = iter(token_list)
+        self.buffer = deque()
         self.pos = 0
+        # line_index (lexer.LineIndex del código) da la línea de cada
+        # sentencia y la posición en los mensajes de error
+        self.line_index = line_index
+        self.last_end = 0     # fin del último token consumido
+        # Con recover, una sentencia inválida no detiene el parseo: se
+        # anota su ParseError en errors y queda un ErrorNode en su lugar
+        self.errors = [] if recover else None
+        # Expresiones abiertas ahora mismo (ver MAX_NESTING)
+        self.nesting = 0
 
     # ---------- helpers ----------------------------------------------------
 
     def cur(self):
-        return self.tokens[self.pos] if self.pos < len(self.tokens) else Token('EOF','')
+        buf = self.buffer
+        return buf[0] if buf else self.look(0)
     def look(self, n=1):
-        idx = self.pos + n
-        return self.tokens[idx] if idx < len(self.tokens) else Token('EOF','')
+        buf = self.buffer
+        while len(buf) <= n:
+            t = next(self.source, None)
+            if t is None:
+                return EOF
+            if type(t) is dict:
+                t = Token(t['type'], t['value'])
+            buf.append(t)
+        return buf[n]
 
     def consume(self, ttype=None, value=None):
         tok = self.cur()
         if ttype and tok.type != ttype:
-            raise SyntaxError(f"Esperaba {ttype}, obtuve {tok.type}:{tok.value}")
+            raise self.error(f"Esperaba {ttype}, obtuve {_shown(tok)}", tok)
         if value and tok.value != value:
-            raise SyntaxError(f"Esperaba '{value}', obtuve '{tok.value}'")
+            raise self.error(f"Esperaba '{value}', obtuve '{tok.value}'", tok)
+        if self.buffer:
+            self.buffer.popleft()
         self.pos += 1
+        self.last_end = tok.end
         return tok
 
+    def skip(self):
+        """Descarta el token actual (ya mirado con :meth:`cur`) sin moverlo a
+        ``last_end``: los de estructura no extienden la sentencia."""
+        if self.buffer:
+            self.buffer.popleft()
+        self.pos += 1
+
+    def end_line(self):
+        """Consume el NEWLINE que cierra una sentencia simple (o acepta EOF)."""
+        tok = self.cur()
+        if tok.type == 'NEWLINE':
+            self.skip()
+        elif tok.type != 'EOF':
+            raise self.error(f"Esperaba NEWLINE, obtuve {_shown(tok)}", tok)
+
+    def error(self, message, tok):
+        """:class:`ParseError` con la línea y columna de ``tok`` si se conocen
+        (EOF se ubica al final del último token consumido)."""
+        offset = self.last_end if tok is EOF else tok.start
+        located = message
+        if self.line_index is not None and offset is not None:
+            located = f"{message} ({self.line_index.describe(offset)})"
+        return ParseError(located, message, offset)
+
     # ---------- entry ------------------------------------------------------
 
     def parse(self):
@@ -147,25 +313,64 @@ class Parser:
             body.append(self.parse_stmt())
         return ProgramNode(body)
 
+    def parse_units(self):
+        """Genera cada sentencia de primer nivel junto con cuántos tokens consumió.
+
+        Una sentencia solo depende de sus tokens y del siguiente (con el que
+        el parser decide que terminó); el análisis incremental se apoya en
+        eso para reutilizar las que no cambiaron.
+        """
+        while self.cur().type != 'EOF':
+            start = self.pos
+            node = self.parse_stmt()
+            yield node, self.pos - start
+
     # ---------- statements -------------------------------------------------
 
     def parse_stmt(self):
-        tok=self.cur()
-
+        tok = self.cur()
+        start = tok.start
+        pos = self.pos
+        try:
+            node = self._parse_stmt(tok)
+        except ParseError as e:
+            if self.errors is None:
+                raise
+            self.errors.append(e)
+            self.nesting = 0
+            self.synchronize(pos)
+            node = ErrorNode(e.message)
+        node.start, node.end = start, self.last_end
+        if self.line_index is not None and start is not None:
+            node.line = self.line_index.line(start)
+        return node
+
+    def _parse_stmt(self, tok):
         if tok.type=='KEYWORD':
             kw=tok.value
             if kw=='def':   return self.parse_function()
             if kw=='class': return self.parse_class()
-            if kw=='import':return self.parse_import()
             if kw=='if':    return self.parse_if()
             if kw=='while': return self.parse_while()
             if kw=='for':   return self.parse_for()
             if kw=='try':   return self.parse_try()
+        node = self.parse_simple(tok)
+        self.end_line()
+        return node
+
+    def parse_simple(self, tok):
+        """Sentencia de una sola línea (sin el NEWLINE que la cierra)."""
+        if tok.type=='KEYWORD':
+            kw=tok.value
+            if kw=='import':return self.parse_import()
             if kw=='pass':
                 self.consume('KEYWORD','pass'); return PassNode()
-            if kw=='break':   return self.consume('KEYWORD','break') or BreakNode()
+            if kw=='break':
+                self.consume('KEYWORD','break'); return BreakNode()
             if kw=='return':
                 self.consume('KEYWORD','return')
+                if self.cur().type in ('NEWLINE', 'EOF'):
+                    return ReturnNode(None)
                 val = self.parse_expr()
                 return ReturnNode(val)
 
@@ -200,7 +405,39 @@ class Parser:
                 args=self.parse_call_args()
                 return FunctionCallNode(name,args)
 
-        raise SyntaxError(f"Sentencia no reconocida a partir de {tok.type}:{tok.value}")
+        if tok.type=='INDENT':
+            raise self.error("Sangría inesperada", tok)
+        raise self.error(f"Sentencia no reconocida a partir de {_shown(tok)}", tok)
+
+    # ---------- recuperación ----------------------------------------------
+
+    def synchronize(self, pos):
+        """Modo pánico tras un error en la sentencia que empezó en el token
+        ``pos``: descarta el resto de su línea lógica. Si la sigue un bloque
+        con sangría, es el de su cabecera rota: se parsea para reportar sus
+        errores y se descarta, igual que las cláusulas (``elif``, ``else``,
+        ``except``, ``finally``) que continúan esa sentencia."""
+        self.skip_line()
+        while self.cur().type == 'INDENT':
+            self.skip()
+            self.parse_suite()
+            tok = self.cur()
+            if tok.type == 'KEYWORD' and tok.value in self.CLAUSES:
+                self.skip_line()
+        if self.pos == pos:
+            self.skip()     # DEDENT sin bloque que cerrar: hay que avanzar
+
+    def skip_line(self):
+        """Descarta tokens hasta el NEWLINE que cierra la línea lógica
+        (inclusive) o hasta el INDENT, DEDENT o EOF que la siguen."""
+        while True:
+            ttype = self.cur().type
+            if ttype == 'DEDENT' or ttype == 'EOF' or ttype == 'INDENT':
+                return
+            if ttype == 'NEWLINE':
+                self.skip()
+                return
+            self.consume()
 
     # ---------- skip util --------------------------------------------------
 
@@ -239,10 +476,10 @@ class Parser:
     def parse_try(self):
         self.consume('KEYWORD','try')
         self.consume('PUNCTUATION',':')
-        body = self.parse_block(stop={'except','else','finally'})
+        body = self.parse_block()
         handlers = []
         while self.cur().type == 'KEYWORD' and self.cur().value == 'except':
-            self.consume('KEYWORD','except')
+            start = self.consume('KEYWORD','except').start
             exc = None
             if self.cur().type == 'IDENTIFIER':
                 exc = self.consume('IDENTIFIER').value
@@ -251,14 +488,16 @@ class Parser:
                     alias = self.consume('IDENTIFIER').value
                     exc += f' as {alias}'
             self.consume('PUNCTUATION',':')
-            hbody = self.parse_block(stop={'except','else','finally'})
-            handlers.append(ExceptHandlerNode(exc, hbody))
+            hbody = self.parse_block()
+            handler = ExceptHandlerNode(exc, hbody)
+            handler.start, handler.end = start, self.last_end
+            handlers.append(handler)
     
         else_body = None
         if self.cur().type == 'KEYWORD' and self.cur().value == 'else':
             self.consume('KEYWORD','else')
             self.consume('PUNCTUATION',':')
-            else_body = self.parse_block(stop={'finally'})
+            else_body = self.parse_block()
     
         finally_body = None
         if self.cur().type == 'KEYWORD' and self.cur().value == 'finally':
@@ -299,13 +538,13 @@ class Parser:
         self.consume('KEYWORD','if')
         cond=self.parse_expr()
         self.consume('PUNCTUATION',':')
-        body=self.parse_block(stop={'elif','else'})
+        body=self.parse_block()
         elif_blocks=[]
         while self.cur().type=='KEYWORD' and self.cur().value=='elif':
             self.consume('KEYWORD','elif')
             econd=self.parse_expr()
             self.consume('PUNCTUATION',':')
-            ebody=self.parse_block(stop={'elif','else'})
+            ebody=self.parse_block()
             elif_blocks.append((econd,ebody))
         else_body=None
         if self.cur().type=='KEYWORD' and self.cur().value=='else':
@@ -332,14 +571,36 @@ class Parser:
 
     # ---------- générico de bloque ----------------------------------------
 
-    def parse_block(self, stop=None):
-        stop=stop or set()
+    def parse_block(self):
+        """Cuerpo de una sentencia compuesta, justo después de ``:``.
+
+        Es una sentencia simple en la misma línea, o un NEWLINE seguido de
+        las sentencias entre INDENT y su DEDENT: el final del bloque lo
+        marca el lexer, sin mirar qué sentencia sigue.
+        """
+        tok = self.cur()
+        if tok.type != 'NEWLINE' and tok.type != 'EOF':
+            return [self.parse_stmt()]
+        if tok.type == 'NEWLINE':
+            # Se mira antes de consumir el NEWLINE: así, si falta el
+            # bloque, la recuperación no descarta la línea siguiente
+            tok = self.look()
+            if tok.type == 'INDENT':
+                self.skip()
+        if tok.type != 'INDENT':
+            raise self.error("Se esperaba un bloque con sangría", tok)
+        self.skip()
+        return self.parse_suite()
+
+    def parse_suite(self):
+        """Sentencias de un bloque, tras su INDENT y hasta su DEDENT."""
         stmts=[]
-        while self.cur().type!='EOF':
-            if self.cur().type=='KEYWORD' and self.cur().value in stop:
+        while True:
+            tok = self.cur()
+            if tok.type == 'DEDENT':
+                self.skip()
                 break
-            # heurística de dedent
-            if self.cur().type=='KEYWORD' and self.cur().value in {'def','class','if','for','while','try','import'} and stmts:
+            if tok.type == 'EOF':
                 break
             stmts.append(self.parse_stmt())
         return stmts
@@ -358,43 +619,174 @@ class Parser:
 
     # ---------- expresiones ------------------------------------------------
 
-    BIN_OPS = {'+','-','*','/','//','%','==','!=','<','>','<=','>=','%'}
-    def parse_expr(self):
-        """Parse binary expressions with left-associativity.
-        Soporta operadores binarios en BIN_OPS, lógicos 'and'/'or', y el operador de pertenencia 'in'.
+    # Potencia de enlace de cada operador binario (mayor = liga más fuerte),
+    # como en Python. 'not' es el inicio de 'not in'; '**' y los unarios
+    # '+'/'-' se resuelven en parse_unary, por encima de todos estos.
+    BINARY_POWER = {
+        'or': 1,
+        'and': 2,
+        '==': 4, '!=': 4, '<': 4, '<=': 4, '>': 4, '>=': 4, 'in': 4, 'not': 4, 'is': 4,
+        '+': 5, '-': 5,
+        '*': 6, '/': 6, '//': 6, '%': 6,
+    }
+    NOT_POWER = 3           # 'not' prefijo: entre 'and' y las comparaciones
+    COMPARE_POWER = 4
+    UNARY_POWER = 7         # '+x', '-x'
+    EXPONENT_POWER = 8      # '**', asocia a la derecha
+    # Niveles de anidamiento de una expresión (paréntesis, corchetes,
+    # unarios, 'not', operandos de '**'...). Cada nivel cuesta varios marcos
+    # de Python aquí, en el serializador, en la semántica y al enviar el AST
+    # al sandbox (pickle); con este tope todos caben en el límite de
+    # recursión por defecto (1000) y lo demás es un error de sintaxis
+    MAX_NESTING = 100
+
+    def parse_expr(self, min_power=0):
+        """Expresión cuyos operadores binarios ligan más fuerte que
+        ``min_power`` (precedencia por escalada, como un parser Pratt)."""
+        tok = self.cur()
+        if tok.type == 'KEYWORD' and tok.value == 'not':
+            self.consume()
+            self.nesting += 1
+            if self.nesting > self.MAX_NESTING:
+                raise self.error("Expresión demasiado anidada", tok)
+            operand = self.parse_expr(self.NOT_POWER)
+            self.nesting -= 1
+            left = UnaryOpNode('not', operand)
+            left.start, left.end = tok.start, operand.end
+        else:
+            left = self.parse_unary()
+        return self.parse_binary(left, min_power)
+
+    def parse_binary(self, left, min_power):
+        """Continúa ``left`` con los operadores que ligan más fuerte que
+        ``min_power``. Los de igual potencia asocian a la izquierda en el
+        mismo bucle; solo se baja un nivel cuando el operador siguiente
+        liga más fuerte, así que ``a + b + c + ...`` no anida llamadas.
         """
-        left = self.parse_term()
+        powers = self.BINARY_POWER
         while True:
             tok = self.cur()
-            if tok.type == 'OPERATOR' and tok.value in self.BIN_OPS:
-                op = tok.value
-                self.consume('OPERATOR')
-            elif tok.type == 'KEYWORD' and tok.value in {'and', 'or', 'in'}:
-                op = tok.value
-                self.consume('KEYWORD')
+            # Solo OPERATOR y KEYWORD pueden tener estos valores
+            power = powers.get(tok.value)
+            if power is None or power <= min_power:
+                return left
+            if power == self.COMPARE_POWER:
+                node = self.parse_comparison(left)
+                if node is left:        # 'not' que no es 'not in'
+                    return left
+                left = node
+                continue
+            self.consume()
+            nxt = self.cur()
+            if nxt.type == 'KEYWORD' and nxt.value == 'not':
+                right = self.parse_expr(power)
             else:
+                right = self.parse_unary()
+                stronger = powers.get(self.cur().value)
+                if stronger is not None and stronger > power:
+                    right = self.parse_binary(right, power)
+            node = BinaryOpNode(left, tok.value, right)
+            node.start, node.end = left.start, right.end
+            left = node
+
+    def comparison_operator(self):
+        """Consume un operador de comparación ('not in' e 'is not' ocupan
+        dos tokens) y lo devuelve, o None si no hay uno."""
+        tok = self.cur()
+        if self.BINARY_POWER.get(tok.value) != self.COMPARE_POWER:
+            return None
+        if tok.value == 'not':
+            if self.look().value != 'in':
+                return None
+            self.consume()
+            self.consume('KEYWORD', 'in')
+            return 'not in'
+        self.consume()
+        if tok.value == 'is' and self.cur().type == 'KEYWORD' and self.cur().value == 'not':
+            self.consume()
+            return 'is not'
+        return tok.value
+
+    def parse_comparison(self, left):
+        """``a < b < c``: una sola comparación da un BinaryOpNode; una cadena,
+        un CompareNode que evalúa cada operando una vez."""
+        ops, comparators = [], []
+        while True:
+            op = self.comparison_operator()
+            if op is None:
                 break
-            right = self.parse_term()
-            left = BinaryOpNode(left, op, right)
-        return left
-    def parse_term(self):
-        tok=self.cur()
+            ops.append(op)
+            comparators.append(self.parse_expr(self.COMPARE_POWER))
+        if not ops:
+            return left
+        if len(ops) == 1:
+            node = BinaryOpNode(left, ops[0], comparators[0])
+        else:
+            node = CompareNode(left, ops, comparators)
+        node.start, node.end = left.start, comparators[-1].end
+        return node
+
+    def parse_unary(self):
+        """``+x``, ``-x``, ``x ** y`` y un término con sus índices y atributos.
+        A la derecha de ``**`` puede ir otro unario (``2 ** -1``); a la
+        izquierda, solo un término. Cuenta un nivel de :attr:`MAX_NESTING`."""
+        tok = self.cur()
+        self.nesting += 1
+        if self.nesting > self.MAX_NESTING:
+            raise self.error("Expresión demasiado anidada", tok)
+        if tok.type == 'OPERATOR' and (tok.value == '-' or tok.value == '+'):
+            self.consume()
+            operand = self.parse_unary()
+            node = UnaryOpNode(tok.value, operand)
+            node.start, node.end = tok.start, operand.end
+            self.nesting -= 1
+            return node
+        node = self.parse_term(tok)
+        node.start, node.end = tok.start, self.last_end
+        nxt = self.cur()
+        if nxt.type == 'PUNCTUATION' and (nxt.value == '[' or nxt.value == '.'):
+            node = self.parse_trailers(node)
+            nxt = self.cur()
+        if nxt.type == 'OPERATOR' and nxt.value == '**':
+            self.consume()
+            right = self.parse_unary()
+            base, node = node, BinaryOpNode(node, '**', right)
+            node.start, node.end = base.start, right.end
+        self.nesting -= 1
+        return node
+
+    def parse_trailers(self, node):
+        """Índices ``[i]``, atributos ``.a`` y llamadas a método ``.m(...)``
+        (estas, solo sobre un nombre) a continuación de ``node``."""
+        start = node.start
+        while True:
+            tok = self.cur()
+            if tok.type != 'PUNCTUATION':
+                return node
+            if tok.value == '[':
+                self.consume()
+                index = self.parse_expr()
+                self.consume('PUNCTUATION', ']')
+                node = IndexNode(node, index)
+            elif tok.value == '.':
+                self.consume()
+                attr = self.consume('IDENTIFIER').value
+                if self.cur().value == '(':
+                    if type(node) is not IdentifierNode:
+                        raise self.error(f"Solo se pueden llamar métodos de un nombre: '.{attr}(...)'", tok)
+                    node = MethodCallNode(node.name, attr, self.parse_call_args())
+                else:
+                    node = AttributeNode(node, attr)
+            else:
+                return node
+            node.start, node.end = start, self.last_end
 
-        # ---------------- unario -----------------
+    def parse_term(self, tok):
         # literales True / False / None
         if tok.type=='KEYWORD' and tok.value in {'True','False','None'}:
             lit = {'True': True, 'False': False, 'None': None}[tok.value]
             self.consume('KEYWORD')
             return ConstantNode(lit)
-        if tok.type=='KEYWORD' and tok.value=='not':
-            self.consume('KEYWORD','not')
-            operand = self.parse_term()
-            return UnaryOpNode('not', operand)
-
-        if tok.type=='OPERATOR' and tok.value in {'+','-'}:
-            op=self.consume('OPERATOR').value
-            operand=self.parse_term()
-            return UnaryOpNode(op,operand)
 
         # ---------------- literales/ident -----------------
         if tok.type=='CONSTANT':
@@ -449,4 +841,4 @@ class Parser:
             self.consume('PUNCTUATION',')')
             return elem
 
-        raise SyntaxError(f"Expresión inesperada en {tok.type}:{tok.value}")
+        raise self.error(f"Expresión inesperada en {_shown(tok)}", tok)
@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+import operator as _op
+from typing import Any, Dict, List, Tuple
+
+from assembler import (
+    BUILTIN_INSTRUCTIONS, MAX_REG_BITS,
+    OP_MOV_I, OP_MOV_R, OP_ADD_I, OP_ADD_R, OP_SUB_I, OP_SUB_R,
+    OP_MUL_I, OP_MUL_R, OP_DIV_I, OP_DIV_R, OP_AND_I, OP_AND_R,
+    OP_OR_I, OP_OR_R, OP_CMP_I, OP_CMP_R, OP_JMP, OP_JNE,
+    OP_PRINT_I, OP_PRINT_R, OP_NOT, OP_HALT, OP_TRAP,
+)
+
+# ---------------------------------------------------------------------
+#  Optimizador de mirilla del ensamblador
+# ---------------------------------------------------------------------
+# Trabaja sobre el programa ya decodificado de SimpleAssembler (tuplas
+# (opcode, a, b)). Se conserva lo observable: la salida, los registros
+# al terminar y los errores, con el número de línea original. Solo cambia
+# cuántas instrucciones se ejecutan.
+
+# Variante con inmediato → operación sobre enteros
+_ARITH = {
+    OP_ADD_I: _op.add, OP_SUB_I: _op.sub, OP_MUL_I: _op.mul,
+    OP_DIV_I: _op.floordiv, OP_AND_I: _op.and_, OP_OR_I: _op.or_,
+}
+# Variante con registro → variante con inmediato
+_IMMEDIATE = {
+    OP_MOV_R: OP_MOV_I, OP_ADD_R: OP_ADD_I, OP_SUB_R: OP_SUB_I, OP_MUL_R: OP_MUL_I,
+    OP_DIV_R: OP_DIV_I, OP_AND_R: OP_AND_I, OP_OR_R: OP_OR_I, OP_CMP_R: OP_CMP_I,
+}
+# Inmediatos con los que la operación no cambia el registro
+_IDENTITY = {OP_ADD_I: 0, OP_SUB_I: 0, OP_MUL_I: 1, OP_DIV_I: 1, OP_AND_I: -1, OP_OR_I: 0}
+
+# Qué registros usa cada instrucción: ``a`` es el destino, ``b`` la fuente
+_ARITH_R = frozenset({OP_ADD_R, OP_SUB_R, OP_MUL_R, OP_DIV_R, OP_AND_R, OP_OR_R})
+_WRITES_A = frozenset({OP_MOV_I, OP_MOV_R, OP_NOT, *_ARITH, *_ARITH_R})
+_READS_A = frozenset({OP_NOT, OP_CMP_I, OP_CMP_R, OP_PRINT_R, *_ARITH, *_ARITH_R})
+_READS_B = frozenset({OP_MOV_R, OP_CMP_R, *_ARITH_R})
+
+# Los valores plegados no crecen sin límite (MUL A, A repetido); el tope
+# es el de la ejecución, así que plegar no cambia dónde se detiene
+MAX_BITS = MAX_REG_BITS
+
+# Estados de la bandera de CMP: sin asignar, asignada con valor
+# desconocido, o "quizá sin asignar" (JNE fallaría en ese caso)
+_UNKNOWN = 'unknown'
+_UNSET = 'unset'
+_MAYBE = 'maybe'
+
+_MNEMONICS = {op: (mnemonic, operands) for op, mnemonic, operands, _ in BUILTIN_INSTRUCTIONS}
+
+_NOP = None     # instrucción marcada para borrar; la ejecución pasa de largo
+
+
+class PeepholeOptimizer:
+    """Reescribe ``asm.program`` para que ejecute menos instrucciones.
+
+    Repite, hasta que nada cambia:
+
+    * Propagación de constantes por registro (todos empiezan en 0): las
+      operaciones con valores conocidos se convierten en ``MOV r, n``, las
+      fuentes conocidas en inmediatos, ``CMP`` + ``JNE`` conocidos en un
+      ``JMP`` o en nada y los ``MOV`` que no cambian nada desaparecen.
+    * Encadenamiento de saltos: un salto a otro ``JMP`` (o un ``JNE`` a
+      otro ``JNE``, que ve la misma bandera) va directo al destino final;
+      un ``JMP`` a ``HALT`` o al final es un ``HALT``; un salto a la
+      instrucción siguiente sobra.
+    * Eliminación de código inalcanzable (lo que sigue a ``HALT``/``JMP``)
+      y de escrituras que nadie lee antes de sobrescribirlas. Al terminar
+      todos los registros se consideran leídos: se devuelven.
+
+    Programas con instrucciones registradas por
+    :meth:`SimpleAssembler.register_instruction` no se tocan: su manejador
+    puede saltar a cualquier parte.
+    """
+
+    def __init__(self, asm):
+        self.asm = asm
+        self.nregs = len(asm.reg_names)
+        self.all_regs = (1 << self.nregs) - 1
+
+    def optimize(self) -> Dict[str, Any]:
+        asm = self.asm
+        before = len(asm.program)
+        if all(op <= OP_TRAP for op, _, _ in asm.program):
+            prog = [list(ins) for ins in asm.program]
+            origins = list(range(before)) if asm.origins is None else list(asm.origins)
+            for _ in range(16):
+                prog, origins, changed = self._round(prog, origins)
+                if not changed:
+                    break
+            asm.program = [tuple(ins) for ins in prog]
+            asm.origins = origins
+        return {
+            'listing': self.listing(),
+            'instructions_before': before,
+            'instructions_after': len(asm.program),
+        }
+
+    # ---- una vuelta --------------------------------------------------
+    def _round(self, prog, origins):
+        changed = self._propagate(prog, origins)
+        changed |= self._thread_jumps(prog)
+        changed |= self._drop_unreachable(prog)
+        changed |= self._drop_dead_stores(prog)
+        if changed:
+            prog, origins = self._compact(prog, origins)
+        return prog, origins, changed
+
+    @staticmethod
+    def _successors(prog, i):
+        ins = prog[i]
+        if ins is _NOP:
+            return (i + 1,)
+        op = ins[0]
+        if op == OP_JMP:
+            return (ins[1],)
+        if op == OP_JNE:
+            return (ins[1], i + 1)
+        if op in (OP_HALT, OP_TRAP):
+            return ()
+        return (i + 1,)
+
+    # ---- propagación de constantes ------------------------------------
+    def _propagate(self, prog, origins) -> bool:
+        n = len(prog)
+        start = ([self.asm.registers[r] for r in self.asm.reg_names], _UNSET)
+        states: List[Tuple[List[Any], Any] | None] = [None] * n
+        if n:
+            states[0] = start
+        work = [0] if n else []
+        while work:
+            i = work.pop()
+            regs, flag = states[i]
+            regs, flag = self._transfer(prog[i], list(regs), flag)
+            for j in self._successors(prog, i):
+                if j >= n:
+                    continue
+                old = states[j]
+                if old is None:
+                    states[j] = (regs, flag)
+                    work.append(j)
+                    continue
+                merged = ([a if _same(a, b) else _UNKNOWN for a, b in zip(old[0], regs)],
+                          _join_flag(old[1], flag))
+                if not (all(_same(a, b) for a, b in zip(merged[0], old[0])) and _same(merged[1], old[1])):
+                    states[j] = merged
+                    work.append(j)
+
+        changed = False
+        for i, state in enumerate(states):
+            if state is None or prog[i] is _NOP:
+                continue
+            new = self._rewrite(prog, i, state[0], state[1], origins[i])
+            if new != prog[i]:
+                prog[i] = new
+                changed = True
+        return changed
+
+    def _transfer(self, ins, regs, flag):
+        """Estado de registros y bandera después de ejecutar ``ins``."""
+        if ins is _NOP:
+            return regs, flag
+        op, a, b = ins
+        if op in _IMMEDIATE and op != OP_MOV_R:
+            op, b = _IMMEDIATE[op], regs[b]
+            if b is _UNKNOWN:
+                if op == OP_CMP_I:
+                    return regs, _UNKNOWN
+                regs[a] = _UNKNOWN
+                return regs, flag
+        if op == OP_MOV_I:
+            regs[a] = b
+        elif op == OP_MOV_R:
+            regs[a] = regs[b]
+        elif op in _ARITH:
+            regs[a] = _compute(op, regs[a], b)
+        elif op == OP_NOT:
+            regs[a] = ~regs[a] if regs[a] is not _UNKNOWN else _UNKNOWN
+        elif op == OP_CMP_I:
+            flag = regs[a] - b if regs[a] is not _UNKNOWN else _UNKNOWN
+        return regs, flag
+
+    def _rewrite(self, prog, i, regs, flag, origin):
+        """Versión más barata de ``prog[i]`` dado el estado de entrada."""
+        op, a, b = prog[i]
+        if op in _IMMEDIATE and regs[b] is not _UNKNOWN:
+            if op == OP_DIV_R and regs[b] == 0:
+                return [OP_TRAP, ValueError(f"División por cero en línea {origin + 1}"), None]
+            if op == OP_MOV_R and a == b:
+                return _NOP
+            op, b = _IMMEDIATE[op], regs[b]
+        elif op == OP_MOV_R and a == b:
+            return _NOP
+
+        if op == OP_MOV_I and _same(regs[a], b):
+            return _NOP
+        if op in _ARITH:
+            value = _compute(op, regs[a], b)
+            if value is not _UNKNOWN:
+                return _NOP if _same(value, regs[a]) else [OP_MOV_I, a, value]
+            if _IDENTITY[op] == b:
+                return _NOP
+            if op == OP_MUL_I and b == 0 or op == OP_AND_I and b == 0:
+                return [OP_MOV_I, a, 0]
+        elif op == OP_NOT and regs[a] is not _UNKNOWN:
+            return [OP_MOV_I, a, ~regs[a]]
+        elif op == OP_PRINT_R and regs[a] is not _UNKNOWN:
+            return [OP_PRINT_I, regs[a], None]
+        elif op == OP_JNE:
+            if isinstance(flag, int):
+                return [OP_JMP, a, None] if flag != 0 else _NOP
+            # Sin CMP previo JNE falla: solo se quita si la bandera existe
+            if flag is _UNKNOWN and a == _next(prog, i):
+                return _NOP
+        return [op, a, b]
+
+    # ---- saltos ------------------------------------------------------
+    def _thread_jumps(self, prog) -> bool:
+        n = len(prog)
+        changed = False
+        for i, ins in enumerate(prog):
+            if ins is _NOP or ins[0] not in (OP_JMP, OP_JNE):
+                continue
+            op, target = ins[0], ins[1]
+            seen = {i}
+            while target < n and target not in seen:
+                seen.add(target)
+                nxt = prog[target]
+                if nxt is _NOP:
+                    target += 1
+                elif nxt[0] == OP_JMP or nxt[0] == OP_JNE and op == OP_JNE:
+                    target = nxt[1]
+                else:
+                    break
+            if op == OP_JMP and target == _next(prog, i):
+                prog[i] = _NOP
+                changed = True
+                continue
+            if op == OP_JMP and (target >= n or prog[target] is not _NOP and prog[target][0] == OP_HALT):
+                prog[i] = [OP_HALT, None, None]
+                changed = True
+                continue
+            if target != ins[1]:
+                prog[i] = [op, target, None]
+                changed = True
+        return changed
+
+    # ---- código muerto -----------------------------------------------
+    def _drop_unreachable(self, prog) -> bool:
+        n = len(prog)
+        reachable = bytearray(n)
+        work = [0] if n else []
+        while work:
+            i = work.pop()
+            if i >= n or reachable[i]:
+                continue
+            reachable[i] = 1
+            work.extend(self._successors(prog, i))
+        changed = False
+        for i in range(n):
+            if not reachable[i] and prog[i] is not _NOP:
+                prog[i] = _NOP
+                changed = True
+        return changed
+
+    def _drop_dead_stores(self, prog) -> bool:
+        """Liveness hacia atrás: registros como bits, la bandera aparte."""
+        n = len(prog)
+        flag_bit = 1 << self.nregs
+        exit_live = self.all_regs      # al terminar se devuelven todos
+        live_in = [0] * n
+        preds: List[List[int]] = [[] for _ in range(n)]
+        for i in range(n):
+            for j in self._successors(prog, i):
+                if j < n:
+                    preds[j].append(i)
+        work = list(range(n))
+        pending = set(work)
+        while work:
+            i = work.pop()
+            pending.discard(i)
+            live = self._live_in(prog[i], self._live_out(prog, i, live_in, exit_live), flag_bit)
+            if live != live_in[i]:
+                live_in[i] = live
+                for p in preds[i]:
+                    if p not in pending:
+                        pending.add(p)
+                        work.append(p)
+
+        changed = False
+        for i, ins in enumerate(prog):
+            if ins is _NOP:
+                continue
+            op, a = ins[0], ins[1]
+            out = self._live_out(prog, i, live_in, exit_live)
+            if op in _WRITES_A and op != OP_DIV_R and not out >> a & 1 \
+                    or op in (OP_CMP_I, OP_CMP_R) and not out & flag_bit:
+                prog[i] = _NOP
+                changed = True
+        return changed
+
+    def _live_out(self, prog, i, live_in, exit_live):
+        n = len(prog)
+        ins = prog[i]
+        if ins is not _NOP and ins[0] == OP_HALT:
+            return exit_live
+        live = 0
+        for j in self._successors(prog, i):
+            live |= live_in[j] if j < n else exit_live
+        return live
+
+    @staticmethod
+    def _live_in(ins, live, flag_bit):
+        if ins is _NOP:
+            return live
+        op, a, b = ins
+        if op in _WRITES_A:
+            live &= ~(1 << a)
+        if op in (OP_CMP_I, OP_CMP_R):
+            live &= ~flag_bit
+        if op in _READS_A:
+            live |= 1 << a
+        if op in _READS_B:
+            live |= 1 << b
+        if op == OP_JNE:
+            live |= flag_bit
+        return live
+
+    # ---- compactación ------------------------------------------------
+    @staticmethod
+    def _compact(prog, origins):
+        """Quita los NOP y reajusta los destinos de salto."""
+        n = len(prog)
+        new_index = [0] * (n + 1)
+        count = 0
+        for i in range(n):
+            new_index[i] = count
+            if prog[i] is not _NOP:
+                count += 1
+        new_index[n] = count
+        out, out_origins = [], []
+        for ins, origin in zip(prog, origins):
+            if ins is _NOP:
+                continue
+            if ins[0] in (OP_JMP, OP_JNE):
+                ins = [ins[0], new_index[ins[1]], None]
+            out.append(ins)
+            out_origins.append(origin)
+        return out, out_origins
+
+    # ---- listado -----------------------------------------------------
+    def listing(self) -> List[str]:
+        """Texto ensamblable del programa actual; las etiquetas conservan
+        su nombre original cuando apuntan al mismo sitio."""
+        asm = self.asm
+        program = asm.program
+        origins = asm.origins if asm.origins is not None else list(range(len(program)))
+        n = len(program)
+        positions = asm.label_positions()
+
+        targets = {a for op, a, _ in program if op in (OP_JMP, OP_JNE)}
+        names: Dict[int, str] = {}
+        for name, index in sorted(asm.labels.items(), key=lambda kv: kv[1]):
+            target = positions[name]
+            if target in targets:
+                names.setdefault(target, name)
+        for target in sorted(targets - names.keys()):
+            name = f"L{target}"
+            while name in asm.labels:
+                name += "_"
+            names[target] = name
+
+        lines = []
+        for i, (op, a, b) in enumerate(program):
+            if i in names:
+                lines.append(f"{names[i]}:")
+            if op == OP_TRAP:
+                lines.append(asm.instructions[origins[i]])
+                continue
+            mnemonic, kinds = _MNEMONICS[op]
+            args = []
+            for kind, value in zip(kinds, (a, b)):
+                if kind == 'r':
+                    args.append(asm.reg_names[value])
+                elif kind == 'l':
+                    args.append(names[value])
+                else:
+                    args.append(str(value))
+            lines.append(f"{mnemonic} {', '.join(args)}".rstrip())
+        if n in names:
+            lines.append(f"{names[n]}:")
+        return lines
+
+
+def _next(prog, i) -> int:
+    """Índice de la instrucción que se ejecuta después de ``prog[i]`` al seguir de largo."""
+    i += 1
+    while i < len(prog) and prog[i] is _NOP:
+        i += 1
+    return i
+
+
+def _same(x, y) -> bool:
+    return x is y or type(x) is int and type(y) is int and x == y
+
+
+def _join_flag(x, y):
+    if _same(x, y):
+        return x
+    if _UNSET in (x, y) or _MAYBE in (x, y):
+        return _MAYBE
+    return _UNKNOWN
+
+
+def _compute(op, x, y):
+    if x is _UNKNOWN or y is _UNKNOWN:
+        return _UNKNOWN
+    if op == OP_MUL_I and x.bit_length() + y.bit_length() > MAX_BITS:
+        return _UNKNOWN
+    if op == OP_DIV_I and y == 0:
+        return _UNKNOWN     # DIV r, r con divisor 0: se queda el error de ejecución
+    value = _ARITH[op](x, y)
+    return value if value.bit_length() <= MAX_BITS else _UNKNOWN
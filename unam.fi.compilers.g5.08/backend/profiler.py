@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Tuple
+
+from parser import ASTNode, FunctionNode, node_line  # type: ignore
+from semantic import Interpreter
+
+# ---------------------------------------------------------------------
+#  Perfilado del programa interpretado
+# ---------------------------------------------------------------------
+# Marco raíz de las pilas: el código de primer nivel
+MODULE = "<module>"
+
+
+class ProfilingInterpreter(Interpreter):
+    """:class:`semantic.Interpreter` que mide dónde pasa el tiempo el programa.
+
+    Por cada sentencia (según la ``line`` que anota el Parser) cuenta las
+    ejecuciones, el tiempo propio (sin las sentencias anidadas ni las
+    funciones llamadas) y el total. Por cada tipo de nodo en cada línea
+    cuenta evaluaciones y tiempo total, y por cada ``FunctionNode``
+    llamadas, tiempo propio y total. En las recursiones el total solo
+    cuenta la activación más externa, así que nunca supera al del programa.
+
+    El tiempo propio se reparte además por pila de llamadas, para generar
+    el formato "collapsed" que aceptan ``flamegraph.pl`` y speedscope.
+    Las expresiones heredan la línea de su sentencia.
+    """
+
+    def __init__(self, layouts: Dict[FunctionNode, Dict[str, int]] | None = None,
+                 budget=None, clock=time.perf_counter):
+        super().__init__(layouts, budget)
+        self.clock = clock
+        self.lines: Dict[int | None, List[float]] = {}      # línea → [ejecuciones, propio, total, activas]
+        self.nodes: Dict[Tuple[int | None, str], List[float]] = {}  # (línea, tipo) → [evaluaciones, total, activas]
+        self.functions: Dict[Any, List[Any]] = {}           # función → [nombre, línea, llamadas, propio, total, activas]
+        self.stacks: Dict[str, float] = {}                  # "a;b;c" → tiempo propio
+        self._module = self.functions[MODULE] = [MODULE, None, 1, 0.0, 0.0, 0]
+        self._frames: List[Tuple[str, List[Any]]] = [(MODULE, self._module)]
+        self._line: int | None = None
+        self._started = self._last = clock()
+
+    # ---- contabilidad ----------------------------------------------
+    def _charge(self) -> float:
+        """Asigna el tiempo desde la última marca a la sentencia, función y
+        pila que se están ejecutando. Devuelve la nueva marca: los totales
+        se miden entre marcas para que el tiempo propio nunca los supere."""
+        now = self.clock()
+        elapsed, self._last = now - self._last, now
+        stack, func = self._frames[-1]
+        func[3] += elapsed
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed
+        stats = self.lines.get(self._line)
+        if stats is not None:
+            stats[1] += elapsed
+        return now
+
+    def visit(self, node: ASTNode):
+        stmt_line = node_line(node)
+        if stmt_line is not None:
+            begin = self._charge()
+            stmt = self.lines.get(stmt_line)
+            if stmt is None:
+                stmt = self.lines[stmt_line] = [0, 0.0, 0.0, 0]
+            stmt[0] += 1
+            stmt[3] += 1
+            outer, self._line = self._line, stmt_line
+        key = (self._line, node._visit_name[6:])
+        stats = self.nodes.get(key)
+        if stats is None:
+            stats = self.nodes[key] = [0, 0.0, 0]
+        stats[0] += 1
+        stats[2] += 1
+        start = self.clock()
+        try:
+            return super().visit(node)
+        finally:
+            elapsed = self.clock() - start
+            stats[2] -= 1
+            if not stats[2]:
+                stats[1] += elapsed
+            if stmt_line is not None:
+                end = self._charge()
+                stmt[3] -= 1
+                if not stmt[3]:
+                    stmt[2] += end - begin
+                self._line = outer
+
+    def visit_FunctionNode(self, node: FunctionNode):
+        super().visit_FunctionNode(node)
+        inner = self._lookup(node.name)
+        func = self.functions.get(node)
+        if func is None:
+            func = self.functions[node] = [node.name, node_line(node), 0, 0.0, 0.0, 0]
+        frames = self._frames
+
+        def _profiled(*args):
+            begin = self._charge()
+            frames.append((f"{frames[-1][0]};{node.name}", func))
+            func[2] += 1
+            func[5] += 1
+            try:
+                return inner(*args)
+            finally:
+                end = self._charge()
+                frames.pop()
+                func[5] -= 1
+                if not func[5]:
+                    func[4] += end - begin
+
+        self._store(node.name, _profiled)
+
+    def visit_ProgramNode(self, node):
+        try:
+            return super().visit_ProgramNode(node)
+        finally:
+            self._module[4] = self._charge() - self._started
+
+    # ---- informe ---------------------------------------------------
+    def report(self, limit: int | None = 50) -> Dict[str, Any]:
+        """Informe ordenado de mayor a menor costo (en milisegundos).
+
+        ``lines``, ``nodes`` y ``functions`` se recortan a los ``limit``
+        más costosos; ``collapsed`` tiene una pila por línea, con el tiempo
+        propio en microsegundos.
+        """
+        lines = [
+            {"line": line, "hits": hits, "self_ms": own * 1e3, "total_ms": total * 1e3}
+            for line, (hits, own, total, _) in self.lines.items()
+        ]
+        lines.sort(key=lambda e: e["self_ms"], reverse=True)
+        nodes = [
+            {"line": line, "node": kind, "hits": hits, "total_ms": total * 1e3}
+            for (line, kind), (hits, total, _) in self.nodes.items()
+        ]
+        nodes.sort(key=lambda e: e["total_ms"], reverse=True)
+        functions = [
+            {"name": name, "line": line, "calls": calls, "self_ms": own * 1e3, "total_ms": total * 1e3}
+            for name, line, calls, own, total, _ in self.functions.values()
+        ]
+        functions.sort(key=lambda e: e["self_ms"], reverse=True)
+        collapsed = [f"{stack} {round(own * 1e6)}" for stack, own in self.stacks.items() if round(own * 1e6)]
+        return {
+            "total_ms": self._module[4] * 1e3,
+            "lines": lines[:limit],
+            "nodes": nodes[:limit],
+            "functions": functions[:limit],
+            "collapsed": "\n".join(collapsed),
+        }
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import multiprocessing
+import queue
+import threading
+from typing import Any, Dict, List, Tuple
+
+try:                            # solo existe en sistemas POSIX
+    import resource
+except ImportError:             # pragma: no cover - Windows
+    resource = None
+
+from limits import StepBudget
+from metrics import PhaseRecorder
+
+# ---------------------------------------------------------------------
+#  Trabajos
+# ---------------------------------------------------------------------
+# Un trabajo es una tupla que se envía tal cual al proceso trabajador:
+#   ("run", ast, engine, optimize, metrics, profile, max_steps, timeout) → link_and_run
+#   ("asm", code, optimize, metrics, profile, max_steps, timeout)        → SimpleAssembler.run
+# Con ``metrics`` el resultado incluye las fases medidas en el trabajador.
+Job = Tuple[Any, ...]
+
+
+def execute_job(job: Job) -> Dict[str, Any]:
+    """Ejecuta ``job`` en el proceso actual y devuelve un dict serializable.
+
+    Los errores del programa se devuelven como ``{"error": mensaje}`` en vez
+    de propagarse, para que viajen de vuelta por el pipe; un ``MemoryError``
+    se devuelve como el límite ``"memory"`` en ``limit_exceeded``.
+    ``globals`` no se incluye: puede contener funciones, que no se pueden
+    serializar.
+    """
+    kind = job[0]
+    recorder = None
+    try:
+        if kind == "run":
+            from semantic import link_and_run
+            _, ast, engine, optimize, metrics, profile, max_steps, timeout = job
+            recorder = PhaseRecorder() if metrics else None
+            result = link_and_run(ast, engine=engine, budget=StepBudget(max_steps, timeout),
+                                  optimize=optimize, metrics=recorder, profile=profile)
+            result.pop("globals", None)
+        elif kind == "asm":
+            from assembler import SimpleAssembler
+            _, code, optimize, metrics, profile, max_steps, timeout = job
+            recorder = PhaseRecorder() if metrics else None
+            result = SimpleAssembler(StepBudget(max_steps, timeout)).run(
+                code, optimize=optimize, metrics=recorder, profile=profile)
+        else:
+            raise ValueError(f"Tipo de trabajo desconocido: '{kind}'")
+    except MemoryError as e:
+        # Fuera de la ejecución (al resolver, ensamblar, optimizar...): el
+        # mismo resultado que reportan link_and_run y SimpleAssembler.run
+        limit = StepBudget(job[-2], job[-1]).memory_exceeded(e)
+        result = {"output": "", "limit_exceeded": limit.to_dict()}
+    except Exception as e:
+        result = {"error": str(e) or type(e).__name__}
+    if recorder is not None:
+        result["metrics"] = recorder.to_dict()
+    return result
+
+
+def _worker_main(conn, memory_bytes: int | None, cpu_seconds: int | None):
+    # Importar aquí deja al trabajador "caliente": los módulos ya están
+    # cargados cuando llega el primer trabajo.
+    import parser, semantic, assembler, compiler, bytecode, optimizer, peephole, profiler  # noqa: F401
+
+    if resource is not None and memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        if resource is not None and cpu_seconds:
+            # RLIMIT_CPU es acumulativo: se mueve el límite suave a lo ya
+            # consumido + la cuota del trabajo. Al excederlo el kernel
+            # termina el proceso (SIGXCPU) y el pool lo reemplaza.
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime) + 1
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = used + cpu_seconds
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        conn.send(execute_job(job))
+
+
+# ---------------------------------------------------------------------
+#  Errores del pool
+# ---------------------------------------------------------------------
+class SandboxBusy(Exception):
+    """La cola de espera está llena (el servidor responde 429)."""
+
+
+class SandboxUnavailable(Exception):
+    """No hubo un trabajador libre a tiempo o el pool está cerrado (503)."""
+
+
+class SandboxJobFailed(Exception):
+    """El trabajador murió o se pasó del tiempo máximo y fue reemplazado."""
+
+
+# ---------------------------------------------------------------------
+#  Pool de procesos
+# ---------------------------------------------------------------------
+class _Worker:
+    __slots__ = ("process", "conn")
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+
+class SandboxPool:
+    """Pool de procesos pre-creados que ejecutan programas aislados.
+
+    Cada trabajador atiende un trabajo a la vez. A lo sumo ``max_queue``
+    peticiones esperan un trabajador libre; más allá se lanza
+    :class:`SandboxBusy`. Si la espera supera ``queue_timeout`` se lanza
+    :class:`SandboxUnavailable`. Un trabajo que tarda más de
+    ``job_timeout`` segundos, o cuyo proceso muere (memoria, CPU,
+    fallo), se reporta con :class:`SandboxJobFailed` y el proceso se
+    reemplaza por uno nuevo.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 16, queue_timeout: float = 10.0,
+                 job_timeout: float = 30.0, memory_mb: int | None = 256,
+                 cpu_seconds: int | None = 10):
+        self.size = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.job_timeout = job_timeout
+        self.memory_bytes = memory_mb * 1024 * 1024 if memory_mb else None
+        self.cpu_seconds = cpu_seconds
+        self._ctx = multiprocessing.get_context()
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+        for _ in range(workers):
+            worker = self._spawn()
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+    # ---- procesos ----------------------------------------------------
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.memory_bytes, self.cpu_seconds),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        new = self._spawn()
+        with self._lock:
+            self._workers[self._workers.index(worker)] = new
+        return new
+
+    # ---- API ---------------------------------------------------------
+    def run(self, job: Job) -> Dict[str, Any]:
+        """Ejecuta ``job`` en un trabajador libre y devuelve su resultado."""
+        with self._lock:
+            if self._closed:
+                raise SandboxUnavailable("El pool de ejecución está cerrado.")
+            if self._pending >= self.size + self.max_queue:
+                raise SandboxBusy("Demasiadas ejecuciones en espera; intenta más tarde.")
+            self._pending += 1
+        try:
+            try:
+                worker = self._idle.get(timeout=self.queue_timeout)
+            except queue.Empty:
+                raise SandboxUnavailable("No hay trabajadores libres; intenta más tarde.") from None
+            try:
+                worker.conn.send(job)
+                # poll también regresa True si el proceso murió (EOF)
+                if not worker.conn.poll(self.job_timeout):
+                    worker = self._replace(worker)
+                    raise SandboxJobFailed(f"La ejecución superó {self.job_timeout} s y fue detenida.")
+                return worker.conn.recv()
+            except (EOFError, OSError):
+                worker = self._replace(worker)
+                raise SandboxJobFailed("El proceso de ejecución terminó inesperadamente "
+                                       "(límite de memoria o CPU excedido).") from None
+            finally:
+                self._idle.put(worker)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"workers": self.size, "pending": self._pending, "idle": self._idle.qsize()}
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.conn.close()
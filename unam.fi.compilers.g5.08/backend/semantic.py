@@ -32,9 +32,19 @@ from parser import (  # type: ignore
     TupleNode,
     UnaryOpNode,
     BinaryOpNode,
+    CompareNode,
+    IndexNode,
+    AttributeNode,
     FunctionCallNode,
     MethodCallNode,
+    NODE,
+    NODES,
+    PAIRS,
+    BRANCHES,
+    node_span,
 )
+from limits import StepBudget, ExecutionLimitExceeded, MAX_CALL_DEPTH, affordable, recursion_limit
+from metrics import PhaseRecorder, phase
 
 # ---------------------------------------------------------------------
 #  Infraestructura de visitante genérico
@@ -43,18 +53,30 @@ class NodeVisitor:
     """Visitor genérico con *double dispatch* minimalista."""
 
     def visit(self, node: ASTNode):
-        method_name = f"visit_{type(node).__name__}"
-        method = getattr(self, method_name, self.generic_visit)
+        # ``_visit_name`` ya está precalculado en cada clase de nodo
+        method = getattr(self, node._visit_name, None) or self.generic_visit
         return method(node)
 
     def generic_visit(self, node: ASTNode):
-        for attr in vars(node).values():
-            if isinstance(attr, list):
-                for item in attr:
-                    if isinstance(item, ASTNode):
+        # Recorre solo los campos que el esquema declara como hijos
+        for field, kind in node._children:
+            child = getattr(node, field)
+            if not child:
+                continue
+            if kind == NODE:
+                self.visit(child)
+            elif kind == NODES:
+                for item in child:
+                    self.visit(item)
+            elif kind == PAIRS:
+                for key, val in child:
+                    self.visit(key)
+                    self.visit(val)
+            elif kind == BRANCHES:
+                for cond, body in child:
+                    self.visit(cond)
+                    for item in body:
                         self.visit(item)
-            elif isinstance(attr, ASTNode):
-                self.visit(attr)
 
 # ---------------------------------------------------------------------
 #  1) Analizador semántico
@@ -64,8 +86,9 @@ class SemanticAnalyzer(NodeVisitor):
 
     BUILTINS: Set[str] = {"print", "len", "str", "int", "float", "bool", "list", "dict"}
 
-    def __init__(self):
+    def __init__(self, line_index=None):
         self.errors: List[str] = []
+        self.line_index = line_index    # lexer.LineIndex: ubica los errores
         self.scopes: List[Dict[str, bool]] = [{}]      # pila de scopes
         self.functions: Dict[str, FunctionNode] = {}
         self.classes: Dict[str, ClassNode] = {}
@@ -73,6 +96,13 @@ class SemanticAnalyzer(NodeVisitor):
         self.current_function: FunctionNode | None = None
 
     # ---- helpers de símbolos ---------------------------------------
+    def _error(self, message: str, node: ASTNode):
+        """Registra ``message`` con la línea y columna de ``node`` si se conocen."""
+        start = node_span(node)[0]
+        if self.line_index is not None and start is not None:
+            message = f"{message} ({self.line_index.describe(start)})"
+        self.errors.append(message + ".")
+
     def _declare(self, name: str):
         self.scopes[-1][name] = True
 
@@ -94,7 +124,7 @@ class SemanticAnalyzer(NodeVisitor):
     # --- declaraciones ---------------------------------------------
     def visit_FunctionNode(self, node: FunctionNode):
         if node.name in self.functions or node.name in self.classes:
-            self.errors.append(f"Función o clase duplicada: '{node.name}'.")
+            self._error(f"Función o clase duplicada: '{node.name}'", node)
             return
         self.functions[node.name] = node
 
@@ -111,7 +141,7 @@ class SemanticAnalyzer(NodeVisitor):
 
     def visit_ClassNode(self, node: ClassNode):
         if node.name in self.classes or node.name in self.functions:
-            self.errors.append(f"Función o clase duplicada: '{node.name}'.")
+            self._error(f"Función o clase duplicada: '{node.name}'", node)
             return
         self.classes[node.name] = node
 
@@ -170,13 +200,13 @@ class SemanticAnalyzer(NodeVisitor):
     # --- sentencias simples ----------------------------------------
     def visit_ReturnNode(self, node: ReturnNode):
         if self.current_function is None:
-            self.errors.append("'return' fuera de una función.")
+            self._error("'return' fuera de una función", node)
         if node.value:
             self.visit(node.value)
 
     def visit_BreakNode(self, node: BreakNode):
         if self.loop_depth == 0:
-            self.errors.append("'break' fuera de un bucle.")
+            self._error("'break' fuera de un bucle", node)
 
     def visit_PassNode(self, node: PassNode):
         pass
@@ -187,23 +217,23 @@ class SemanticAnalyzer(NodeVisitor):
 
     def visit_AugmentedAssignmentNode(self, node: AugmentedAssignmentNode):
         if not self._is_declared(node.target):
-            self.errors.append(f"Variable no declarada antes de usarla: '{node.target}'.")
+            self._error(f"Variable no declarada antes de usarla: '{node.target}'", node)
         self.visit(node.value)
 
     # --- expresiones -----------------------------------------------
     def visit_IdentifierNode(self, node: IdentifierNode):
         if not self._is_declared(node.name):
-            self.errors.append(f"Identificador no declarado: '{node.name}'.")
+            self._error(f"Identificador no declarado: '{node.name}'", node)
 
     def visit_FunctionCallNode(self, node: FunctionCallNode):
         if node.name not in self.functions and node.name not in self.BUILTINS:
-            self.errors.append(f"Llamada a función no definida: '{node.name}'.")
+            self._error(f"Llamada a función no definida: '{node.name}'", node)
         for arg in node.args:
             self.visit(arg)
 
     def visit_MethodCallNode(self, node: MethodCallNode):
         if not self._is_declared(node.obj):
-            self.errors.append(f"Objeto no declarado: '{node.obj}'.")
+            self._error(f"Objeto no declarado: '{node.obj}'", node)
         for arg in node.args:
             self.visit(arg)
             
@@ -212,6 +242,54 @@ class SemanticAnalyzer(NodeVisitor):
         self.visit(node.index)
 
 
+class Resolver(SemanticAnalyzer):
+    """Análisis semántico que además asigna un slot a cada local de función.
+
+    Reutiliza la pila de scopes de :class:`SemanticAnalyzer`: todo nombre que
+    se declara dentro de una función (parámetros, asignaciones, ``for``,
+    ``except ... as``, ``import`` y ``def``/``class`` anidados) recibe un
+    índice en el *layout* de esa función. Los parámetros ocupan los primeros
+    slots, en orden. Los cuerpos de clase no aportan locales: sus nombres
+    viven en el diccionario de la clase.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.layouts: Dict[FunctionNode, Dict[str, int]] = {}
+        self._layout_stack: List[Dict[str, int] | None] = []
+
+    def resolve(self, ast: ProgramNode) -> Dict[FunctionNode, Dict[str, int]]:
+        self.analyze(ast)
+        return self.layouts
+
+    # ---- helpers de slots ------------------------------------------
+    def _bind(self, name: str):
+        if self._layout_stack and self._layout_stack[-1] is not None:
+            layout = self._layout_stack[-1]
+            layout.setdefault(name, len(layout))
+
+    def _declare(self, name: str):
+        super()._declare(name)
+        self._bind(name)
+
+    # ---- visitors --------------------------------------------------
+    def visit_FunctionNode(self, node: FunctionNode):
+        self._bind(node.name)
+        self._layout_stack.append(self.layouts.setdefault(node, {}))
+        super().visit_FunctionNode(node)
+        self._layout_stack.pop()
+
+    def visit_ClassNode(self, node: ClassNode):
+        self._bind(node.name)
+        self._layout_stack.append(None)
+        super().visit_ClassNode(node)
+        self._layout_stack.pop()
+
+    def visit_AugmentedAssignmentNode(self, node: AugmentedAssignmentNode):
+        super().visit_AugmentedAssignmentNode(node)
+        self._bind(node.target)
+
+
 # ---------------------------------------------------------------------
 # 2) Intérprete / Linker
 # ---------------------------------------------------------------------
@@ -219,14 +297,78 @@ class _ReturnSignal(Exception):
     def __init__(self, value):
         self.value = value
 
+
+class _Unset:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<unset>"
+
+
+UNSET = _Unset()  # slot local aún sin asignar
+
+
+class Frame:
+    """Registro de activación de una llamada: slots locales + marco padre.
+
+    ``parent`` es el marco donde se *definió* la función (alcance léxico),
+    no el del llamador. Leer un slot aún vacío continúa la búsqueda hacia
+    afuera y, al final, en ``globals``.
+    """
+
+    __slots__ = ("layout", "values", "parent")
+
+    def __init__(self, layout: Dict[str, int], parent: "Frame | None" = None):
+        self.layout = layout
+        self.values: List[Any] = [UNSET] * len(layout)
+        self.parent = parent
+
+    def lookup(self, name: str):
+        frame = self
+        while frame is not None:
+            slot = frame.layout.get(name)
+            if slot is not None:
+                val = frame.values[slot]
+                if val is not UNSET:
+                    return val
+            frame = frame.parent
+        return UNSET
+
+# Fuera de los topes se lanza ``MemoryError``: ``link_and_run`` lo reporta
+# como el límite ``"memory"``, igual que uno real
+
+def _add(a, b):
+    """``a + b`` si el resultado cabe en los topes de :func:`limits.affordable`."""
+    if affordable("+", a, b):
+        return a + b
+    raise MemoryError("el resultado de '+' es demasiado grande")
+
+
+def _mul(a, b):
+    """``a * b`` si el resultado cabe en los topes de :func:`limits.affordable`."""
+    if affordable("*", a, b):
+        return a * b
+    raise MemoryError("el resultado de '*' es demasiado grande")
+
+
+def _pow(a, b):
+    """``a ** b`` si el resultado cabe en los topes de :func:`limits.affordable`."""
+    if affordable("**", a, b):
+        return a ** b
+    raise MemoryError("el resultado de '**' es demasiado grande")
+
+
 class Interpreter(NodeVisitor):
     """Ejecuta el AST tras pasar el análisis semántico."""
 
     BIN_OPS = {
-        "+": _op.add,  "-": _op.sub, "*": _op.mul, "/": _op.truediv,
-        "//": _op.floordiv, "%": _op.mod,
+        "+": _add,     "-": _op.sub, "*": _mul, "/": _op.truediv,
+        "//": _op.floordiv, "%": _op.mod, "**": _pow,
         "==": _op.eq, "!=": _op.ne,
         "<": _op.lt, "<=": _op.le, ">": _op.gt, ">=": _op.ge,
+        "in": lambda a, b: a in b,
+        "not in": lambda a, b: a not in b,
+        "is": _op.is_, "is not": _op.is_not,
         "and": lambda a, b: a and b,
         "or":  lambda a, b: a or b,
     }
@@ -236,11 +378,38 @@ class Interpreter(NodeVisitor):
         "not": lambda x: not x,
     }
 
-    def __init__(self):
+    def __init__(self, layouts: Dict[FunctionNode, Dict[str, int]] | None = None,
+                 budget: StepBudget | None = None):
         self.globals: Dict[str, Any] = {}
         self.output: List[str] = []
+        self.layouts = layouts
+        self.frame: Frame | None = None
+        self.budget = budget or StepBudget()    # cuenta iteraciones y llamadas
+        self.call_depth = 0                     # llamadas en curso (ver MAX_CALL_DEPTH)
 
     # ---- helpers ---------------------------------------------------
+    def _lookup(self, name: str):
+        if self.frame is not None:
+            val = self.frame.lookup(name)
+            if val is not UNSET:
+                return val
+        return self.globals.get(name, UNSET)
+
+    def _load(self, name: str):
+        val = self._lookup(name)
+        if val is UNSET:
+            raise RuntimeError(f"Variable '{name}' no definida.")
+        return val
+
+    def _store(self, name: str, value: Any):
+        frame = self.frame
+        if frame is not None:
+            slot = frame.layout.get(name)
+            if slot is not None:
+                frame.values[slot] = value
+                return
+        self.globals[name] = value
+
     def _call_builtin(self, name: str, args: List[Any]):
         if name == "print":
             self.output.append(" ".join(str(a) for a in args))
@@ -253,17 +422,29 @@ class Interpreter(NodeVisitor):
 
     # ---- visitores -------------------------------------------------
     def visit_ProgramNode(self, node: ProgramNode):
+        if self.layouts is None:
+            self.layouts = Resolver().resolve(node)
         for stmt in node.body:
             self.visit(stmt)
         return {"output": self.output, "globals": self.globals}
 
     # --- declaraciones ---------------------------------------------
     def visit_FunctionNode(self, node: FunctionNode):
-        # Guardamos una función Python-callback en globals
+        # Guardamos una función Python-callback; cada llamada crea su Frame
+        layout = self.layouts[node]
+        param_slots = [layout[p] for p in node.params]
+        parent = self.frame
+        tick = self.budget.tick
+
         def _fn(*args):
-            local_env_backup = self.globals.copy()
-            for name, val in zip(node.params, args):
-                self.globals[name] = val
+            tick()
+            if self.call_depth >= MAX_CALL_DEPTH:
+                raise RecursionError(f"más de {MAX_CALL_DEPTH} llamadas anidadas")
+            frame = Frame(layout, parent)
+            for slot, val in zip(param_slots, args):
+                frame.values[slot] = val
+            caller, self.frame = self.frame, frame
+            self.call_depth += 1
             try:
                 for st in node.body:
                     self.visit(st)
@@ -272,24 +453,27 @@ class Interpreter(NodeVisitor):
             else:
                 result = None
             finally:
-                self.globals = local_env_backup
+                self.frame = caller
+                self.call_depth -= 1
             return result
 
-        self.globals[node.name] = _fn
+        self._store(node.name, _fn)
 
     def visit_ClassNode(self, node: ClassNode):
         # Implementación mínima: dict con métodos
         cls_dict: Dict[str, Any] = {}
-        orig_globals = self.globals
-        self.globals = cls_dict
-        for stmt in node.body:
-            self.visit(stmt)
-        self.globals = orig_globals
-        self.globals[node.name] = cls_dict
+        orig_globals, orig_frame = self.globals, self.frame
+        self.globals, self.frame = cls_dict, None
+        try:
+            for stmt in node.body:
+                self.visit(stmt)
+        finally:
+            self.globals, self.frame = orig_globals, orig_frame
+        self._store(node.name, cls_dict)
 
     def visit_ImportNode(self, node: ImportNode):
         for mod, alias in node.names:
-            self.globals[alias or mod.split(".")[0]] = __import__(mod)
+            self._store(alias or mod.split(".")[0], __import__(mod))
 
     # --- control de flujo ------------------------------------------
     def visit_IfNode(self, node: IfNode):
@@ -307,14 +491,18 @@ class Interpreter(NodeVisitor):
                 self.visit(st)
 
     def visit_WhileNode(self, node: WhileNode):
+        tick = self.budget.tick
         while self.visit(node.cond):
+            tick()
             for st in node.body:
                 self.visit(st)
 
     def visit_ForNode(self, node: ForNode):
         iterable = self.visit(node.iterable)
+        tick = self.budget.tick
         for val in iterable:
-            self.globals[node.target] = val
+            tick()
+            self._store(node.target, val)
             for st in node.body:
                 self.visit(st)
 
@@ -328,7 +516,7 @@ class Interpreter(NodeVisitor):
                 if h.exc is None or (h.exc.split()[0] == type(e).__name__):
                     if h.exc and " as " in h.exc:
                         alias = h.exc.split(" as ")[-1]
-                        self.globals[alias] = e
+                        self._store(alias, e)
                     for st in h.body:
                         self.visit(st)
                     handled = True
@@ -356,21 +544,21 @@ class Interpreter(NodeVisitor):
         raise _ReturnSignal(value)
 
     def visit_AssignmentNode(self, node: AssignmentNode):
-        self.globals[node.target] = self.visit(node.value)
+        self._store(node.target, self.visit(node.value))
 
     def visit_AugmentedAssignmentNode(self, node: AugmentedAssignmentNode):
-        val = self.globals.get(node.target, 0)
+        val = self._lookup(node.target)
+        if val is UNSET:
+            val = 0
         rhs = self.visit(node.value)
         op_fn = self.BIN_OPS.get(node.op)
         if op_fn is None:
             raise RuntimeError(f"Operador compuesto no soportado: {node.op}")
-        self.globals[node.target] = op_fn(val, rhs)
+        self._store(node.target, op_fn(val, rhs))
 
     # --- expresiones -----------------------------------------------
     def visit_IdentifierNode(self, node: IdentifierNode):
-        if node.name in self.globals:
-            return self.globals[node.name]
-        raise RuntimeError(f"Variable '{node.name}' no definida.")
+        return self._load(node.name)
 
     def visit_ConstantNode(self, node: ConstantNode):
         return int(node.value) if isinstance(node.value, str) and node.value.isdigit() else node.value
@@ -399,10 +587,21 @@ class Interpreter(NodeVisitor):
             raise RuntimeError(f"Operador binario '{node.op}' no soportado.")
         return op_fn(self.visit(node.left), self.visit(node.right))
 
+    def visit_CompareNode(self, node: CompareNode):
+        left = self.visit(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = self.visit(comparator)
+            result = self.BIN_OPS[op](left, right)
+            if not result:
+                return result
+            left = right
+        return result
+
     def visit_FunctionCallNode(self, node: FunctionCallNode):
         args = [self.visit(a) for a in node.args]
-        if node.name in self.globals:
-            return self.globals[node.name](*args)
+        fn = self._lookup(node.name)
+        if fn is not UNSET:
+            return fn(*args)
         return self._call_builtin(node.name, args)
 
     def visit_MethodCallNode(self, node: MethodCallNode):
@@ -421,6 +620,13 @@ class Interpreter(NodeVisitor):
         except Exception as e:
             raise RuntimeError(f"Error al indexar: {e}")
 
+    def visit_AttributeNode(self, node: AttributeNode):
+        obj = self.visit(node.obj)
+        try:
+            return getattr(obj, node.attr)
+        except AttributeError:
+            raise RuntimeError(f"Objeto no tiene atributo '{node.attr}'.") from None
+
 
 # Alias Linker
 Linker = Interpreter
@@ -428,20 +634,97 @@ Linker = Interpreter
 # ---------------------------------------------------------------------
 # 3) Función de alto nivel
 # ---------------------------------------------------------------------
-def link_and_run(ast: ProgramNode):
+# Motores de ejecución aceptados por ``link_and_run``
+ENGINES = ("visitor", "compiled", "vm")
+
+
+def link_and_run(ast: ProgramNode, engine: str = "visitor", budget: StepBudget | None = None,
+                 optimize: bool = False, metrics: PhaseRecorder | None = None, profile: bool = False):
     """Realiza semántica + ejecución. Devuelve dict con salida y globals.
 
+    ``engine`` elige cómo se ejecuta el AST: ``"visitor"`` lo recorre con
+    :class:`Interpreter`, ``"compiled"`` lo traduce primero a closures
+    (:mod:`compiler`) y ``"vm"`` lo baja a bytecode para la máquina virtual
+    de :mod:`bytecode`.
+
+    Si la ejecución agota ``budget`` (ver :class:`limits.StepBudget`) se
+    devuelve la salida producida hasta ese momento junto con
+    ``limit_exceeded``, que describe el límite alcanzado; un
+    ``MemoryError`` (real o por los topes de :func:`limits.affordable`) se
+    reporta igual, como el límite ``"memory"``.
+
+    Un programa admite :data:`limits.MAX_CALL_DEPTH` llamadas anidadas en
+    cualquier motor; mientras se ejecuta se sube el límite de recursión de
+    Python (ver :func:`limits.recursion_limit`). Si se pasa de uno u otro,
+    se lanza ``RuntimeError``.
+
+    Con ``optimize`` el AST pasa antes por :func:`optimizer.fold_constants`
+    (plegado de constantes y poda de ramas muertas) y el resultado incluye
+    ``optimizations``, el informe de lo que se cambió. El análisis
+    semántico se hace siempre sobre el AST original.
+
+    ``metrics`` (un :class:`metrics.PhaseRecorder`) recibe las fases
+    ``resolve``, ``optimize`` y ``execute``; esta última incluye la
+    traducción a closures o bytecode y cuenta los pasos ejecutados.
+
+    Con ``profile`` (solo en el motor ``"visitor"``) el programa se ejecuta
+    con :class:`profiler.ProfilingInterpreter` y el resultado incluye
+    ``profile``: líneas, nodos y funciones más costosos y las pilas en
+    formato "collapsed" para flamegraphs.
+
     Uso:
     ----
     >>> from parser import Parser   # token_list ya debe existir
     >>> ast = Parser(tokens).parse()
-    >>> result = link_and_run(ast)
+    >>> result = link_and_run(ast, engine="compiled")
     >>> print(result['output'])
     """
-    sem = SemanticAnalyzer()
-    errs = sem.analyze(ast)
-    if errs:
-        return {"errors": errs}
-
-    intrp = Interpreter()
-    return intrp.visit(ast)
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de ejecución desconocido: '{engine}'")
+    if profile and engine != "visitor":
+        raise ValueError("El perfilado solo está disponible con el motor 'visitor'.")
+
+    with phase(metrics, "resolve") as counts:
+        sem = Resolver()
+        layouts = sem.resolve(ast)
+        counts["errors"] = len(sem.errors)
+    if sem.errors:
+        return {"errors": sem.errors}
+
+    report = None
+    if optimize:
+        from optimizer import fold_constants  # import diferido: optimizer depende de este módulo
+        with phase(metrics, "optimize") as counts:
+            ast, report = fold_constants(ast, layouts)
+            counts["changes"] = len(report)
+
+    if profile:
+        from profiler import ProfilingInterpreter  # import diferido: profiler depende de este módulo
+        intrp = ProfilingInterpreter(layouts, budget)
+    else:
+        intrp = Interpreter(layouts, budget)
+    module_globals = intrp.globals      # las clases lo cambian mientras corren
+    with phase(metrics, "execute") as counts:
+        try:
+            with recursion_limit():
+                if engine == "compiled":
+                    from compiler import ClosureCompiler  # import diferido: compiler depende de este módulo
+                    result = ClosureCompiler(intrp).run(ast)
+                elif engine == "vm":
+                    from bytecode import VirtualMachine
+                    result = VirtualMachine(intrp).run(ast)
+                else:
+                    result = intrp.visit(ast)
+        except ExecutionLimitExceeded as exc:
+            result = {"output": intrp.output, "globals": module_globals, "limit_exceeded": exc.to_dict()}
+        except MemoryError as exc:
+            limit = intrp.budget.memory_exceeded(exc)
+            result = {"output": intrp.output, "globals": module_globals, "limit_exceeded": limit.to_dict()}
+        except RecursionError:
+            raise RuntimeError("Recursión demasiado profunda: el programa anida demasiadas llamadas.") from None
+        counts["steps"] = intrp.budget.steps
+    if report is not None:
+        result["optimizations"] = report
+    if profile:
+        result["profile"] = intrp.report()
+    return result
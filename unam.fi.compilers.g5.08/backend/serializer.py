@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Tuple
+
+from parser import ASTNode, NODE, NODES, PAIRS, BRANCHES
+
+# ---------------------------------------------------------------------
+#  Serializador JSON del AST guiado por el esquema de nodos
+# ---------------------------------------------------------------------
+try:
+    from json.encoder import c_encode_basestring_ascii as _encode_str
+except ImportError:             # pragma: no cover - sin el acelerador en C
+    from json.encoder import py_encode_basestring_ascii as _encode_str
+
+VALUE = 'value'     # campo con datos simples (nombres, operadores, literales)
+
+
+class RawJSON(str):
+    """Texto JSON ya serializado que debe insertarse tal cual."""
+    __slots__ = ()
+
+
+class ASTSerializer:
+    """Escribe el AST como JSON en una sola pasada, sin dicts intermedios.
+
+    Por defecto produce lo mismo que ``json.dumps(to_dict(ast),
+    sort_keys=True)``, con separadores compactos. Opciones:
+
+    * ``tags``: añade ``"_type": "<Clase>"`` a cada nodo.
+    * ``max_depth``: los nodos más profundos (la raíz es 0) se sustituyen
+      por ``{"_truncated": "<Clase>"}``.
+    * ``compact``: cada nodo es un arreglo ``["<Clase>", campo1, ...]`` con
+      los campos en el orden de ``_fields`` de su clase.
+    """
+
+    def __init__(self, tags: bool = False, max_depth: int | None = None, compact: bool = False):
+        self.tags = tags
+        self.max_depth = max_depth
+        self.compact = compact
+        self._plans: Dict[type, Tuple[str, Tuple[Tuple[str, str, str], ...]]] = {}
+
+    def dumps(self, node: Any) -> str:
+        out: List[str] = []
+        self._value(node, 0, out)
+        return ''.join(out)
+
+    # ---- plan por clase ----------------------------------------------
+    def _plan(self, cls: type):
+        """(nombre codificado, ((campo, tipo, clave codificada), ...))."""
+        plan = self._plans.get(cls)
+        if plan is None:
+            kinds = dict(cls._children)
+            fields = cls._fields if self.compact else sorted(cls._fields)
+            plan = (
+                _encode_str(cls.__name__),
+                tuple((f, kinds.get(f, VALUE), _encode_str(f) + ':') for f in fields),
+            )
+            self._plans[cls] = plan
+        return plan
+
+    # ---- escritura ---------------------------------------------------
+    def _node(self, node: ASTNode, depth: int, out: List[str]):
+        name, fields = self._plan(type(node))
+        if self.max_depth is not None and depth > self.max_depth:
+            out.append('{"_truncated":' + name + '}')
+            return
+        depth += 1
+        if self.compact:
+            out.append('[' + name)
+            for field, kind, _ in fields:
+                out.append(',')
+                self._field(getattr(node, field), kind, depth, out)
+            out.append(']')
+            return
+        out.append('{"_type":' + name if self.tags else '{')
+        sep = self.tags
+        for field, kind, key in fields:
+            out.append(',' + key if sep else key)
+            sep = True
+            self._field(getattr(node, field), kind, depth, out)
+        out.append('}')
+
+    def _field(self, val: Any, kind: str, depth: int, out: List[str]):
+        if val is None:
+            out.append('null')
+        elif kind == NODE:
+            self._value(val, depth, out)
+        elif kind == NODES:
+            self._seq(val, depth, out)
+        elif kind == PAIRS:
+            out.append('[')
+            for i, (key, item) in enumerate(val):
+                out.append('[' if i == 0 else ',[')
+                self._value(key, depth, out)
+                out.append(',')
+                self._value(item, depth, out)
+                out.append(']')
+            out.append(']')
+        elif kind == BRANCHES:
+            out.append('[')
+            for i, (cond, body) in enumerate(val):
+                out.append('[' if i == 0 else ',[')
+                self._value(cond, depth, out)
+                out.append(',')
+                self._seq(body, depth, out)
+                out.append(']')
+            out.append(']')
+        else:
+            self._value(val, depth, out)
+
+    def _seq(self, items, depth: int, out: List[str]):
+        out.append('[')
+        for i, item in enumerate(items):
+            if i:
+                out.append(',')
+            self._value(item, depth, out)
+        out.append(']')
+
+    def _value(self, val: Any, depth: int, out: List[str]):
+        if isinstance(val, ASTNode):
+            self._node(val, depth, out)
+        elif isinstance(val, str):
+            out.append(_encode_str(val))
+        elif val is None:
+            out.append('null')
+        elif val is True:
+            out.append('true')
+        elif val is False:
+            out.append('false')
+        elif isinstance(val, (list, tuple)):
+            self._seq(val, depth, out)
+        else:
+            out.append(json.dumps(val, default=str))
+
+
+def dump_ast(node: Any, tags: bool = False, max_depth: int | None = None,
+             compact: bool = False) -> RawJSON:
+    """Serializa ``node`` a JSON (ver :class:`ASTSerializer`)."""
+    if not tags and max_depth is None and not compact:
+        return RawJSON(_DEFAULT.dumps(node))
+    return RawJSON(ASTSerializer(tags, max_depth, compact).dumps(node))
+
+
+_DEFAULT = ASTSerializer()
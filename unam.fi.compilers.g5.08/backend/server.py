@@ -1,25 +1,126 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import tokenize
-import token as token_module
-import keyword
-from io import BytesIO
-
-from parser import Parser
+import json
+import os
+import atexit
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from parser import Parser, ASTNode, NESTING_ERROR
+from lexer import iter_tokens, LineIndex, TokenStats
 from semantic import SemanticAnalyzer
-from assembler import SimpleAssembler
-from semantic import link_and_run
+from sandbox import SandboxPool, SandboxBusy, SandboxUnavailable, SandboxJobFailed, execute_job
+from cache import LRUCache, cache_key
+from serializer import RawJSON, dump_ast
+from documents import Document
+from limits import EXEC_STACK_SIZE
+from metrics import (PhaseRecorder, Registry, Counter, Histogram, SECONDS_BUCKETS, BYTES_BUCKETS,
+                     phase, count_nodes)
 
 
 app = Flask(__name__)
 CORS(app)
 
-def simulate_assembler(code):
-    asm = SimpleAssembler()
-    return asm.run(code)
+# Sin sandbox, los programas corren en los hilos que atienden peticiones (y
+# en los del lote) con el límite de recursión subido: se crean con más pila
+try:
+    threading.stack_size(EXEC_STACK_SIZE)
+except (ValueError, RuntimeError):     # la plataforma no deja cambiarla
+    pass
+
+# Límites por ejecución (modos que corren el programa y asm)
+app.config['MAX_STEPS'] = int(os.environ.get('ANALYZE_MAX_STEPS', 1_000_000))
+app.config['EXEC_TIMEOUT'] = float(os.environ.get('ANALYZE_TIMEOUT', 5.0))
+
+# Optimizar antes de ejecutar: plegado de constantes del AST y mirilla del
+# ensamblador (la petición puede cambiarlo con ``optimize``)
+app.config['OPTIMIZE'] = bool(int(os.environ.get('ANALYZE_OPTIMIZE', 1)))
+
+# Pool de procesos para las ejecuciones (0 trabajadores = en el mismo hilo)
+app.config['SANDBOX_WORKERS'] = int(os.environ.get('SANDBOX_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['SANDBOX_QUEUE'] = int(os.environ.get('SANDBOX_QUEUE', 16))
+app.config['SANDBOX_MEMORY_MB'] = int(os.environ.get('SANDBOX_MEMORY_MB', 256))
+app.config['SANDBOX_CPU_SECONDS'] = int(os.environ.get('SANDBOX_CPU_SECONDS', 10))
+
+# Análisis por lotes
+app.config['BATCH_MAX_ITEMS'] = int(os.environ.get('BATCH_MAX_ITEMS', 1000))
+app.config['BATCH_CONCURRENCY'] = int(os.environ.get('BATCH_CONCURRENCY', max(1, app.config['SANDBOX_WORKERS'])))
+
+# Caché de léxico/AST/semántica por (código, modo)
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 512))
+app.config['CACHE_MAX_BYTES'] = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Documentos abiertos para análisis incremental (tamaño aproximado en memoria)
+app.config['DOCUMENT_MAX_ENTRIES'] = int(os.environ.get('DOCUMENT_MAX_ENTRIES', 64))
+app.config['DOCUMENT_MAX_BYTES'] = int(os.environ.get('DOCUMENT_MAX_BYTES', 256 * 1024 * 1024))
+
+analysis_cache = LRUCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_MAX_BYTES'])
+documents = LRUCache(app.config['DOCUMENT_MAX_ENTRIES'], app.config['DOCUMENT_MAX_BYTES'])
+
+# Métricas agregadas para ``/metrics`` (formato de texto de Prometheus). Las
+# de fase solo reciben datos de las peticiones que piden ``metrics``.
+registry = Registry()
+REQUESTS = registry.register(Counter(
+    'analyzer_requests_total', 'Programas analizados por endpoint, modo y código HTTP.',
+    ('endpoint', 'mode', 'status')))
+REQUEST_SECONDS = registry.register(Histogram(
+    'analyzer_request_duration_seconds', 'Tiempo de reloj por programa analizado.',
+    SECONDS_BUCKETS, ('endpoint', 'mode')))
+PHASE_SECONDS = registry.register(Histogram(
+    'analyzer_phase_duration_seconds', 'Tiempo de reloj por fase de análisis.',
+    SECONDS_BUCKETS, ('phase',)))
+PHASE_CPU_SECONDS = registry.register(Histogram(
+    'analyzer_phase_cpu_seconds', 'Tiempo de CPU por fase de análisis.',
+    SECONDS_BUCKETS, ('phase',)))
+PHASE_PEAK_BYTES = registry.register(Histogram(
+    'analyzer_phase_peak_bytes', 'Pico de memoria reservada (tracemalloc) por fase de análisis.',
+    BYTES_BUCKETS, ('phase',)))
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+def get_sandbox():
+    """Crea el pool la primera vez que se necesita (no al importar el módulo)."""
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is None:
+            _sandbox = SandboxPool(
+                workers=app.config['SANDBOX_WORKERS'],
+                max_queue=app.config['SANDBOX_QUEUE'],
+                job_timeout=app.config['EXEC_TIMEOUT'] + 5,
+                memory_mb=app.config['SANDBOX_MEMORY_MB'],
+                cpu_seconds=app.config['SANDBOX_CPU_SECONDS'],
+            )
+            atexit.register(_sandbox.close)
+        return _sandbox
+
+def execute(kind, *args):
+    """Ejecuta un trabajo (``run`` o ``asm``) con los límites configurados."""
+    job = (kind, *args, app.config['MAX_STEPS'], app.config['EXEC_TIMEOUT'])
+    if app.config['SANDBOX_WORKERS'] <= 0:
+        return execute_job(job)
+    return get_sandbox().run(job)
+
+def simulate_assembler(code, optimize=False, recorder=None, profile=False):
+    result = execute('asm', code, optimize, recorder is not None, profile)
+    if recorder is not None:
+        recorder.merge(result.pop('metrics', None))
+    return result
+
+# Errores del sandbox → código HTTP
+SANDBOX_ERROR_STATUS = {
+    SandboxBusy       : 429,
+    SandboxUnavailable: 503,
+    SandboxJobFailed  : 500,
+}
 
 def to_dict(node):
-    """Convierte cualquier objeto del AST en estructuras JSON-serializables."""
+    """Convierte cualquier objeto del AST en estructuras JSON-serializables.
+
+    Las respuestas usan :func:`serializer.dump_ast`, que escribe el JSON
+    directamente; esta función se conserva para quien necesite el dict.
+    """
     # 1. Listas
     if isinstance(node, list):
         return [to_dict(n) for n in node]
@@ -28,9 +129,9 @@ def to_dict(node):
     if isinstance(node, tuple):
         return tuple(to_dict(n) for n in node)
 
-    # 3. Nodos con atributos
-    if hasattr(node, "__dict__"):
-        return {k: to_dict(v) for k, v in node.__dict__.items()}
+    # 3. Nodos: sus campos declarados
+    if isinstance(node, ASTNode):
+        return {k: to_dict(getattr(node, k)) for k in node._fields}
 
     # 4. Primitivos (str, int, bool, None, etc.)
     return node
@@ -38,152 +139,436 @@ def to_dict(node):
 
 # === LÉXICO ================================================================
 
-# Mapa de tipos de tokenize → tipos esperados por el Parser (MAYÚSCULA)
-TOKEN_MAP = {
-    'NAME'      : 'IDENTIFIER',
-    'NUMBER'    : 'CONSTANT',
-    'STRING'    : 'LITERAL',
-    'NEWLINE'   : None,
-    'NL'        : None,
-    'INDENT'    : None,
-    'DEDENT'    : None,
-    'ENCODING'  : None,
-    # ENDMARKER se ignora en el conteo, pero se añadirá un EOF manual aparte
-    'ENDMARKER' : None,
-    # El token "OP" se especializa más abajo a OPERATOR o PUNCTUATION
-    'OP'        : 'OPERATOR',
-}
-
-# Conjunto de caracteres que tratamos como puntuación (no operadores aritméticos)
-PUNCTUATION_CHARS = set('()[]{}:.,;')
-
 def lexer(code: str):
-    """Devuelve la estructura léxica del código y la lista de tokens para el parser."""
-    tokens_list = []
-    tokens_dict = {}
-    counts = {}
-    total_tokens = 0
+    """Devuelve la estructura léxica del código y la lista de tokens para el parser.
 
-    reader = BytesIO(code.encode('utf‑8')).readline
-    try:
-        tok_it = tokenize.tokenize(reader)
-        for tok in tok_it:
-            tok_name = tokenize.tok_name[tok.type]
-
-            mapped = TOKEN_MAP.get(tok_name, None)
-            # Saltar tokens sin relevancia léxica (espacios, indentaciones, etc.)
-            if mapped is None:
-                continue
-
-            value = tok.string
-
-            # OP → OPERATOR / PUNCTUATION
-            if tok_name == 'OP':
-                mapped = 'PUNCTUATION' if value in PUNCTUATION_CHARS else 'OPERATOR'
-
-            # Palabras reservadas
-            if mapped == 'IDENTIFIER' and value in keyword.kwlist:
-                mapped = 'KEYWORD'
-
-            # Agregar token a la lista para el Parser
-            tokens_list.append({'type': mapped, 'value': value})
-
-            # Estadísticas para la UI (sin contar EOF, se añadirá después)
-            tokens_dict.setdefault(mapped, [])
-            if value not in tokens_dict[mapped]:
-                tokens_dict[mapped].append(value)
-            counts[mapped] = counts.get(mapped, 0) + 1
-            total_tokens += 1
-    except tokenize.TokenError as err:
-        # Caso típico: EOF in multi‑line string / paren, etc.
-        pass
-
-    # Añadir EOF solo para el parser (NO se contabiliza ni se muestra)
-    tokens_list.append({'type': 'EOF', 'value': ''})
-
-    return {
-        'tokens_list' : tokens_list,
-        'tokens'      : tokens_dict,
-        'counts'      : counts,
-        'total_tokens': total_tokens,
-    }
+    Materializa todo de una vez; ``analyze_source`` usa directamente el
+    generador :func:`lexer.iter_tokens` para no guardar la lista.
+    """
+    stats = TokenStats()
+    tokens_list = list(stats.observe(iter_tokens(code)))
+    return {'tokens_list': tokens_list, **stats.to_dict()}
 
 # === API ===================================================================
 
-@app.route('/analyze', methods=['POST'])
-def analyze():
-    req = request.get_json(force=True)
-    code = req.get('code', '')
-    mode = req.get('mode', 'lex')  # lex | full | sem
-    
-    # Ensamblador directo sin lexer/parser
-    if mode == 'asm':
+def encode_json(obj):
+    """Como ``app.json.dumps``, pero inserta tal cual los :class:`RawJSON`.
+
+    Así el AST, ya serializado, no se convierte a dicts ni se vuelve a
+    recorrer. Las claves se ordenan igual que con ``jsonify``.
+    """
+    if isinstance(obj, RawJSON):
+        return obj
+    if isinstance(obj, dict):
+        return '{' + ','.join(
+            f'{json.dumps(str(k))}:{encode_json(v)}' for k, v in sorted(obj.items())
+        ) + '}'
+    return app.json.dumps(obj)
+
+def json_response(payload, status=200):
+    return app.response_class(encode_json(payload), status=status, mimetype='application/json')
+
+def parse_ast_format(raw):
+    """Valida las opciones ``ast_format`` de la petición → kwargs de ``dump_ast``."""
+    if raw is None:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError("'ast_format' debe ser un objeto {tags, max_depth, compact}.")
+    opts = {'tags': raw.get('tags', False), 'max_depth': raw.get('max_depth'),
+            'compact': raw.get('compact', False)}
+    if not isinstance(opts['tags'], bool) or not isinstance(opts['compact'], bool):
+        raise ValueError("'tags' y 'compact' deben ser booleanos.")
+    depth = opts['max_depth']
+    if depth is not None and (not isinstance(depth, int) or isinstance(depth, bool) or depth < 0):
+        raise ValueError("'max_depth' debe ser un entero no negativo.")
+    return opts
+
+def parse_flag(raw, name, default):
+    """Valida una opción booleana de la petición (``default`` si no viene)."""
+    if raw is None:
+        return default
+    if not isinstance(raw, bool):
+        raise ValueError(f"'{name}' debe ser booleano.")
+    return raw
+
+def parse_optimize(raw):
+    """Valida la opción ``optimize`` de la petición (por defecto, ``OPTIMIZE``)."""
+    return parse_flag(raw, 'optimize', app.config['OPTIMIZE'])
+
+# Modos en los que se puede pedir ``profile``
+PROFILE_MODES = {'sem', 'asm'}
+
+def parse_profile(raw, mode):
+    """Valida la opción ``profile``; solo se admite en :data:`PROFILE_MODES`."""
+    profile = parse_flag(raw, 'profile', False)
+    if profile and mode not in PROFILE_MODES:
+        raise ValueError(f"'profile' no está disponible en el modo '{mode}'.")
+    return profile
+
+def parse_metrics(raw):
+    """``metrics: true`` → un :class:`metrics.PhaseRecorder` para la petición."""
+    return PhaseRecorder() if parse_flag(raw, 'metrics', False) else None
+
+# Modos que ejecutan el programa → motor de ``link_and_run`` que usan
+RUN_ENGINES = {
+    'sem'     : 'visitor',
+    'compiled': 'compiled',
+    'vm'      : 'vm',
+}
+
+def analyze_source(code, mode, recorder=None):
+    """Léxico, AST y errores semánticos de ``code`` según ``mode``, con caché.
+
+    Devuelve un dict con las partes serializables de la respuesta
+    (``tokens``, ``counts``, ``total_tokens`` y, según el modo, ``ast``,
+    ``syntax_errors`` y ``semantics``) o ``{'error': ...}`` si el lexer
+    falla (o el parser, por algo que no es un error de sintaxis, o el
+    programa está tan anidado que se agota la pila al analizarlo). El
+    parser se recupera de los errores de sintaxis: los anota todos en
+    ``syntax_errors`` y el AST (parcial) y la semántica se calculan igual.
+    ``ast`` es el JSON ya serializado y ``program`` guarda el AST en sí,
+    para el sandbox o para serializarlo con otras opciones.
+    La entrada se comparte entre peticiones: no debe modificarse.
+
+    Con ``recorder`` (un :class:`metrics.PhaseRecorder`) no se consulta la
+    caché y se miden las fases ``lex``, ``parse``, ``serialize`` y
+    ``semantics``; para separar las dos primeras los tokens se
+    materializan antes de parsear.
+    """
+    key = cache_key(code, mode)
+    if recorder is None:
+        entry = analysis_cache.get(key)
+        if entry is not None:
+            return entry
+
+    # El Parser consume los tokens según los necesita; las estadísticas se
+    # calculan al pasar, sin guardar la lista completa.
+    stats = TokenStats()
+    tokens = stats.observe(iter_tokens(code))
+    entry = {}
+    if recorder is not None:
+        try:
+            with recorder.phase('lex') as counts:
+                tokens = iter(list(tokens))
+        except SyntaxError as e:    # sangría inconsistente
+            entry = {'error': str(e)}
+        counts['tokens'] = stats.total_tokens
+    if mode != 'lex' and 'error' not in entry:
+        # Línea de cada sentencia y posición de los errores
+        line_index = LineIndex(code)
         try:
-            asm = SimpleAssembler()
-            result = asm.run(code)
-            return jsonify(result)
+            with phase(recorder, 'parse') as counts:
+                parser = Parser(tokens, line_index, recover=True)
+                ast = parser.parse()
+        except RecursionError:
+            entry = {'error': NESTING_ERROR}
         except Exception as e:
-            return jsonify({'error': str(e)}), 400
-
-    lex = lexer(code)
+            entry = {'error': str(e)}
+        else:
+            entry['syntax_errors'] = [str(e) for e in parser.errors]
+            if recorder is not None:
+                counts['nodes'] = count_nodes(ast)
+                counts['errors'] = len(parser.errors)
+            try:
+                with phase(recorder, 'serialize') as counts:
+                    entry['ast'] = dump_ast(ast)
+                counts['bytes'] = len(entry['ast'])
+                entry['program'] = ast
+                if mode in RUN_ENGINES:
+                    with phase(recorder, 'semantics') as counts:
+                        entry['semantics'] = SemanticAnalyzer(line_index).analyze(ast)
+                    counts['errors'] = len(entry['semantics'])
+            except RecursionError:
+                entry = {'error': NESTING_ERROR}
+    if 'error' not in entry:
+        try:
+            for _ in tokens:    # tokens que el Parser no llegó a pedir
+                pass
+        except SyntaxError as e:
+            entry = {'error': str(e)}
+        else:
+            entry.update(stats.to_dict())
+
+    rest = {k: v for k, v in entry.items() if k not in ('program', 'ast')}
+    size = len(code) + len(entry.get('ast', '')) + len(json.dumps(rest))
+    analysis_cache.put(key, entry, size)
+    return entry
+
+def analyze_item(code, mode, ast_format=None, optimize=None, metrics=None, profile=None,
+                 endpoint='analyze'):
+    """Procesa un programa en el modo pedido. Devuelve ``(payload, status)``.
+
+    ``ast_format`` son opciones de :func:`serializer.dump_ast` (etiquetas de
+    tipo, profundidad máxima, codificación compacta) para el AST devuelto.
+    ``optimize`` activa o desactiva la optimización antes de ejecutar
+    (plegado de constantes o, en ``asm``, el optimizador de mirilla).
+    Con ``metrics`` la respuesta incluye las mediciones de cada fase y con
+    ``profile`` (modos ``sem`` y ``asm``) el perfil de la ejecución.
+    """
+    started = time.perf_counter()
+    recorder = None
+    try:
+        recorder = parse_metrics(metrics)
+        payload, status = _analyze(code, mode, parse_ast_format(ast_format), parse_optimize(optimize),
+                                   recorder, parse_profile(profile, mode))
+    except ValueError as e:
+        payload, status = {'error': str(e)}, 400
+    except tuple(SANDBOX_ERROR_STATUS) as e:
+        payload, status = {'error': str(e)}, SANDBOX_ERROR_STATUS[type(e)]
+    return record_request(endpoint, mode, payload, status, started, recorder)
+
+def _analyze(code, mode, ast_format, optimize, recorder, profile):
+    # Ensamblador directo sin lexer/parser
+    if mode == 'asm':
+        result = simulate_assembler(code, optimize, recorder, profile)
+        if 'error' in result:
+            return result, 400
+        return result, 200
+
+    entry = analyze_source(code, mode, recorder)
+    return build_response(entry, mode, ast_format, optimize, recorder, profile)
+
+KNOWN_MODES = {'lex', 'full', 'asm', *RUN_ENGINES}
+
+def record_request(endpoint, mode, payload, status, started, recorder):
+    """Suma la petición a las métricas de ``/metrics`` y, si se midieron
+    fases, las añade a la respuesta bajo ``metrics``."""
+    seconds = time.perf_counter() - started
+    label = mode if mode in KNOWN_MODES else 'other'
+    REQUESTS.inc(endpoint, label, str(status))
+    REQUEST_SECONDS.observe(seconds, endpoint, label)
+    if recorder is None:
+        return payload, status
+    phases = recorder.to_dict()
+    for name, data in phases.items():
+        PHASE_SECONDS.observe(data['wall_ms'] / 1e3, name)
+        PHASE_CPU_SECONDS.observe(data['cpu_ms'] / 1e3, name)
+        if 'peak_bytes' in data:
+            PHASE_PEAK_BYTES.observe(data['peak_bytes'], name)
+    return {**payload, 'metrics': {'phases': phases, 'wall_ms': seconds * 1e3}}, status
+
+def build_response(entry, mode, ast_format, optimize, recorder=None, profile=False):
+    """Arma la respuesta de ``mode`` a partir de una entrada de análisis
+    (de ``analyze_source`` o de un :class:`documents.Document`), ejecutando
+    el programa si el modo lo pide. Las fases de la ejecución, medidas en
+    el sandbox, se añaden a ``recorder``.
+
+    Con errores de sintaxis se responde 400 con todos ellos en
+    ``syntax_errors`` (el primero también en ``error``), el AST parcial y,
+    en los modos que ejecutan, los errores semánticos; no se ejecuta."""
+    if 'error' in entry:
+        return {'error': entry['error']}, 400
+
+    lex_part = {
+        'tokens'      : entry['tokens'],
+        'counts'      : entry['counts'],
+        'total_tokens': entry['total_tokens'],
+    }
 
     # Solo léxico → se devuelve inmediatamente
     if mode == 'lex':
-        return jsonify({
-            'tokens'      : lex['tokens'],
-            'counts'      : lex['counts'],
-            'total_tokens': lex['total_tokens']
-        })
-
-    # Construcción de AST
-    try:
-        parser = Parser(lex['tokens_list'])
-        ast = parser.parse()
-    except Exception as e:
-        print('PARSER ERROR:', e)
-        return jsonify({'error': str(e)}), 400
+        return lex_part, 200
 
+    if ast_format is None:
+        ast_json = entry['ast']
+    else:
+        try:
+            with phase(recorder, 'serialize_format') as counts:
+                ast_json = dump_ast(entry['program'], **ast_format)
+        except RecursionError:
+            return {'error': NESTING_ERROR}, 400
+        counts['bytes'] = len(ast_json)
+
+    syntax_errors = entry['syntax_errors']
+    if syntax_errors:
+        payload = {**lex_part, 'ast': ast_json, 'error': syntax_errors[0],
+                   'syntax_errors': syntax_errors}
+        if mode in RUN_ENGINES:
+            payload['semantics'] = entry['semantics']
+        return payload, 400
 
     # Con semántica
-    if mode == 'sem':
-        result = link_and_run(ast)
-        if "errors" in result:
-            return jsonify({
-                'tokens': lex['tokens'],
-                'counts': lex['counts'],
-                'total_tokens': lex['total_tokens'],
-                'ast': to_dict(ast),
-                'semantics': result["errors"],
-                'output': result.get("output", []),
-            })
-        return jsonify({
-            'tokens': lex['tokens'],
-            'counts': lex['counts'],
-            'total_tokens': lex['total_tokens'],
-            'ast': to_dict(ast),
-            'semantics': [],
-            'output': result["output"]  
-        })
-
+    if mode in RUN_ENGINES:
+        if entry['semantics']:
+            return {
+                **lex_part,
+                'ast': ast_json,
+                'semantics': entry['semantics'],
+                'output': [],
+            }, 200
+        result = execute('run', entry['program'], RUN_ENGINES[mode], optimize, recorder is not None,
+                         profile)
+        if recorder is not None:
+            recorder.merge(result.pop('metrics', None))
+        # Un error del programa (ZeroDivisionError, recursión...) es del cliente
+        if "error" in result:
+            return {'error': result["error"]}, 400
+        payload = {
+            **lex_part,
+            'ast': ast_json,
+            'semantics': result.get("errors", []),
+            'output': result.get("output", []),
+            'limit_exceeded': result.get("limit_exceeded"),
+            'optimizations': result.get("optimizations"),
+        }
+        if 'profile' in result:
+            payload['profile'] = result['profile']
+        return payload, 200
 
     # AST sin semántica
     if mode == 'full':
-        return jsonify({
-            'tokens'      : lex['tokens'],
-            'counts'      : lex['counts'],
-            'total_tokens': lex['total_tokens'],
-            'ast'         : to_dict(ast)
-        })
+        return {**lex_part, 'ast': ast_json}, 200
 
-    if mode == 'asm':
+    return {'error': f'Modo de análisis no reconocido: {mode}'}, 400
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    req = request.get_json(force=True)
+    code = req.get('code', '')
+    mode = req.get('mode', 'lex')  # lex | full | sem | compiled | vm | asm
+    payload, status = analyze_item(code, mode, req.get('ast_format'), req.get('optimize'),
+                                   req.get('metrics'), req.get('profile'))
+    return json_response(payload, status)
+
+DOCUMENT_MODES = {'lex', 'full', *RUN_ENGINES}
+
+def document_item(req):
+    """Análisis incremental de un documento abierto. Devuelve ``(payload, status)``.
+
+    ``code`` (re)abre el documento ``doc_id`` con ese texto; ``changes``
+    aplica ediciones ``{start, end, text}`` sobre el texto actual. Si se
+    envía ``version`` y no es la del documento, se responde 409 para que
+    el cliente lo reabra con el texto completo. Con ``metrics`` se miden
+    la fase ``edit`` (aplicar los cambios) y las del análisis pendiente.
+    """
+    started = time.perf_counter()
+    try:
+        recorder = parse_metrics(req.get('metrics'))
+    except ValueError as e:
+        recorder, (payload, status) = None, ({'error': str(e)}, 400)
+    else:
+        payload, status = _document_item(req, recorder)
+    return record_request('document', req.get('mode', 'lex'), payload, status, started, recorder)
+
+def _document_item(req, recorder):
+    doc_id = req.get('doc_id')
+    mode = req.get('mode', 'lex')
+    if not isinstance(doc_id, str) or not doc_id:
+        return {'error': "'doc_id' debe ser una cadena no vacía."}, 400
+    if mode not in DOCUMENT_MODES:
+        return {'error': f'Modo de análisis no disponible para documentos: {mode}'}, 400
+    try:
+        ast_format = parse_ast_format(req.get('ast_format'))
+        optimize = parse_optimize(req.get('optimize'))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    if 'code' in req:
+        if not isinstance(req['code'], str):
+            return {'error': "'code' debe ser una cadena."}, 400
+        doc = Document(req['code'])
+    else:
+        doc = documents.get(doc_id)
+        if doc is None:
+            return {'error': f"Documento desconocido: '{doc_id}'. Envía 'code' para abrirlo."}, 404
+
+    with doc.lock:
+        if 'changes' in req:
+            version = req.get('version')
+            if version is not None and version != doc.version:
+                return {'error': 'La versión no coincide; reenvía el documento completo.',
+                        'version': doc.version}, 409
+            try:
+                with phase(recorder, 'edit') as counts:
+                    doc.apply_changes(req['changes'])
+            except ValueError as e:
+                return {'error': str(e), 'version': doc.version}, 400
+            counts['changes'] = len(req['changes'])
+            doc.version += 1
+        entry = doc.analyze(parse=mode != 'lex', check=mode in RUN_ENGINES, metrics=recorder)
+        version = doc.version
+        size = doc.size()
+    documents.put(doc_id, doc, size)
+
+    try:
+        payload, status = build_response(entry, mode, ast_format, optimize, recorder)
+    except tuple(SANDBOX_ERROR_STATUS) as e:
+        payload, status = {'error': str(e)}, SANDBOX_ERROR_STATUS[type(e)]
+    return {**payload, 'doc_id': doc_id, 'version': version}, status
+
+@app.route('/analyze/document', methods=['POST'])
+def analyze_document():
+    req = request.get_json(force=True)
+    if not isinstance(req, dict):
+        return jsonify({'error': 'Se esperaba un objeto {doc_id, code | changes, mode}.'}), 400
+    payload, status = document_item(req)
+    return json_response(payload, status)
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analiza una lista de ``{code, mode}`` y transmite los resultados en NDJSON.
+
+    Cada línea es ``{"index", "status", "result"}`` y se envía en cuanto su
+    programa termina, así que el orden de las líneas no es el de entrada.
+    """
+    items = request.get_json(force=True)
+    if not isinstance(items, list):
+        return jsonify({'error': 'Se esperaba un arreglo de objetos {code, mode}.'}), 400
+    if len(items) > app.config['BATCH_MAX_ITEMS']:
+        return jsonify({'error': f"El lote excede {app.config['BATCH_MAX_ITEMS']} programas."}), 413
+
+    def run_item(item):
+        if not isinstance(item, dict):
+            return {'error': 'Cada elemento debe ser un objeto {code, mode}.'}, 400
+        return analyze_item(item.get('code', ''), item.get('mode', 'lex'), item.get('ast_format'),
+                            item.get('optimize'), item.get('metrics'), item.get('profile'),
+                            endpoint='batch')
+
+    def generate():
+        pool = ThreadPoolExecutor(max_workers=app.config['BATCH_CONCURRENCY'])
+        futures = {pool.submit(run_item, item): i for i, item in enumerate(items)}
         try:
-            asm = SimpleAssembler()
-            result = asm.run(code)
-            return jsonify(result)
-        except Exception as e:
-            return jsonify({'error': str(e)}), 400
-        
-    return jsonify({'error': f'Modo de análisis no reconocido: {mode}'}), 400
+            for future in as_completed(futures):
+                try:
+                    payload, status = future.result()
+                except Exception as e:
+                    payload, status = {'error': str(e)}, 500
+                line = {'index': futures[future], 'status': status, 'result': payload}
+                yield encode_json(line) + '\n'
+        finally:
+            # Cliente desconectado o lote terminado: no arrancar lo pendiente
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(analysis_cache.stats())
+
+# Estadísticas de las cachés → (nombre, tipo, ayuda) en /metrics
+CACHE_METRICS = (
+    ('hits', 'counter', 'Consultas a la caché que encontraron la entrada.'),
+    ('misses', 'counter', 'Consultas a la caché que no la encontraron.'),
+    ('evictions', 'counter', 'Entradas expulsadas por los límites de la caché.'),
+    ('entries', 'gauge', 'Entradas guardadas en la caché.'),
+    ('bytes', 'gauge', 'Tamaño aproximado de lo guardado en la caché.'),
+)
+
+def cache_metric_lines():
+    caches = {'analysis': analysis_cache.stats(), 'documents': documents.stats()}
+    lines = []
+    for key, kind, help_text in CACHE_METRICS:
+        name = f'analyzer_cache_{key}' + ('_total' if kind == 'counter' else '')
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{{cache="{cache}"}} {stats[key]}' for cache, stats in caches.items()]
+    return lines
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Agregados de todas las peticiones en formato de texto de Prometheus."""
+    return Response(registry.render(cache_metric_lines()), mimetype='text/plain; version=0.0.4')
 
 # Entrypoint para uso local
 if __name__ == '__main__':
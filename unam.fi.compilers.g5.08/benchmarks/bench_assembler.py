@@ -0,0 +1,57 @@
+"""Benchmark del ensamblador con programas dominados por bucles.
+
+Mide por separado el ensamblado (validación + decodificación, una sola vez)
+y la ejecución del programa pre-decodificado, e informa instrucciones por
+segundo. Uso:
+
+    python benchmarks/bench_assembler.py [iteraciones]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from assembler import SimpleAssembler  # noqa: E402
+
+
+def loop_program(iterations):
+    """Bucle contador con cuatro instrucciones por iteración."""
+    return "\n".join([
+        "MOV A, 0",
+        f"MOV B, {iterations}",
+        "MOV C, 0",
+        "LOOP:",
+        "ADD A, 1",
+        "ADD C, 3",
+        "CMP A, B",
+        "JNE LOOP",
+        "PRINT C",
+        "HALT",
+    ])
+
+
+def bench(code, executed):
+    asm = SimpleAssembler()
+    t0 = time.perf_counter()
+    asm.parse(code)
+    asm.assemble()
+    t1 = time.perf_counter()
+    asm.execute()
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1, executed / (t2 - t1)
+
+
+def main(argv):
+    iterations = int(argv[1]) if len(argv) > 1 else 100_000
+    executed = 3 + 4 * iterations + 2
+    assemble_s, execute_s, ips = bench(loop_program(iterations), executed)
+    print(f"iteraciones      : {iterations}")
+    print(f"instrucciones    : {executed}")
+    print(f"ensamblado       : {assemble_s * 1e3:.3f} ms")
+    print(f"ejecución        : {execute_s * 1e3:.3f} ms")
+    print(f"instrucciones/s  : {ips:,.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
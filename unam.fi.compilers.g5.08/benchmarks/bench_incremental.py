@@ -0,0 +1,75 @@
+"""Benchmark del análisis incremental de documentos (``/analyze/document``).
+
+Simula una persona que teclea un carácter en medio de programas de
+distintos tamaños y compara el análisis completo (léxico, AST, semántica
+y JSON del AST, como ``analyze_source``) contra ``Document.apply`` +
+``Document.analyze``. Uso:
+
+    python benchmarks/bench_incremental.py [teclas]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from documents import Document                 # noqa: E402
+from lexer import LineIndex, TokenStats, iter_tokens  # noqa: E402
+from parser import Parser                      # noqa: E402
+from semantic import SemanticAnalyzer          # noqa: E402
+from serializer import dump_ast                # noqa: E402
+
+
+def make_program(functions):
+    parts = []
+    for i in range(functions):
+        parts.append(
+            f"def f{i}(a, b):\n"
+            f"    total = a + b * {i}\n"
+            f"    if total > 10:\n"
+            f"        print(\"grande\", total)\n"
+            f"    return total\n"
+            f"v{i} = f{i}(1, 2)\n"
+        )
+    return "".join(parts)
+
+
+def full_analysis(code):
+    stats = TokenStats()
+    tokens = stats.observe(iter_tokens(code))
+    line_index = LineIndex(code)
+    ast = Parser(tokens, line_index).parse()
+    for _ in tokens:
+        pass
+    return stats.to_dict(), dump_ast(ast), SemanticAnalyzer(line_index).analyze(ast)
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(argv):
+    keys = int(argv[1]) if len(argv) > 1 else 20
+    print(f"{'funciones':>10} {'caracteres':>11} {'completo':>11} {'incremental':>12} {'mejora':>8}")
+    for functions in (10, 100, 1000, 5000):
+        code = make_program(functions)
+        t0 = time.perf_counter()
+        full_analysis(code)
+        full = time.perf_counter() - t0
+
+        doc = Document(code)
+        doc.analyze(check=True)
+        where = code.index(f"b * {functions // 2}\n") + len(f"b * {functions // 2}")
+        times = []
+        for _ in range(keys):
+            t0 = time.perf_counter()
+            doc.apply(where, where, "1")
+            doc.analyze(check=True)
+            times.append(time.perf_counter() - t0)
+        inc = median(times)
+        print(f"{functions:>10} {len(code):>11} {full * 1e3:>8.1f} ms {inc * 1e3:>9.2f} ms {full / inc:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
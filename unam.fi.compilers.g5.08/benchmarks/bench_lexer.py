@@ -0,0 +1,87 @@
+"""Benchmark del analizador léxico.
+
+Compara el camino anterior (``tokenize`` sobre los bytes del código y
+conversión de cada ``TokenInfo`` a ``Token``, incluidos los de estructura
+``NEWLINE``/``INDENT``/``DEDENT``) contra ``lexer.iter_tokens``,
+que recorre el texto una sola vez, para programas de distintos tamaños.
+Antes de medir comprueba que ambos producen los mismos tokens. Uso:
+
+    python benchmarks/bench_lexer.py [repeticiones]
+"""
+import os
+import sys
+import time
+import tokenize
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from lexer import KEYWORDS, PUNCTUATION_CHARS, LineIndex, Token, iter_tokens  # noqa: E402
+
+SNIPPET = '''\
+def area(base, altura):
+    """Área de un triángulo."""
+    return base * altura / 2   # comentario
+x = 1
+y = x + 2 * (x - 1) ** 2
+datos = {"a": [1, 2, 3], "b": (4, 5), 'c': 0x1F, "d": 1.5e-3}
+if x > y and not datos:
+    print("mayor", x)
+elif x == y:
+    print(f"igual {x}")
+else:
+    print(-y, area(x, y))
+'''
+
+_KINDS = {tokenize.NAME: 'IDENTIFIER', tokenize.NUMBER: 'CONSTANT',
+          tokenize.STRING: 'LITERAL', tokenize.OP: 'OPERATOR',
+          tokenize.NEWLINE: 'NEWLINE', tokenize.INDENT: 'INDENT', tokenize.DEDENT: 'DEDENT'}
+
+
+def tokenize_tokens(code):
+    """El lexer anterior, basado en el módulo ``tokenize``. Las posiciones
+    quedan como ``(línea, columna)``, como las da ``tokenize``."""
+    reader = BytesIO(code.encode('utf-8')).readline
+    try:
+        for tok in tokenize.tokenize(reader):
+            kind = _KINDS.get(tok.type)
+            if kind is None:
+                continue
+            value = tok.string
+            if kind == 'OPERATOR':
+                kind = 'PUNCTUATION' if value in PUNCTUATION_CHARS else 'OPERATOR'
+            elif kind == 'IDENTIFIER' and value in KEYWORDS:
+                kind = 'KEYWORD'
+            if kind != 'CONSTANT' and kind != 'LITERAL':
+                value = sys.intern(value)
+            yield Token(kind, value, tok.start, tok.end)
+    except tokenize.TokenError:
+        pass
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv):
+    repeat = int(argv[1]) if len(argv) > 1 else 5
+    print(f"{'copias':>8} {'tokens':>10} {'tokenize':>12} {'iter_tokens':>12} {'tokens/s':>14} {'mejora':>8}")
+    for copies in (1, 10, 100, 1000):
+        code = SNIPPET * copies
+        index = LineIndex(code)
+        expected = [(t.type, t.value, t.start) for t in tokenize_tokens(code)]
+        got = [(t.type, t.value, index.position(t.start)) for t in list(iter_tokens(code))[:-1]]
+        assert got == expected, "iter_tokens no coincide con tokenize"
+        old = best_of(lambda: list(tokenize_tokens(code)), repeat)
+        new = best_of(lambda: list(iter_tokens(code)), repeat)
+        print(f"{copies:>8} {len(got):>10} {old * 1e3:>9.2f} ms {new * 1e3:>9.2f} ms "
+              f"{len(got) / new:>14,.0f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,58 @@
+"""Benchmark de la serialización del AST para la respuesta de ``/analyze``.
+
+Compara el camino anterior (``to_dict`` + codificación JSON de Flask)
+contra ``serializer.dump_ast``, que escribe el JSON en una sola pasada,
+para programas de distintos tamaños. Uso:
+
+    python benchmarks/bench_serializer.py [repeticiones]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.setrecursionlimit(10_000)
+
+from lexer import iter_tokens                 # noqa: E402
+from parser import Parser                     # noqa: E402
+from serializer import dump_ast               # noqa: E402
+from server import app, to_dict               # noqa: E402
+
+SNIPPET = """\
+x = 1
+y = x + 2 * (x - 1)
+datos = {"a": [1, 2, 3], "b": (4, 5)}
+if x > y:
+    print("mayor", x)
+elif x == y:
+    print("igual")
+else:
+    print(-y, not x)
+"""
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv):
+    repeat = int(argv[1]) if len(argv) > 1 else 5
+    print(f"{'copias':>8} {'bytes':>10} {'to_dict+json':>14} {'dump_ast':>10} {'mejora':>8}")
+    for copies in (1, 10, 100, 1000):
+        ast = Parser(iter_tokens(SNIPPET * copies)).parse()
+        with app.app_context():
+            old = best_of(lambda: app.json.dumps(to_dict(ast)), repeat)
+            size = len(app.json.dumps(to_dict(ast)))
+        new = best_of(lambda: dump_ast(ast), repeat)
+        assert json.loads(dump_ast(ast)) == json.loads(json.dumps(to_dict(ast)))
+        print(f"{copies:>8} {size:>10} {old * 1e3:>11.2f} ms {new * 1e3:>7.2f} ms {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,294 @@
+"""Suite de benchmarks de todas las etapas del analizador.
+
+Genera cargas deterministas (código lineal largo, anidamiento profundo,
+bloques anidados, recursión, bucles ajustados, literales grandes y bucles
+de ensamblador) y mide el lexer, ``Parser.parse``, ``SemanticAnalyzer``,
+los tres motores de ejecución, ``SimpleAssembler`` y la petición completa
+a ``/analyze`` con el cliente de pruebas de Flask (sin sandbox, para no
+medir procesos). De cada medición se guarda la mediana y el mínimo de
+varias repeticiones.
+
+Los resultados pueden guardarse como JSON y compararse con una línea base:
+una medición cuya mediana empeora más que el umbral se marca como
+regresión y el script termina con código 1. Uso:
+
+    python benchmarks/bench_suite.py [--repeat N] [--scale F] [--filter TEXTO]
+                                     [--save resultados.json]
+                                     [--baseline base.json] [--threshold 0.25]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.setrecursionlimit(20_000)
+
+from assembler import SimpleAssembler          # noqa: E402
+from lexer import iter_tokens                  # noqa: E402
+from parser import Parser                      # noqa: E402
+from semantic import Interpreter, SemanticAnalyzer, link_and_run  # noqa: E402
+from server import app                         # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+#  Cargas
+# ---------------------------------------------------------------------------
+
+def straight_line(n):
+    """``n`` asignaciones con expresiones aritméticas, sin control de flujo."""
+    lines = ["x0 = 1"]
+    for i in range(1, n):
+        lines.append(f"x{i} = x{i - 1} * 3 + {i} - (x{i - 1} // 7)")
+    lines.append(f"print(x{n - 1} % 1000)")
+    return "\n".join(lines) + "\n"
+
+
+def deep_nesting(depth):
+    """``if`` anidados ``depth`` niveles con una sentencia en el fondo."""
+    lines = ["x = 1"]
+    for level in range(depth):
+        lines.append("    " * level + f"if x < {depth + level}:")
+    lines.append("    " * depth + "print(x)")
+    return "\n".join(lines) + "\n"
+
+
+def nested_blocks(n):
+    """``n`` funciones con bloques anidados y sentencias después de cada
+    bloque interno, donde la sangría decide a qué bloque pertenecen."""
+    lines = []
+    for i in range(n):
+        lines += [
+            f"def f{i}(x):",
+            "    total = 0",
+            "    while x > 0:",
+            "        if x % 2 == 0:",
+            f"            total += x * {i % 7 + 1}",
+            "        else:",
+            "            total -= 1",
+            "        x -= 1",
+            "    return total",
+        ]
+    calls = " + ".join(f"f{i}(20)" for i in range(min(n, 100)))
+    lines.append(f"print({calls})")
+    return "\n".join(lines) + "\n"
+
+
+def recursion(n):
+    """Fibonacci recursivo: muchas llamadas cortas."""
+    return (
+        "def fib(n):\n"
+        "    if n < 2:\n"
+        "        return n\n"
+        "    else:\n"
+        "        return fib(n - 1) + fib(n - 2)\n"
+        "if True:\n"
+        f"    print(fib({n}))\n"
+    )
+
+
+def tight_loop(n):
+    """Bucle ``while`` de primer nivel con aritmética en cada iteración."""
+    return (
+        "i = 0\n"
+        "total = 0\n"
+        f"while i < {n}:\n"
+        "    i += 1\n"
+        "    total += i * 2 % 7\n"
+    )
+
+
+def big_literals(n):
+    """Una lista y un diccionario literales de ``n`` elementos."""
+    items = ", ".join(str(i) for i in range(n))
+    pairs = ", ".join(f'"k{i}": {i}' for i in range(n))
+    return f"datos = [{items}]\ntabla = {{{pairs}}}\nprint(len(datos), len(tabla))\n"
+
+
+def asm_loop(n):
+    """Bucle de ensamblador de cinco instrucciones por iteración."""
+    return "\n".join([
+        "MOV A, 0",
+        f"MOV B, {n}",
+        "MOV C, 0",
+        "LOOP:",
+        "ADD A, 1",
+        "ADD C, A",
+        "AND C, 255",
+        "CMP A, B",
+        "JNE LOOP",
+        "PRINT C",
+        "HALT",
+    ])
+
+
+# nombre → (generador, tamaño base)
+WORKLOADS = {
+    "straight":  (straight_line, 2000),
+    "nesting":   (deep_nesting, 150),
+    "blocks":    (nested_blocks, 300),
+    "recursion": (recursion, 16),
+    "loop":      (tight_loop, 20000),
+    "literals":  (big_literals, 5000),
+}
+ASM_WORKLOADS = {
+    "asm_loop": (asm_loop, 50000),
+}
+
+
+# ---------------------------------------------------------------------------
+#  Medición
+# ---------------------------------------------------------------------------
+
+def measure(fn, repeat):
+    """Mediana y mínimo (en segundos) de ``repeat`` llamadas a ``fn``.
+
+    ``fn`` recibe el número de repetición. Una primera llamada sin medir
+    calienta cachés e importaciones; el recolector de basura se desactiva
+    durante cada llamada para que sus pausas no dependan del orden de las
+    mediciones.
+    """
+    fn(-1)
+    times = []
+    for i in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            t0 = time.perf_counter()
+            fn(i)
+            times.append(time.perf_counter() - t0)
+        finally:
+            gc.enable()
+    times.sort()
+    return times[len(times) // 2], times[0]
+
+
+def cases(scale):
+    """Genera ``(nombre, unidades, unidad, función)`` para cada medición."""
+    for name, (make, size) in WORKLOADS.items():
+        code = make(max(1, int(size * scale)))
+        tokens = list(iter_tokens(code))
+        ast = Parser(tokens).parse()
+        yield f"lexer/{name}", len(code), "chars", lambda i, c=code: list(iter_tokens(c))
+        yield f"parser/{name}", len(tokens), "tokens", lambda i, t=tokens: Parser(t).parse()
+        yield f"semantic/{name}", 1, "programs", lambda i, a=ast: SemanticAnalyzer().analyze(a)
+        yield f"interpreter/{name}", 1, "programs", lambda i, a=ast: Interpreter().visit(a)
+        for engine in ("compiled", "vm"):
+            yield (f"{engine}/{name}", 1, "programs",
+                   lambda i, a=ast, e=engine: link_and_run(a, engine=e))
+        yield f"analyze_sem/{name}", len(code), "chars", lambda i, c=code: _post(c, "sem", i)
+
+    for name, (make, size) in ASM_WORKLOADS.items():
+        code = make(max(1, int(size * scale)))
+        steps = _asm_steps(code)
+        yield f"assembler/{name}", steps, "instructions", lambda i, c=code: SimpleAssembler().run(c)
+        yield f"analyze_asm/{name}", steps, "instructions", lambda i, c=code: _post(c, "asm", i)
+
+
+def _asm_steps(code):
+    asm = SimpleAssembler()
+    asm.run(code)
+    return asm.budget.steps
+
+
+_client = None
+
+
+def _post(code, mode, i):
+    """Petición completa a ``/analyze``. Un comentario distinto en cada
+    repetición evita que la caché de análisis responda por el parser."""
+    global _client
+    if _client is None:
+        app.config["SANDBOX_WORKERS"] = 0
+        app.config["MAX_STEPS"] = None
+        app.config["EXEC_TIMEOUT"] = None
+        _client = app.test_client()
+    comment = ";" if mode == "asm" else "#"
+    resp = _client.post("/analyze", json={"code": f"{code}\n{comment} {i}\n", "mode": mode})
+    if resp.status_code != 200:
+        raise RuntimeError(f"/analyze respondió {resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+
+
+# ---------------------------------------------------------------------------
+#  Resultados y comparación
+# ---------------------------------------------------------------------------
+
+def run_suite(repeat, scale, only=None):
+    results = {}
+    for name, units, unit, fn in cases(scale):
+        if only and only not in name:
+            continue
+        median, best = measure(fn, repeat)
+        results[name] = {
+            "median_s": median,
+            "min_s": best,
+            "throughput": units / median if median else None,
+            "unit": f"{unit}/s",
+        }
+        print(f"{name:<24} {median * 1e3:>10.2f} ms {best * 1e3:>10.2f} ms "
+              f"{units / median:>14,.0f} {unit}/s", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Imprime el cambio respecto a ``baseline`` y devuelve las regresiones."""
+    regressions = []
+    print(f"\n{'medición':<24} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = current["median_s"] / base["median_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESIÓN"
+            regressions.append(name)
+        print(f"{name:<24} {base['median_s'] * 1e3:>7.2f} ms {current['median_s'] * 1e3:>7.2f} ms "
+              f"{(ratio - 1) * 100:>+7.1f}%{flag}")
+    return regressions
+
+
+def main(argv):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5, help="repeticiones por medición (mediana)")
+    ap.add_argument("--scale", type=float, default=1.0, help="multiplica el tamaño de las cargas")
+    ap.add_argument("--filter", default=None, help="solo mediciones cuyo nombre contenga el texto")
+    ap.add_argument("--save", default=None, help="guarda los resultados en este JSON")
+    ap.add_argument("--baseline", default=None, help="JSON de una corrida anterior para comparar")
+    ap.add_argument("--threshold", type=float, default=0.25,
+                    help="empeoramiento relativo de la mediana que cuenta como regresión")
+    args = ap.parse_args(argv[1:])
+
+    print(f"{'medición':<24} {'mediana':>13} {'mínimo':>13} {'rendimiento':>20}")
+    results = run_suite(args.repeat, args.scale, args.filter)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "repeat": args.repeat,
+                    "scale": args.scale,
+                },
+                "results": results,
+            }, fh, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if baseline["meta"].get("scale") != args.scale:
+            print(f"\nAviso: la línea base usó --scale {baseline['meta'].get('scale')}")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regresión(es) de más de {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -127,7 +127,15 @@ function traducirError(msg) {
     for (const { pattern, human } of catalogo) {
         if (pattern.test(msg)) return human;
     }
-    return `Detalle técnico: ${msg}`;
+    // El resultado se inserta como HTML (los textos del catálogo lo son);
+    // el mensaje puede incluir texto del código, así que se escapa.
+    return `Detalle técnico: ${escaparHtml(msg)}`;
+}
+
+function escaparHtml(texto) {
+    const div = document.createElement("div");
+    div.textContent = String(texto);
+    return div.innerHTML;
 }
 
 function updateParticlesColor(theme) {
@@ -165,6 +173,19 @@ async function analyzeCode(code = null) {
            <h2 class='font-bold mb-1'>Ocurrió un error durante el análisis</h2>
            <p>${traducirError(data.error)}</p>
          </div>`;
+            // El parser se recupera y reporta todos los errores de sintaxis;
+            // el primero ya se mostró arriba. Los mensajes incluyen texto
+            // del código, así que se insertan con textContent.
+            if (data.syntax_errors && data.syntax_errors.length > 1) {
+                const list = document.createElement("ul");
+                list.className = "list-disc pl-5 text-red-400 space-y-1 fade-in";
+                for (const msg of data.syntax_errors.slice(1)) {
+                    const item = document.createElement("li");
+                    item.textContent = msg;
+                    list.appendChild(item);
+                }
+                outputDiv.appendChild(list);
+            }
             return;  // <- ¡IMPORTANTE!
         }
 